@@ -0,0 +1,103 @@
+"""
+Measure the I/O side of the app against the in-process fake Encord backend: file listing, label row downloads
+(cold and warm label row cache) and workflow syncs, with configurable latency, throughput limit and error injection.
+
+Usage: python benchmarks/encord_io.py --files 50 --latency 0.1 --max-calls-per-second 20 --server-error-rate 0.05
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable
+
+from encord_consensus.lib.fake_encord import (
+    FakeBackend,
+    FakeBackendConfig,
+    FakeEncordUserClient,
+)
+from encord_consensus.lib.file_index import build_file_index
+from encord_consensus.lib.label_row_cache import LabelRowCache
+from encord_consensus.lib.project_access import (
+    DEFAULT_DOWNLOAD_WORKERS,
+    MetadataCache,
+    download_label_row_from_projects,
+    get_all_projects,
+)
+from encord_consensus.lib.sync_journal import get_sync_journal
+from encord_consensus.lib.synthetic_data import SyntheticDataSpec
+from encord_consensus.lib.workflow_utils import pre_populate
+
+
+def run_scenario(label: str, backend: FakeBackend, run: Callable[[], object]) -> None:
+    backend.reset_stats()
+    start = time.perf_counter()
+    try:
+        run()
+        outcome = "ok"
+    except Exception as e:
+        outcome = f"failed ({type(e).__name__}: {e})"
+    elapsed = time.perf_counter() - start
+    stats = backend.stats()
+    calls = ", ".join(f"{name}={count}" for name, count in sorted(stats["calls"].items()))
+    print(
+        f"{label:<28} {elapsed:>8.2f}s {stats['total_calls']:>6} calls {stats['bytes_sent'] / 1024**2:>8.1f} MiB "
+        f"errors={stats['errors']} throttled={stats['throttled_seconds']}s {outcome}\n{'':<28} {calls}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--annotators", type=int, default=3)
+    parser.add_argument("--files", type=int, default=20)
+    parser.add_argument("--frames", type=int, default=5_000)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--max-calls-per-second", type=float)
+    parser.add_argument("--rate-limit-error-rate", type=float, default=0.0)
+    parser.add_argument("--server-error-rate", type=float, default=0.0)
+    parser.add_argument("--download-workers", type=int, default=DEFAULT_DOWNLOAD_WORKERS)
+    args = parser.parse_args()
+
+    backend = FakeBackend(
+        FakeBackendConfig(
+            num_annotator_projects=args.annotators,
+            num_empty_projects=1,
+            num_files=args.files,
+            data=SyntheticDataSpec(num_frames=args.frames),
+            latency=args.latency,
+            max_calls_per_second=args.max_calls_per_second,
+            rate_limit_error_rate=args.rate_limit_error_rate,
+            server_error_rate=args.server_error_rate,
+        )
+    )
+    user_client = FakeEncordUserClient(backend)
+    projects = get_all_projects(user_client, backend.annotator_project_hashes)
+    print(f"{args.annotators} projects, {args.files} files of {args.frames} frames, {args.latency}s latency\n")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        metadata_cache = MetadataCache()
+        label_row_cache = LabelRowCache(Path(tmp_dir) / "label_rows")
+
+        def download_all(cache):
+            for data_hash in backend.data_hashes:
+                download_label_row_from_projects(projects, data_hash, max_workers=args.download_workers, cache=cache)
+
+        run_scenario("file index (cold)", backend, lambda: build_file_index(user_client, projects, metadata_cache))
+        run_scenario("file index (warm)", backend, lambda: build_file_index(user_client, projects, metadata_cache))
+        run_scenario("download (no cache)", backend, lambda: download_all(None))
+        run_scenario("download (cold cache)", backend, lambda: download_all(label_row_cache))
+        run_scenario("download (warm cache)", backend, lambda: download_all(label_row_cache))
+        target_project_hash = next(p for p in backend.project_titles if p not in backend.annotator_project_hashes)
+        journal = get_sync_journal(
+            backend.annotator_project_hashes[0], [target_project_hash], "COMPLETE", journal_dir=Path(tmp_dir)
+        )
+        run_scenario(
+            "pre-populate workflow",
+            backend,
+            lambda: pre_populate(
+                user_client, backend.annotator_project_hashes[0], [target_project_hash], journal=journal
+            ),
+        )
+
+
+if __name__ == "__main__":
+    main()
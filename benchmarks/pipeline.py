@@ -0,0 +1,238 @@
+"""
+Time every stage of the consensus pipeline on synthetic label rows, and compare the results with a stored baseline.
+
+Each stage is timed over several repeats (the median is reported), then run once more under tracemalloc to measure
+its peak memory. The inputs of a stage are computed beforehand, so only the stage itself is measured.
+
+Usage:
+    python benchmarks/pipeline.py --profile real --save-baseline benchmarks/baselines/real.json
+    python benchmarks/pipeline.py --profile real --baseline benchmarks/baselines/real.json
+"""
+import argparse
+import dataclasses
+import gc
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+from encord_consensus.lib.agreement_metrics import calculate_file_agreement
+from encord_consensus.lib.data_export import (
+    export_regions_of_interest,
+    plan_export,
+    write_export_json,
+)
+from encord_consensus.lib.data_transformation import (
+    OntologyIndex,
+    prepare_compact_data_for_consensus,
+    prepare_data_for_consensus,
+)
+from encord_consensus.lib.frame_label_consensus import (
+    aggregate_by_answer,
+    find_regions_of_interest,
+)
+from encord_consensus.lib.generate_charts import (
+    get_bar_chart,
+    get_consensus_label_agreement_project_view_chart,
+    get_line_chart,
+)
+from encord_consensus.lib.interval_consensus import (
+    aggregate_intervals_by_answer,
+    calculate_frame_level_min_n_agreement_from_intervals,
+    find_interval_regions,
+)
+from encord_consensus.lib.synthetic_data import (
+    SyntheticDataSpec,
+    generate_label_rows,
+    generate_ontology,
+)
+from encord_consensus.lib.vectorized_consensus import (
+    aggregate_votes_by_answer,
+    find_compact_regions_from_votes,
+)
+
+PROFILES: Dict[str, SyntheticDataSpec] = {
+    "small": SyntheticDataSpec(num_annotators=3, num_frames=5_000, num_answers=4),
+    "medium": SyntheticDataSpec(num_annotators=5, num_frames=20_000, num_answers=6, nesting_depth=2),
+    # Our production workload: long videos reviewed by 8 annotators
+    "real": SyntheticDataSpec(
+        num_annotators=8,
+        num_frames=100_000,
+        num_answers=6,
+        nesting_depth=2,
+        label_density=0.6,
+        disagreement_rate=0.15,
+    ),
+    "real-disagreement": SyntheticDataSpec(
+        num_annotators=8,
+        num_frames=100_000,
+        num_answers=6,
+        nesting_depth=2,
+        label_density=0.6,
+        disagreement_rate=0.5,
+        mean_section_length=60,
+    ),
+}
+
+ENGINES = ["legacy", "vectorized", "interval"]
+DEFAULT_REPEATS = 3
+DEFAULT_TOLERANCE = 0.2
+# Slowdowns smaller than this are timer noise, whatever their ratio
+TIME_NOISE_FLOOR = 0.005
+
+
+def _stream_export(regions: List, lr_data: Dict) -> int:
+    with open(os.devnull, "w", encoding="utf-8") as null_file:
+        return write_export_json(plan_export(regions, lr_data), null_file)
+
+
+def build_stages(spec: SyntheticDataSpec, engines: List[str]) -> List[Tuple[str, Callable[[], object]]]:
+    """
+    Generate the data of the spec and return the `(name, run)` stages of the selected engines, in pipeline order.
+    """
+    ontology = generate_ontology(spec)
+    lr_data = generate_label_rows(spec, ontology)
+    ontology_index = OntologyIndex(ontology)
+    project_hashes = list(lr_data)
+    num_annotators = len(project_hashes)
+    project_titles = {project_hash: project_hash for project_hash in project_hashes}
+
+    compact_data = prepare_compact_data_for_consensus(ontology, lr_data, ontology_index=ontology_index)
+    stages = [
+        ("prepare/ontology_index", lambda: OntologyIndex(ontology)),
+        ("prepare/compact", lambda: prepare_compact_data_for_consensus(ontology, lr_data, ontology_index)),
+        ("agreement/file", lambda: calculate_file_agreement(compact_data, project_hashes)),
+    ]
+    if "legacy" in engines:
+        prepared_data = prepare_data_for_consensus(ontology, lr_data, ontology_index=ontology_index)
+        aggregated = aggregate_by_answer(prepared_data)
+        regions = find_regions_of_interest(aggregated, num_annotators)
+        longest = max(regions, key=lambda r: len(r.frame_votes))
+        stages += [
+            ("prepare/legacy", lambda: prepare_data_for_consensus(ontology, lr_data, ontology_index)),
+            ("aggregate/legacy", lambda: aggregate_by_answer(prepared_data)),
+            ("regions/legacy", lambda: find_regions_of_interest(aggregated, num_annotators)),
+            ("export/legacy", lambda: export_regions_of_interest(regions, lr_data)),
+            ("chart/line/legacy", lambda: get_line_chart(longest.frame_vote_counts, "", "x", "y").to_dict()),
+        ]
+    if "vectorized" in engines:
+        aggregated_votes = aggregate_votes_by_answer(compact_data)
+        compact_regions = find_compact_regions_from_votes(aggregated_votes, num_annotators)
+        stages += [
+            ("aggregate/vectorized", lambda: aggregate_votes_by_answer(compact_data)),
+            ("regions/vectorized", lambda: find_compact_regions_from_votes(aggregated_votes, num_annotators)),
+            ("export/vectorized", lambda: export_regions_of_interest(compact_regions, lr_data)),
+        ]
+    if "interval" in engines:
+        aggregated_intervals = aggregate_intervals_by_answer(compact_data)
+        interval_regions = find_interval_regions(aggregated_intervals, num_annotators)
+        longest_interval = max(interval_regions, key=lambda r: r.last_frame - r.first_frame)
+        min_n_agreement = calculate_frame_level_min_n_agreement_from_intervals(aggregated_intervals)
+        stages += [
+            ("aggregate/interval", lambda: aggregate_intervals_by_answer(compact_data)),
+            ("regions/interval", lambda: find_interval_regions(aggregated_intervals, num_annotators)),
+            ("export/interval", lambda: export_regions_of_interest(interval_regions, lr_data)),
+            ("export/stream/interval", lambda: _stream_export(interval_regions, lr_data)),
+            ("chart/line/interval", lambda: get_line_chart(longest_interval.vote_count_runs, "", "x", "y").to_dict()),
+            (
+                "chart/project_view/interval",
+                lambda: get_consensus_label_agreement_project_view_chart(longest_interval, project_titles).to_dict(),
+            ),
+            ("chart/bar/interval", lambda: get_bar_chart(min_n_agreement, "", "x", "y").to_dict()),
+        ]
+    return stages
+
+
+def measure(run: Callable[[], object], repeats: int) -> Dict[str, float]:
+    """Return the median duration of the stage in seconds, and its peak memory in bytes."""
+    durations = []
+    for _ in range(repeats):
+        gc.collect()
+        start = time.perf_counter()
+        run()
+        durations.append(time.perf_counter() - start)
+    gc.collect()
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"seconds": statistics.median(durations), "peak_bytes": peak}
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], tolerance: float) -> bool:
+    """Print the ratio of each stage to the baseline, and return whether any stage regressed beyond the tolerance."""
+    regressed = False
+    print(f"\n{'stage':<30} {'time':>8} {'memory':>8}")
+    for name, result in results.items():
+        if name not in baseline:
+            print(f"{name:<30} {'new':>8} {'new':>8}")
+            continue
+        time_ratio = result["seconds"] / max(baseline[name]["seconds"], 1e-9)
+        memory_ratio = result["peak_bytes"] / max(baseline[name]["peak_bytes"], 1)
+        flags = []
+        if time_ratio > 1 + tolerance and result["seconds"] - baseline[name]["seconds"] > TIME_NOISE_FLOOR:
+            flags.append("time")
+        if memory_ratio > 1 + tolerance:
+            flags.append("memory")
+        regressed |= bool(flags)
+        print(
+            f"{name:<30} {time_ratio:>7.2f}x {memory_ratio:>7.2f}x"
+            + (f"  REGRESSED ({', '.join(flags)})" if flags else "")
+        )
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profile", choices=PROFILES, default="small")
+    parser.add_argument("--annotators", type=int, help="Override the number of annotators of the profile.")
+    parser.add_argument("--frames", type=int, help="Override the number of frames of the profile.")
+    parser.add_argument("--seed", type=int, help="Override the seed of the profile.")
+    parser.add_argument("--engines", nargs="+", choices=ENGINES, default=ENGINES)
+    parser.add_argument("--stages", nargs="+", help="Only run the stages whose name starts with one of these.")
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS)
+    parser.add_argument("--baseline", type=Path, help="Compare the results with this baseline file.")
+    parser.add_argument("--save-baseline", type=Path, help="Write the results to this baseline file.")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=DEFAULT_TOLERANCE,
+        help="Relative slowdown or memory growth over the baseline reported as a regression (default: %(default)s).",
+    )
+    args = parser.parse_args()
+
+    overrides = {"num_annotators": args.annotators, "num_frames": args.frames, "seed": args.seed}
+    spec = dataclasses.replace(PROFILES[args.profile], **{k: v for k, v in overrides.items() if v is not None})
+    print(f"Profile {args.profile}: {spec}")
+    start = time.perf_counter()
+    stages = build_stages(spec, args.engines)
+    print(f"Generated the data and the stage inputs in {time.perf_counter() - start:.1f}s\n")
+
+    results = {}
+    print(f"{'stage':<30} {'time (s)':>10} {'peak (MiB)':>11}")
+    for name, run in stages:
+        if args.stages and not any(name.startswith(prefix) for prefix in args.stages):
+            continue
+        results[name] = measure(run, args.repeats)
+        print(f"{name:<30} {results[name]['seconds']:>10.4f} {results[name]['peak_bytes'] / 1024**2:>11.1f}")
+
+    if args.save_baseline:
+        args.save_baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.save_baseline.write_text(
+            json.dumps({"spec": dataclasses.asdict(spec), "results": results}, indent=2) + "\n"
+        )
+        print(f"\nSaved the baseline to {args.save_baseline}")
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())
+        if baseline["spec"] != dataclasses.asdict(spec):
+            print(f"\nWARNING: the baseline was measured on different data: {baseline['spec']}")
+        if compare(results, baseline["results"], args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
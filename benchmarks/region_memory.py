@@ -0,0 +1,100 @@
+"""
+Compare the memory and time needed to hold the regions of interest of a long video
+as pydantic `RegionOfInterest` models, slotted `CompactRegion`s and `IntervalRegion`s.
+
+Usage: python benchmarks/region_memory.py --annotators 8 --frames 90000 --answers 5
+"""
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+
+import numpy as np
+
+from encord_consensus.lib.data_model import CompactAnswer, CompactClassificationView
+from encord_consensus.lib.interval_consensus import (
+    aggregate_intervals_by_answer,
+    find_interval_regions,
+)
+from encord_consensus.lib.vectorized_consensus import (
+    aggregate_votes_by_answer,
+    find_compact_regions_from_votes,
+)
+
+
+def generate_prepared_data(
+    num_annotators: int, num_frames: int, num_answers: int, num_sections: int, seed: int = 0
+) -> list[CompactClassificationView]:
+    rng = random.Random(seed)
+    answers = [
+        CompactAnswer(
+            classification_answers={"classifications": []},
+            name="question",
+            value="question",
+            feature_hash="feature_hash",
+            fq_name=f"question=answer_{idx}",
+            fq_parts=(),
+        )
+        for idx in range(num_answers)
+    ]
+    section_length = num_frames // num_sections
+    prepared_data = []
+    for annotator in range(num_annotators):
+        for answer in answers:
+            frames = []
+            for section in range(num_sections):
+                if rng.random() < 0.8:
+                    # Annotators roughly agree on each section, with some jitter at its boundaries
+                    start = section * section_length + rng.randint(0, section_length // 10)
+                    end = (section + 1) * section_length - rng.randint(section_length // 10, section_length // 4)
+                    frames.extend(range(start, end))
+            if frames:
+                prepared_data.append(
+                    CompactClassificationView(
+                        answer=answer,
+                        frames=np.asarray(frames, dtype=np.int64),
+                        source_project_hash=f"project_{annotator}",
+                    )
+                )
+    return prepared_data
+
+
+def measure(label: str, build) -> None:
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    regions = build()
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"{label:<20} {len(regions):>8} regions {elapsed:>8.3f}s "
+        f"{current / len(regions) / 1024:>10.1f} KiB/region (retained) {peak / 1024**2:>9.1f} MiB peak"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--annotators", type=int, default=8)
+    parser.add_argument("--frames", type=int, default=90_000)
+    parser.add_argument("--answers", type=int, default=5)
+    parser.add_argument("--sections", type=int, default=20, help="Number of labelled sections per answer.")
+    args = parser.parse_args()
+
+    prepared_data = generate_prepared_data(args.annotators, args.frames, args.answers, args.sections)
+    aggregated_votes = aggregate_votes_by_answer(prepared_data)
+    aggregated_intervals = aggregate_intervals_by_answer(prepared_data)
+    print(f"{args.annotators} annotators, {args.frames} frames, {args.answers} answers")
+    measure("IntervalRegion", lambda: find_interval_regions(aggregated_intervals, args.annotators))
+    measure("CompactRegion", lambda: find_compact_regions_from_votes(aggregated_votes, args.annotators))
+    measure(
+        "RegionOfInterest",
+        lambda: [
+            r.to_region_of_interest() for r in find_compact_regions_from_votes(aggregated_votes, args.annotators)
+        ],
+    )
+
+
+if __name__ == "__main__":
+    main()
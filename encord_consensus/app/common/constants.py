@@ -14,3 +14,9 @@ INSPECT_FILES_PAGE_TITLE = f"{INSPECT_FILES_PAGE_ICON} {INSPECT_FILES_PAGE_NAME}
 WORKFLOWS_PAGE_ICON = "🕸️"
 WORKFLOWS_PAGE_NAME = "Workflows"
 WORKFLOWS_PAGE_TITLE = f"{WORKFLOWS_PAGE_ICON} {WORKFLOWS_PAGE_NAME}"
+
+# ---------- PAGINATION ----------
+FILES_PER_PAGE = 25
+REGIONS_PER_PAGE = 10
+# Number of files after the selected one whose previews are fetched in the background
+PREVIEW_PREFETCH_COUNT = 5
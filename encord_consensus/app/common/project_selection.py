@@ -1,12 +1,19 @@
 import streamlit as st
 
 from encord_consensus.app.common.state import get_state, InspectFilesState
-from encord_consensus.lib.project_access import get_all_dataset_hashes, list_projects
+from encord_consensus.lib.label_row_cache import get_default_label_row_cache
+from encord_consensus.lib.project_access import (
+    download_label_row_from_projects,
+    get_all_dataset_hashes,
+    get_default_metadata_cache,
+    get_project,
+    list_projects,
+)
 
 
 def add_project(project_hash: str):
     encord_client = get_state().encord_client
-    project = encord_client.get_project(project_hash)
+    project = get_project(encord_client, project_hash, cache=get_default_metadata_cache())
     datasets = get_all_dataset_hashes(project)
 
     if len(get_state().projects) > 0:
@@ -23,20 +30,47 @@ def add_project(project_hash: str):
             return
 
     get_state().projects.append(project)
-    get_state().inspect_files_state = InspectFilesState(data_hash=None)
+    get_state().forget_recent_files()
+
+    # Patch the consensus of the selected file with the new project instead of recomputing it from scratch
+    inspect_files_state = get_state().inspect_files_state
+    if inspect_files_state.consensus is None or inspect_files_state.data_hash is None:
+        get_state().inspect_files_state = InspectFilesState(data_hash=None)
+        return
+    try:
+        lr_data = download_label_row_from_projects(
+            [project], inspect_files_state.data_hash, cache=get_default_label_row_cache()
+        )
+    except Exception as e:
+        st.warning(e)
+        get_state().inspect_files_state = InspectFilesState(data_hash=None)
+        return
+    inspect_files_state.lr_data.update(lr_data)
+    inspect_files_state.consensus.set_label_rows(lr_data)
+    inspect_files_state.sync_consensus_results()
+    get_state().enforce_memory_budget()
 
 
 def remove_project(project_hash):
     project_index = next((i for i, p in enumerate(get_state().projects) if p.project_hash == project_hash), None)
     if project_index is not None:
         get_state().projects.pop(project_index)
-    get_state().inspect_files_state = InspectFilesState(data_hash=None)
+    get_state().forget_recent_files()
+
+    inspect_files_state = get_state().inspect_files_state
+    if inspect_files_state.consensus is None or inspect_files_state.data_hash is None or not get_state().projects:
+        get_state().inspect_files_state = InspectFilesState(data_hash=None)
+        return
+    inspect_files_state.lr_data.pop(project_hash, None)
+    inspect_files_state.consensus.remove_project(project_hash)
+    inspect_files_state.sync_consensus_results()
+    get_state().enforce_memory_budget()
 
 
 def search_projects():
     text_search = st.text_input("Search projects by title", value="")
     if text_search:
-        matched_projects = list_projects(get_state().encord_client, text_search)
+        matched_projects = list_projects(get_state().encord_client, text_search, cache=get_default_metadata_cache())
         for proj in matched_projects:
             proj_hash = proj["project"].project_hash
             emp = st.empty()
@@ -49,3 +83,4 @@ def search_projects():
 def reset_project_selection_state():
     get_state().reference_project = None
     get_state().projects = []
+    get_state().forget_recent_files()
@@ -1,4 +1,7 @@
+import logging
 import os
+import uuid
+from collections import OrderedDict
 from dataclasses import dataclass, field
 from enum import Enum
 
@@ -6,8 +9,18 @@ import streamlit as st
 from dotenv import load_dotenv
 from encord import EncordUserClient, Project
 
-from encord_consensus.lib.data_model import RegionOfInterest
-from encord_consensus.lib.project_access import get_encord_client
+from encord_consensus.lib.data_model import IntervalRegion
+from encord_consensus.lib.data_transformation import slim_label_row
+from encord_consensus.lib.file_index import FileIndex
+from encord_consensus.lib.incremental_consensus import IncrementalConsensus
+from encord_consensus.lib.project_access import get_default_encord_client_pool
+from encord_consensus.lib.region_index import RegionIndex
+from encord_consensus.lib.session_memory import (
+    estimate_size,
+    get_default_session_memory_registry,
+    read_session_memory_budget,
+)
+from encord_consensus.lib.tracing import configure_tracing_outputs
 
 
 class StateKey(str, Enum):
@@ -23,12 +36,33 @@ class InspectFilesState:
     lr_data: dict = field(default_factory=dict)
     consensus_has_been_calculated: bool = False
     fl_integrated_agreement: dict[int, int] = field(default_factory=dict)
-    regions_of_interest: list[RegionOfInterest] = field(default_factory=list)
+    regions_of_interest: list[IntervalRegion] = field(default_factory=list)
+    region_index: RegionIndex = field(default_factory=lambda: RegionIndex([]))
     regions_to_export: set = field(default_factory=set)
     data_export: dict = field(default_factory=dict)
     pickers_to_show: set = field(default_factory=set)
     min_agreement_slider: int = 1
     min_integrated_score_slider: float = 0
+    consensus: IncrementalConsensus | None = None
+    # Estimated size of the label rows and consensus results of the file, refreshed with the results
+    memory_bytes: int = 0
+
+    def sync_consensus_results(self):
+        """
+        Refresh the consensus results after the incremental consensus has been patched.
+        The label rows are slimmed down, their classifications are kept by the incremental consensus.
+        """
+        self.lr_data = {project_hash: slim_label_row(lr) for project_hash, lr in self.lr_data.items()}
+        self.regions_of_interest = self.consensus.regions
+        self.region_index = RegionIndex(self.regions_of_interest)
+        self.fl_integrated_agreement = self.consensus.frame_level_min_n_agreement
+        region_hashes = {hash(region) for region in self.regions_of_interest}
+        self.regions_to_export &= region_hashes
+        self.pickers_to_show &= region_hashes
+        self.data_export = {}
+        self.memory_bytes = estimate_size(
+            [self.lr_data, self.consensus, self.regions_of_interest, self.region_index, self.fl_integrated_agreement]
+        )
 
 
 @dataclass
@@ -44,13 +78,74 @@ class State:
     projects: list[Project] = field(default_factory=list)
     reference_project: Project | None = None
     show_element: bool = False
+    file_index: FileIndex | None = None
+    # The projects the file index was built for
+    file_index_project_hashes: tuple[str, ...] = ()
+    # The files inspected before the current one, least recently inspected first, kept within the memory budget
+    recent_files: OrderedDict[str, InspectFilesState] = field(default_factory=OrderedDict)
+    memory_budget: int = field(default_factory=read_session_memory_budget)
+    session_id: str = field(default_factory=lambda: uuid.uuid4().hex[:8])
 
     @classmethod
     def init(cls):
         if st.session_state.get(StateKey.GLOBAL) is None:
             load_dotenv(encoding="utf-8")
-            encord_client = get_encord_client(os.getenv("ENCORD_KEYFILE"))
+            configure_tracing_outputs()
+            # The client is shared with the other sessions of the process
+            encord_client = get_default_encord_client_pool().get(os.getenv("ENCORD_KEYFILE"))
             st.session_state[StateKey.GLOBAL] = State(encord_client=encord_client)
+            st.session_state[StateKey.GLOBAL].enforce_memory_budget()
+
+    def switch_inspected_file(self, data_hash: str) -> InspectFilesState:
+        """
+        Make `data_hash` the inspected file. The consensus of the current file is kept among the recent files, and
+        the one of `data_hash` is restored if it was kept.
+        """
+        self.keep_recent_file(self.inspect_files_state)
+        self.inspect_files_state = self.recent_files.pop(data_hash, None) or InspectFilesState(data_hash=data_hash)
+        return self.inspect_files_state
+
+    def close_inspected_file(self) -> None:
+        """Go back to the file selection, keeping the consensus of the inspected file among the recent files."""
+        self.keep_recent_file(self.inspect_files_state)
+        self.inspect_files_state = InspectFilesState(data_hash=None)
+        self.enforce_memory_budget()
+
+    def keep_recent_file(self, inspect_files_state: InspectFilesState) -> None:
+        """Keep the consensus of a file as the most recently inspected one, if it has been calculated."""
+        if inspect_files_state.data_hash is not None and inspect_files_state.consensus_has_been_calculated:
+            self.recent_files[inspect_files_state.data_hash] = inspect_files_state
+            self.recent_files.move_to_end(inspect_files_state.data_hash)
+
+    def forget_recent_files(self) -> None:
+        """Drop the consensus of the recent files, e.g. once they no longer match the selected projects."""
+        self.recent_files.clear()
+        self.enforce_memory_budget()
+
+    def memory_footprint(self) -> dict[str, int]:
+        """Return the estimated number of bytes of each part of the session's data."""
+        return {
+            "inspected_file": self.inspect_files_state.memory_bytes,
+            "recent_files": sum(state.memory_bytes for state in self.recent_files.values()),
+            "file_index": estimate_size(self.file_index) if self.file_index is not None else 0,
+        }
+
+    def enforce_memory_budget(self) -> None:
+        """
+        Evict the least recently inspected files until the session fits in its memory budget, and report its
+        footprint. The inspected file and the file index are never evicted.
+        """
+        footprint = self.memory_footprint()
+        while self.recent_files and sum(footprint.values()) > self.memory_budget:
+            data_hash, evicted = self.recent_files.popitem(last=False)
+            footprint["recent_files"] -= evicted.memory_bytes
+            logging.info(f"Session {self.session_id}: evicted the consensus of {data_hash} to fit the memory budget.")
+        if sum(footprint.values()) > self.memory_budget:
+            logging.warning(
+                f"Session {self.session_id} uses {sum(footprint.values()) / 1024**2:.1f} MiB, "
+                f"over its {self.memory_budget / 1024**2:.0f} MiB memory budget."
+            )
+        get_default_session_memory_registry().report(self.session_id, self, footprint)
 
 
 def has_state():
@@ -0,0 +1,105 @@
+import pandas as pd
+import streamlit as st
+
+from encord_consensus.app.common.state import get_state
+from encord_consensus.lib.fake_encord import get_fake_backend, is_fake_backend_enabled
+from encord_consensus.lib.label_row_cache import get_default_label_row_cache
+from encord_consensus.lib.project_access import (
+    get_default_encord_client_pool,
+    get_default_metadata_cache,
+    get_label_row_downloads,
+)
+from encord_consensus.lib.session_memory import get_default_session_memory_registry
+from encord_consensus.lib.tracing import get_tracer
+
+
+def _to_mib(num_bytes: int) -> float:
+    return round(num_bytes / 1024**2, 1)
+
+
+def _shared_cache_stats() -> pd.DataFrame:
+    """The hits, misses and coalesced calls of the caches shared by all the sessions."""
+    label_row_cache_stats = get_default_label_row_cache().stats
+    rows = [
+        {"cache": "encord_client", **get_default_encord_client_pool().stats},
+        *({"cache": kind, **kind_stats} for kind, kind_stats in get_default_metadata_cache().stats.items()),
+        {
+            "cache": "label_row",
+            "hits": label_row_cache_stats["hits"],
+            "misses": label_row_cache_stats["misses"],
+            "coalesced": get_label_row_downloads().stats["coalesced"],
+            "entries": label_row_cache_stats["entries"],
+        },
+    ]
+    return pd.DataFrame(rows, columns=["cache", "hits", "misses", "coalesced", "entries"])
+
+
+def show_tracing_panel():
+    """
+    Show the memory used by the session, and the timings of the Encord calls and pipeline stages, the memory of
+    all the sessions and the stats of the shared caches in the sidebar, when enabled by its checkbox.
+    The spans are shared by all the sessions of the app process.
+    """
+    state = get_state()
+    footprints = get_default_session_memory_registry().footprints()
+    session_footprint = footprints.get(state.session_id, {})
+    st.sidebar.caption(
+        f"Session memory: {_to_mib(sum(session_footprint.values()))} of {_to_mib(state.memory_budget)} MiB "
+        f"({len(state.recent_files)} recent files kept)"
+    )
+    if not st.sidebar.checkbox("Show timings", key="show_tracing_panel"):
+        return
+    st.sidebar.write("### Sessions memory (MiB)")
+    sessions_df = pd.DataFrame(
+        [
+            {
+                "session": session_id,
+                **{part: _to_mib(num_bytes) for part, num_bytes in footprint.items()},
+                "total": _to_mib(sum(footprint.values())),
+            }
+            for session_id, footprint in footprints.items()
+        ]
+    )
+    st.sidebar.dataframe(sessions_df, hide_index=True, use_container_width=True)
+    st.sidebar.write("### Shared caches")
+    st.sidebar.dataframe(_shared_cache_stats(), hide_index=True, use_container_width=True)
+    if is_fake_backend_enabled():
+        st.sidebar.write("### Fake Encord backend")
+        st.sidebar.json(get_fake_backend().stats())
+    tracer = get_tracer()
+    stats = tracer.stats()
+    if not stats:
+        st.sidebar.caption("No spans recorded yet.")
+        return
+    st.sidebar.write("### Timings")
+    stats_df = pd.DataFrame(
+        [
+            {
+                "span": name,
+                "calls": s.count,
+                "total (s)": round(s.total_seconds, 3),
+                "mean (ms)": round(s.mean_seconds * 1000, 1),
+                "max (ms)": round(s.max_seconds * 1000, 1),
+                "payload": s.total_payload_size,
+                "errors": s.errors,
+            }
+            for name, s in stats.items()
+        ]
+    ).sort_values("total (s)", ascending=False)
+    st.sidebar.dataframe(stats_df, hide_index=True, use_container_width=True)
+
+    st.sidebar.write("### Recent spans")
+    recent_df = pd.DataFrame(
+        [
+            {
+                "span": span.name,
+                "parent": span.parent,
+                "ms": round(span.seconds * 1000, 1),
+                "payload": span.payload_size,
+                "error": span.error,
+            }
+            for span in reversed(tracer.recent_spans())
+        ]
+    )
+    st.sidebar.dataframe(recent_df, hide_index=True, use_container_width=True)
+    st.sidebar.button("Reset timings", on_click=tracer.reset)
@@ -8,6 +8,7 @@ from encord_consensus.app.common.constants import (
 from encord_consensus.app.common.css import set_page_css
 from encord_consensus.app.common.project_selection import remove_project, search_projects
 from encord_consensus.app.common.state import State, get_state
+from encord_consensus.app.common.tracing_panel import show_tracing_panel
 
 
 def render_choose_projects_page():
@@ -15,6 +16,7 @@ def render_choose_projects_page():
     set_page_css()
     st.write(f"# {CHOOSE_PROJECT_PAGE_TITLE}")
     State.init()
+    show_tracing_panel()
 
     if len(get_state().projects) > 0:
         st.write("## Selected Projects")
@@ -1,3 +1,6 @@
+import math
+from typing import List
+
 import streamlit as st
 from encord.constants.enums import DataType
 from encord.project import Project
@@ -8,69 +11,129 @@ from encord_consensus.app.common.constants import (
     CHOOSE_PROJECT_PAGE_TITLE,
     CONSENSUS_BROWSER_TAB_TITLE,
     ENCORD_ICON_URL,
+    FILES_PER_PAGE,
     INSPECT_FILES_PAGE_TITLE,
+    PREVIEW_PREFETCH_COUNT,
+    REGIONS_PER_PAGE,
 )
 from encord_consensus.app.common.css import set_page_css
 from encord_consensus.app.common.state import InspectFilesState, State, get_state
+from encord_consensus.app.common.tracing_panel import show_tracing_panel
 from encord_consensus.lib.constants import SUPPORTED_DATA_TYPES
 from encord_consensus.lib.data_export import export_regions_of_interest
-from encord_consensus.lib.data_model import RegionOfInterest
-from encord_consensus.lib.data_transformation import prepare_data_for_consensus
-from encord_consensus.lib.frame_label_consensus import (
-    aggregate_by_answer,
-    calculate_frame_level_min_n_agreement,
-    find_regions_of_interest,
-)
+from encord_consensus.lib.data_model import IntervalRegion
+from encord_consensus.lib.data_transformation import get_ontology_index
+from encord_consensus.lib.file_index import FileIndex, build_file_index
 from encord_consensus.lib.generate_charts import (
     get_bar_chart,
     get_consensus_label_agreement_project_view_chart,
     get_line_chart,
 )
+from encord_consensus.lib.incremental_consensus import IncrementalConsensus
+from encord_consensus.lib.label_row_cache import get_default_label_row_cache
+from encord_consensus.lib.preview import get_default_preview_service
 from encord_consensus.lib.project_access import (
+    CacheKind,
     download_label_row_from_projects,
-    get_all_dataset_hashes,
-    list_all_data_rows, get_or_create_label_row,
+    get_default_metadata_cache,
+    get_label_row_metadata,
+    get_project,
+    save_export_to_label_row,
 )
+from encord_consensus.lib.tracing import span
 from encord_consensus.lib.workflow_utils import get_downstream_copy_workflow_for_selection
 
 st.set_page_config(page_title=CONSENSUS_BROWSER_TAB_TITLE, page_icon=ENCORD_ICON_URL)
 set_page_css()
 st.write(f"# {INSPECT_FILES_PAGE_TITLE}")
 State.init()
+show_tracing_panel()
 
 
 def show_file_thumbnail(encord_project: Project, file_data_hash: str):
-    # NOTE: Using obsolete LabelRow class instead of LabelRowV2 because LabelRowV2 can't retrieve signed urls
-    # Ensure that the label row corresponding to the data hash exists in the platform (label_hash must not be `None`)
-    lr_metadata = encord_project.list_label_rows(data_hashes=[file_data_hash], include_uninitialised_labels=True)[0]
-    if lr_metadata.label_hash is None:
-        lr = encord_project.create_label_row(lr_metadata.data_hash)
-    else:
-        lr = encord_project.get_label_row(lr_metadata.label_hash)
-
-    if DataType(lr.data_type) not in SUPPORTED_DATA_TYPES:
-        # add logs to trace inadequate uses
+    # Only the media metadata is fetched, label rows are never downloaded or created to show a preview
+    preview = get_default_preview_service().get(encord_project, file_data_hash)
+    if preview is None or preview.data_type not in SUPPORTED_DATA_TYPES:
         return
 
-    if lr.data_type == DataType.IMAGE.value:
-        signed_url = next(iter(lr.data_units.values()), dict()).get("data_link")
-        st.image(signed_url)
-    elif lr.data_type == DataType.VIDEO.value:
-        signed_url = next(iter(lr.data_units.values()), dict()).get("data_link")
-        st.video(signed_url)
+    if preview.data_type == DataType.IMAGE:
+        st.image(preview.signed_url)
+    elif preview.data_type == DataType.VIDEO:
+        st.video(preview.signed_url)
+
+
+def get_file_index() -> FileIndex:
+    project_hashes = tuple(p.project_hash for p in get_state().projects)
+    if get_state().file_index is None or get_state().file_index_project_hashes != project_hashes:
+        with st.spinner("Indexing files..."):
+            get_state().file_index = build_file_index(
+                get_state().encord_client, get_state().projects, cache=get_default_metadata_cache()
+            )
+            get_state().file_index_project_hashes = project_hashes
+        get_state().enforce_memory_budget()
+    return get_state().file_index
+
+
+def refresh_file_index() -> None:
+    get_default_metadata_cache().invalidate(CacheKind.DATA_ROWS)
+    get_state().file_index = None
+    reset_file_page()
+
 
+def reset_file_page() -> None:
+    st.session_state["file_page"] = 1
 
-def select_data_hash(data_hash: str) -> None:
+
+def reset_region_page() -> None:
+    st.session_state["region_page"] = 1
+
+
+def select_data_hash(data_hash: str, next_data_hashes: List[str]) -> None:
+    # Fetch the previews while the labels download, so the next files in the list show up instantly too
+    get_default_preview_service().prefetch(get_state().projects[0], [data_hash] + next_data_hashes)
     with st.spinner("Downloading data..."):
-        get_state().inspect_files_state = InspectFilesState(data_hash=data_hash)
+        inspect_files_state = get_state().switch_inspected_file(data_hash)
         try:
-            get_state().inspect_files_state.lr_data = download_label_row_from_projects(get_state().projects, data_hash)
+            lr_data = download_label_row_from_projects(
+                get_state().projects, data_hash, cache=get_default_label_row_cache()
+            )
         except Exception as e:
             st.warning(e)
+            # Keep the restored consensus of the file for the next attempt
+            get_state().keep_recent_file(inspect_files_state)
+            get_state().inspect_files_state = InspectFilesState(data_hash=data_hash)
+            return
+        inspect_files_state.lr_data = lr_data
+        if inspect_files_state.consensus is not None:
+            # The consensus of a recently inspected file is only patched with the label rows edited since then
+            inspect_files_state.consensus.set_label_rows(lr_data)
+            inspect_files_state.sync_consensus_results()
+    get_state().enforce_memory_budget()
 
 
 def reset_data_hash_selection() -> None:
-    get_state().inspect_files_state.data_hash = None
+    get_state().close_inspected_file()
+
+
+def refresh_label_rows() -> None:
+    inspect_files_state = get_state().inspect_files_state
+    for project in get_state().projects:
+        get_default_metadata_cache().invalidate(
+            CacheKind.LABEL_ROW_METADATA, (project.project_hash, inspect_files_state.data_hash)
+        )
+    with st.spinner("Refreshing labels..."):
+        try:
+            # Label rows that haven't been edited are served by the cache and left untouched by the consensus
+            inspect_files_state.lr_data = download_label_row_from_projects(
+                get_state().projects, inspect_files_state.data_hash, cache=get_default_label_row_cache(), refresh=True
+            )
+        except Exception as e:
+            st.warning(e)
+            return
+    if inspect_files_state.consensus is not None:
+        inspect_files_state.consensus.set_label_rows(inspect_files_state.lr_data)
+        inspect_files_state.sync_consensus_results()
+        get_state().enforce_memory_budget()
 
 
 def set_picker(to_pick: int) -> None:
@@ -80,7 +143,7 @@ def set_picker(to_pick: int) -> None:
         get_state().inspect_files_state.pickers_to_show.add(to_pick)
 
 
-def select_region(region: RegionOfInterest):
+def select_region(region: IntervalRegion):
     region_hash = hash(region)
     if region_hash not in get_state().inspect_files_state.regions_to_export:
         get_state().inspect_files_state.regions_to_export.add(region_hash)
@@ -89,19 +152,20 @@ def select_region(region: RegionOfInterest):
 
 
 def send_downstream(target_project_hash: str) -> None:
+    regions_to_export = get_state().inspect_files_state.regions_to_export
     export = export_regions_of_interest(
-        regions=get_state().inspect_files_state.regions_of_interest,
+        regions=[
+            region
+            for region in get_state().inspect_files_state.regions_of_interest
+            if hash(region) in regions_to_export
+        ],
         lr_data=get_state().inspect_files_state.lr_data,
-        region_hashes_to_include=get_state().inspect_files_state.regions_to_export,
+        region_hashes_to_include=regions_to_export,
     )
     user_client = get_state().encord_client
-    project = user_client.get_project(target_project_hash)
-    data_hash = export['data_hash']
-    matched_rows = [lrm for lrm in project.label_rows if lrm['data_hash'] == data_hash]
-    label_row = get_or_create_label_row(project, matched_rows[0])
-    label_row['data_units'][data_hash]['labels'] = export['data_units'][data_hash]['labels']
-    label_row['classification_answers'] = export['classification_answers']
-    project.save_label_row(label_row['label_hash'], label_row)
+    project = get_project(user_client, target_project_hash, cache=get_default_metadata_cache())
+    label_row_metadata = get_label_row_metadata(project, export['data_hash'])
+    save_export_to_label_row(project, label_row_metadata, export)
     st.info('Copied successfully!')
 
 
@@ -119,21 +183,29 @@ if len(get_state().projects) == 0:
 
 if not get_state().inspect_files_state.data_hash:
     st.write("## Select the file to run consensus on")
-    for dr in list_all_data_rows(
-            get_state().encord_client, get_all_dataset_hashes(get_state().projects[0]), data_types=SUPPORTED_DATA_TYPES
-    ):
+    file_index = get_file_index()
+    col1, col2 = st.columns([9, 3])
+    file_search_query = col1.text_input("Search files by title", key="file_search_query", on_change=reset_file_page)
+    col2.button("Refresh File List", on_click=refresh_file_index)
+    num_matching_files = file_index.count(file_search_query)
+    num_pages = max(1, math.ceil(num_matching_files / FILES_PER_PAGE))
+    file_page = st.number_input(f"Page (out of {num_pages})", min_value=1, max_value=num_pages, key="file_page")
+    files, _ = file_index.search(file_search_query, page=file_page - 1, page_size=FILES_PER_PAGE)
+    st.caption(f"{num_matching_files} of {len(file_index)} files")
+    for idx, entry in enumerate(files):
         emp = st.empty()
-        col1, col2 = emp.columns([9, 3])
-        col1.markdown(dr.title, unsafe_allow_html=True)
-        col2.button(
+        col1, col2, col3 = emp.columns([6, 3, 3])
+        col1.markdown(entry.title, unsafe_allow_html=True)
+        col2.caption(" / ".join(sorted({status or "NO_TASK" for status in entry.annotation_status.values()})))
+        col3.button(
             "Select",
-            key=f"select_{dr.uid}",
+            key=f"select_{entry.data_hash}",
             on_click=select_data_hash,
-            args=(dr.uid,),
-            disabled=get_state().inspect_files_state == dr.uid,
+            args=(entry.data_hash, [e.data_hash for e in files[idx + 1: idx + 1 + PREVIEW_PREFETCH_COUNT]]),
         )
 else:
     st.button('Reset File Selection', on_click=reset_data_hash_selection)
+    st.button('Refresh Labels', on_click=refresh_label_rows)
 
 if get_state().inspect_files_state.data_hash is None:
     exit(0)
@@ -149,28 +221,27 @@ if len(get_state().inspect_files_state.lr_data) > 0:
     total_num_annnotators = len(get_state().projects)
     if not get_state().inspect_files_state.consensus_has_been_calculated:
         with st.spinner("Processing data..."):
-            prepared_data = prepare_data_for_consensus(
-                get_state().projects[0].ontology["classifications"], get_state().inspect_files_state.lr_data
-            )
-            aggregated_data = aggregate_by_answer(prepared_data)
-            get_state().inspect_files_state.fl_integrated_agreement = calculate_frame_level_min_n_agreement(
-                aggregated_data
-            )
-            get_state().inspect_files_state.regions_of_interest = find_regions_of_interest(
-                aggregated_data, total_num_annnotators
+            ontology = get_state().projects[0].ontology["classifications"]
+            consensus = IncrementalConsensus(
+                ontology, ontology_index=get_ontology_index(get_state().projects[0].ontology_hash, ontology)
             )
+            consensus.set_label_rows(get_state().inspect_files_state.lr_data)
+            get_state().inspect_files_state.consensus = consensus
+            get_state().inspect_files_state.sync_consensus_results()
             get_state().inspect_files_state.consensus_has_been_calculated = True
+            get_state().enforce_memory_budget()
     st.write("## Consensus Section")
     st.write("### Consensus Agreement Report")
-    st.altair_chart(
-        get_bar_chart(
-            get_state().inspect_files_state.fl_integrated_agreement,
-            title="Consensus on Annotations by Number of Contributors",
-            x_title="Concurring annotators",
-            y_title="Number of annotations",
-        ),
-        use_container_width=True,
-    )
+    with span("chart.render.bar"):
+        st.altair_chart(
+            get_bar_chart(
+                get_state().inspect_files_state.fl_integrated_agreement,
+                title="Consensus on Annotations by Number of Contributors",
+                x_title="Concurring annotators",
+                y_title="Number of annotations",
+            ),
+            use_container_width=True,
+        )
     st.write("### Consensus Analysis Tool")
     st.write(f"There are a total of {total_num_annnotators} annotators that could agree.")
     get_state().inspect_files_state.min_agreement_slider = st.slider(
@@ -179,6 +250,7 @@ if len(get_state().inspect_files_state.lr_data) > 0:
         max_value=total_num_annnotators,
         value=total_num_annnotators,
         step=1,
+        on_change=reset_region_page,
     )
     get_state().inspect_files_state.min_integrated_score_slider = st.slider(
         "Minimum Integrated Agreement Score",
@@ -187,52 +259,70 @@ if len(get_state().inspect_files_state.lr_data) > 0:
         value=0.0,
         step=0.05,
         key="min_integrated_score_slider",
+        on_change=reset_region_page,
     )
 
-    for region in get_state().inspect_files_state.regions_of_interest:
-        if (
-                region.consensus_data.max_agreement >= get_state().inspect_files_state.min_agreement_slider
-                and region.consensus_data.integrated_agreement_score
-                >= get_state().inspect_files_state.min_integrated_score_slider
-        ):
-            st.checkbox(
-                "Select",
-                on_change=select_region,
-                args=(region,),
-                key=f"select_{hash(region)}",
-            )
+    region_index = get_state().inspect_files_state.region_index
+    num_matching_regions = region_index.count(
+        get_state().inspect_files_state.min_agreement_slider,
+        get_state().inspect_files_state.min_integrated_score_slider,
+    )
+    num_region_pages = max(1, math.ceil(num_matching_regions / REGIONS_PER_PAGE))
+    region_page = st.number_input(
+        f"Page (out of {num_region_pages})", min_value=1, max_value=num_region_pages, key="region_page"
+    )
+    st.caption(
+        f"{num_matching_regions} of {len(region_index)} regions, "
+        "sorted by agreement and integrated agreement score"
+    )
+    # Only the regions of the visible page are rendered, and their charts built
+    for region in region_index.top(
+        get_state().inspect_files_state.min_agreement_slider,
+        get_state().inspect_files_state.min_integrated_score_slider,
+        page=region_page - 1,
+        page_size=REGIONS_PER_PAGE,
+    ):
+        # Checkboxes of the regions on other pages are not rendered, restore their value from the selection
+        st.checkbox(
+            "Select",
+            value=hash(region) in get_state().inspect_files_state.regions_to_export,
+            on_change=select_region,
+            args=(region,),
+            key=f"select_{hash(region)}",
+        )
 
-            mini_report = (
-                    f"Mini Report\nIntegrated Agreement Score: {region.consensus_data.integrated_agreement_score}\n\n"
-                    + "\n".join(
+        mini_report = (
+            f"Mini Report\nIntegrated Agreement Score: {region.consensus_data.integrated_agreement_score}\n\n"
+            + "\n".join(
                 [
                     f"At least {k} annotators agreeing: {v} frames"
                     for k, v in region.consensus_data.min_n_agreement.items()
                 ]
             )
-                    + "\n\nN Scores\n"
-                    + "\n".join([f"{n}-score: {s}" for n, s in region.consensus_data.n_scores.items()])
-            )
-            identifier_text = f"Region number {region.region_number}\n\nSelected Answers\n"
-            for idx, part in enumerate(region.answer.fq_parts):
-                identifier_text += (idx * "\t") + f"{part.question}: {part.answer}\n"
-            st.code(f"{identifier_text}\n{mini_report}")
-
-            lr = next(iter(get_state().inspect_files_state.lr_data.values()))
-            if lr.data_type == DataType.IMAGE.value:
-                continue
-
-            st.button(
-                "Toggle Chart",
-                on_click=set_picker,
-                args=(hash(region),),
-                key=f"show_{hash(region)}",
-            )
+            + "\n\nN Scores\n"
+            + "\n".join([f"{n}-score: {s}" for n, s in region.consensus_data.n_scores.items()])
+        )
+        identifier_text = f"Region number {region.region_number}\n\nSelected Answers\n"
+        for idx, part in enumerate(region.answer.fq_parts):
+            identifier_text += (idx * "\t") + f"{part.question}: {part.answer}\n"
+        st.code(f"{identifier_text}\n{mini_report}")
+
+        lr = next(iter(get_state().inspect_files_state.lr_data.values()))
+        if lr.data_type == DataType.IMAGE.value:
+            continue
+
+        st.button(
+            "Toggle Chart",
+            on_click=set_picker,
+            args=(hash(region),),
+            key=f"show_{hash(region)}",
+        )
 
-            if hash(region) not in get_state().inspect_files_state.pickers_to_show:
+        if hash(region) not in get_state().inspect_files_state.pickers_to_show:
+            with span("chart.render.line"):
                 st.altair_chart(
                     get_line_chart(
-                        region.frame_vote_counts,
+                        region.vote_count_runs,
                         title="Agreement on the Consensus Label (Count per Frame)",
                         x_title="Timeline frames",
                         y_title="Concurring  annotators",
@@ -240,10 +330,11 @@ if len(get_state().inspect_files_state.lr_data) > 0:
                     use_container_width=True,
                 )
 
-            if hash(region) in get_state().inspect_files_state.pickers_to_show:
-                project_title_lookup = {p.project_hash: p.title for p in get_state().projects}
-                chart = get_consensus_label_agreement_project_view_chart(region, project_title_lookup)
-                if chart is not None:
+        if hash(region) in get_state().inspect_files_state.pickers_to_show:
+            project_title_lookup = {p.project_hash: p.title for p in get_state().projects}
+            chart = get_consensus_label_agreement_project_view_chart(region, project_title_lookup)
+            if chart is not None:
+                with span("chart.render.project_view"):
                     st.altair_chart(chart.interactive(bind_y=False), use_container_width=True)
 
     st.write("### Send Downstream")
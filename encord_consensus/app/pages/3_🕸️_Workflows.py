@@ -1,4 +1,4 @@
-import json
+import time
 from typing import Dict
 
 import streamlit as st
@@ -12,7 +12,9 @@ from encord_consensus.app.common.constants import (
 from encord_consensus.app.common.css import set_page_css
 from encord_consensus.app.common.project_selection import search_projects, reset_project_selection_state
 from encord_consensus.app.common.state import State, get_state
-from encord_consensus.lib.workflow_utils import pre_populate, WorkflowType, WORKFLOW_CONFIG_PATH, read_workflow_config
+from encord_consensus.app.common.tracing_panel import show_tracing_panel
+from encord_consensus.lib.workflow_store import get_workflow_store
+from encord_consensus.lib.workflow_utils import pre_populate, WorkflowType
 
 
 def render_workflows_page():
@@ -20,22 +22,24 @@ def render_workflows_page():
     set_page_css()
     st.write(f"# {WORKFLOWS_PAGE_TITLE}")
     State.init()
+    show_tracing_panel()
     user_client = get_state().encord_client
 
-    if not WORKFLOW_CONFIG_PATH.exists():
-        with open(WORKFLOW_CONFIG_PATH, 'w') as f:
-            json.dump({}, f)
-    wf_config = read_workflow_config()
+    workflow_store = get_workflow_store()
+    wf_config = workflow_store.all()
 
     def sync(workflow_name: str, workflow: Dict):
+        start = time.perf_counter()
         with st.spinner(f'Syncing {workflow_name}...'):
             synced_counter = pre_populate(**{'user_client': user_client, **workflow['spec']})
-        st.text(f'Executed {workflow_name}, synced: {synced_counter} items')
+        elapsed = time.perf_counter() - start
+        st.text(
+            f'Executed {workflow_name}, synced: {synced_counter} items in {elapsed:.1f}s '
+            f'({synced_counter / elapsed:.2f} items/s)'
+        )
 
     def delete_workflow(workflow_name: str):
-        del wf_config[workflow_name]
-        with open(WORKFLOW_CONFIG_PATH, 'w') as f:
-            json.dump(wf_config, f)
+        workflow_store.delete(workflow_name)
 
     def select_reference_project(project: Project):
         get_state().reference_project = project
@@ -58,7 +62,7 @@ def render_workflows_page():
         reference_project = get_state().reference_project
         meta['reference_project_name'] = reference_project.title
         meta['non_reference_project_names'] = [p.title for p in get_non_reference_projects()]
-        wf_config[new_workflow_name] = {
+        workflow_store.put(new_workflow_name, {
             "workflow_type": workflow_type.value,
             "spec": {
                 "reference_project_hash": reference_project.project_hash,
@@ -67,9 +71,7 @@ def render_workflows_page():
                 "target_priority": 1 if workflow_type == WorkflowType.PRE_POPULATE else None
             },
             "meta": meta
-        }
-        with open(WORKFLOW_CONFIG_PATH, 'w') as f:
-            json.dump(wf_config, f)
+        })
 
     def render_workflow_add():
         new_workflow_name = st.text_input('New Workflow Name')
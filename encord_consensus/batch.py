@@ -0,0 +1,713 @@
+import argparse
+import csv
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from encord import EncordUserClient, Project
+from encord.orm.label_row import LabelRowMetadata
+
+from encord_consensus.lib.agreement_metrics import (
+    AgreementCounts,
+    calculate_file_agreement,
+)
+from encord_consensus.lib.columnar_export import ColumnarFormat, ColumnarResultWriter
+from encord_consensus.lib.constants import SUPPORTED_DATA_TYPES
+from encord_consensus.lib.data_export import (
+    ExportPlan,
+    materialise_export,
+    plan_export,
+    write_export_json,
+)
+from encord_consensus.lib.data_model import (
+    CompactClassificationView,
+    CompactRegion,
+    IntervalRegion,
+)
+from encord_consensus.lib.data_transformation import (
+    get_ontology_index,
+    prepare_compact_data_for_consensus,
+)
+from encord_consensus.lib.fake_encord import (
+    FAKE_BACKEND_ENV_VAR,
+    is_fake_backend_enabled,
+)
+from encord_consensus.lib.interval_consensus import (
+    aggregate_intervals_by_answer,
+    calculate_frame_level_min_n_agreement_from_intervals,
+    find_interval_regions,
+)
+from encord_consensus.lib.project_access import (
+    DEFAULT_REQUEST_TIMEOUT,
+    REQUEST_TIMEOUT_ENV_VAR,
+    download_label_row_from_projects,
+    get_all_dataset_hashes,
+    get_all_projects,
+    get_encord_client,
+    get_project,
+    index_label_rows_by_data_hash,
+    list_all_data_rows,
+    read_requests_settings,
+    save_export_to_label_row,
+)
+from encord_consensus.lib.tracing import configure_tracing_outputs, get_tracer
+from encord_consensus.lib.vectorized_consensus import (
+    aggregate_votes_by_answer,
+    calculate_frame_level_min_n_agreement_from_votes,
+    find_compact_regions_from_votes,
+)
+from encord_consensus.lib.workflow_utils import (
+    get_downstream_copy_workflow_for_selection,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_WRITERS = 4
+COLUMNAR_FORMATS = [ColumnarFormat.PARQUET.value, ColumnarFormat.ARROW.value]
+OUTPUT_FORMATS = ["jsonl", "csv", *COLUMNAR_FORMATS]
+
+CSV_FIELDNAMES = [
+    "data_hash",
+    "data_title",
+    "answer_fq_name",
+    "region_number",
+    "start_frame",
+    "end_frame",
+    "max_agreement",
+    "integrated_agreement_score",
+    "min_n_agreement",
+    "n_scores",
+]
+# Columns of the files table of the CSV and columnar outputs, see `summarise_file`
+FILE_FIELDNAMES = [
+    "data_hash",
+    "data_title",
+    "status",
+    "error",
+    "num_regions",
+    "duration_seconds",
+    "frame_level_min_n_agreement",
+    "num_agreement_items",
+    "fleiss_kappa",
+    "krippendorff_alpha",
+]
+
+# Per-process state of the pool workers, populated once by `_init_worker`
+_worker_projects: List[Project] = []
+_worker_ontology: List = []
+
+
+def summarise_region(region: CompactRegion | IntervalRegion, vote_count_runs: bool = False) -> Dict:
+    summary = {
+        "answer_fq_name": region.answer.fq_name,
+        "region_number": region.region_number,
+        "start_frame": region.first_frame,
+        "end_frame": region.last_frame,
+        "max_agreement": region.consensus_data.max_agreement,
+        "integrated_agreement_score": region.consensus_data.integrated_agreement_score,
+        "min_n_agreement": region.consensus_data.min_n_agreement,
+        "n_scores": region.consensus_data.n_scores,
+    }
+    if vote_count_runs:
+        summary["vote_count_runs"] = region.vote_count_runs
+    return summary
+
+
+def prepare_file(
+    projects: List[Project], ontology: List, data_hash: str
+) -> Tuple[Dict, List[CompactClassificationView]]:
+    """
+    Download the label rows of a file and prepare them for consensus.
+
+    :return: The label rows keyed by project hash and the prepared data.
+    """
+    lr_data = download_label_row_from_projects(projects, data_hash)
+    ontology_index = get_ontology_index(projects[0].ontology_hash, ontology)
+    return lr_data, prepare_compact_data_for_consensus(ontology, lr_data, ontology_index=ontology_index)
+
+
+def find_file_regions(
+    prepared_data: List[CompactClassificationView], total_num_annotators: int, engine: str = "interval"
+) -> Tuple[Dict[int, int], List[CompactRegion | IntervalRegion]]:
+    """
+    :param engine: Either `interval` (sweep line over the labelled intervals) or `dense` (vote matrices).
+    :return: The frame level agreement and the regions of interest of a file.
+    """
+    if engine == "interval":
+        aggregated_intervals = aggregate_intervals_by_answer(prepared_data)
+        frame_level_min_n_agreement = calculate_frame_level_min_n_agreement_from_intervals(aggregated_intervals)
+        regions = find_interval_regions(aggregated_intervals, total_num_annotators)
+    else:
+        aggregated_votes = aggregate_votes_by_answer(prepared_data)
+        frame_level_min_n_agreement = calculate_frame_level_min_n_agreement_from_votes(aggregated_votes)
+        regions = find_compact_regions_from_votes(aggregated_votes, total_num_annotators)
+    return frame_level_min_n_agreement, regions
+
+
+def compute_file_regions(
+    projects: List[Project], ontology: List, data_hash: str, engine: str = "interval"
+) -> Tuple[Dict, Dict[int, int], List[CompactRegion | IntervalRegion]]:
+    """
+    Run the consensus pipeline on a single file.
+
+    :param projects: The annotator projects to compare.
+    :param ontology: The classifications of the projects' ontology.
+    :param data_hash: The data hash of the file.
+    :param engine: Either `interval` (sweep line over the labelled intervals) or `dense` (vote matrices).
+    :return: The label rows of the file keyed by project hash, the frame level agreement and the regions of interest.
+    """
+    lr_data, prepared_data = prepare_file(projects, ontology, data_hash)
+    return lr_data, *find_file_regions(prepared_data, len(projects), engine)
+
+
+def compute_file_consensus(
+    projects: List[Project],
+    ontology: List,
+    data_hash: str,
+    engine: str = "interval",
+    agreement: bool = False,
+    vote_count_runs: bool = False,
+) -> Dict:
+    """
+    Run the consensus pipeline on a single file, see `compute_file_regions`.
+
+    :param agreement: Whether to compute the chance-corrected agreement between the projects. The agreement
+        counts, needed to pool the agreement over several files, are returned under `agreement_counts`.
+    :param vote_count_runs: Whether to add the `(start, end, count)` vote count runs to the summary of each region.
+    :return: A JSON serialisable summary of the file's regions of interest.
+    """
+    _, prepared_data = prepare_file(projects, ontology, data_hash)
+    frame_level_min_n_agreement, regions = find_file_regions(prepared_data, len(projects), engine)
+    result = {
+        "frame_level_min_n_agreement": frame_level_min_n_agreement,
+        "regions_of_interest": [summarise_region(region, vote_count_runs) for region in regions],
+    }
+    if agreement:
+        project_hashes = [p.project_hash for p in projects]
+        counts_by_classification, total = calculate_file_agreement(prepared_data, project_hashes)
+        result["agreement"] = summarise_agreement(total, counts_by_classification, project_hashes)
+        result["agreement_counts"] = {
+            classification: counts.to_dict() for classification, counts in counts_by_classification.items()
+        }
+    return result
+
+
+def summarise_agreement(
+    total: AgreementCounts, counts_by_classification: Dict[str, AgreementCounts], project_hashes: List[str]
+) -> Dict:
+    return {
+        "total": total.summarise(project_hashes),
+        "by_classification": {
+            classification: counts.summarise(project_hashes)
+            for classification, counts in counts_by_classification.items()
+        },
+    }
+
+
+def summarise_file(result: Dict) -> Dict:
+    """
+    Return the row of a file in the files table of the CSV and columnar outputs, which unlike the region rows also
+    lists the files that failed or have no region.
+
+    :param result: The result of the file, as written to the JSONL output.
+    """
+    agreement = (result.get("agreement") or {}).get("total") or {}
+    return {
+        "data_hash": result["data_hash"],
+        "data_title": result["data_title"],
+        "status": result["status"],
+        "error": result.get("error"),
+        "num_regions": len(result["regions_of_interest"]) if "regions_of_interest" in result else None,
+        "duration_seconds": result.get("duration_seconds"),
+        "frame_level_min_n_agreement": result.get("frame_level_min_n_agreement"),
+        "num_agreement_items": agreement.get("num_items"),
+        "fleiss_kappa": agreement.get("fleiss_kappa"),
+        "krippendorff_alpha": agreement.get("krippendorff_alpha"),
+    }
+
+
+def passes_thresholds(
+    region: CompactRegion | IntervalRegion, min_agreement: int, min_integrated_score: float
+) -> bool:
+    return (
+        region.consensus_data.max_agreement >= min_agreement
+        and region.consensus_data.integrated_agreement_score >= min_integrated_score
+    )
+
+
+def _init_worker(path_to_keyfile: Optional[str], project_hashes: List[str], request_timeout: Optional[float]) -> None:
+    global _worker_projects, _worker_ontology
+    # Forked workers inherit the tracing outputs, only the main process writes the Prometheus file
+    get_tracer().prometheus_path = None
+    user_client = get_encord_client(path_to_keyfile, read_requests_settings(request_timeout))
+    _worker_projects = get_all_projects(user_client, project_hashes)
+    _worker_ontology = _worker_projects[0].ontology["classifications"]
+
+
+def _process_file(data_hash: str, data_title: str, engine: str, agreement: bool, vote_count_runs: bool) -> Dict:
+    start = time.perf_counter()
+    result = {"data_hash": data_hash, "data_title": data_title}
+    try:
+        result.update(
+            compute_file_consensus(_worker_projects, _worker_ontology, data_hash, engine, agreement, vote_count_runs)
+        )
+        result["status"] = "ok"
+    except Exception as e:
+        result["status"] = "error"
+        result["error"] = str(e)
+    result["duration_seconds"] = round(time.perf_counter() - start, 4)
+    return result
+
+
+def _export_file_regions(
+    data_hash: str,
+    data_title: str,
+    engine: str,
+    min_agreement: int,
+    min_integrated_score: float,
+    export_dir: Optional[Path] = None,
+) -> Dict:
+    start = time.perf_counter()
+    result = {"data_hash": data_hash, "data_title": data_title}
+    try:
+        lr_data, _, regions = compute_file_regions(_worker_projects, _worker_ontology, data_hash, engine)
+        regions = [region for region in regions if passes_thresholds(region, min_agreement, min_integrated_score)]
+        result["num_regions"] = len(regions)
+        # The range-compressed plan is sent back instead of the per-frame export, it's materialised by the writer
+        result["export"] = plan_export(regions, lr_data) if regions else None
+        if export_dir is not None and result["export"] is not None:
+            with (export_dir / f"{data_hash}.json").open("w", encoding="utf-8") as export_file:
+                write_export_json(result["export"], export_file)
+        result["status"] = "ok"
+    except Exception as e:
+        result["status"] = "error"
+        result["error"] = str(e)
+    result["duration_seconds"] = round(time.perf_counter() - start, 4)
+    return result
+
+
+class ResultWriter:
+    """
+    Stream the per-file results to a JSONL (one line per file) or CSV (one line per region) file, or to the Parquet
+    or Arrow tables of a directory (see `ColumnarResultWriter`).
+
+    The CSV output comes with `<output name>.files.csv`, with one line per file (see `summarise_file`), so the files
+    that failed or have no region can be told apart.
+    """
+
+    def __init__(self, output_path: Path, output_format: str, frame_vote_counts: bool = False):
+        self.output_format = output_format
+        self._file = None
+        self._csv_writer = None
+        self._files_file = None
+        self._files_csv_writer = None
+        self._columnar_writer = None
+        if output_format in COLUMNAR_FORMATS:
+            self._columnar_writer = ColumnarResultWriter(output_path, ColumnarFormat(output_format), frame_vote_counts)
+            return
+        self._file = output_path.open("w", encoding="utf-8", newline="")
+        if output_format == "csv":
+            self._csv_writer = csv.DictWriter(self._file, fieldnames=CSV_FIELDNAMES)
+            self._csv_writer.writeheader()
+            files_path = output_path.with_name(f"{output_path.stem}.files.csv")
+            self._files_file = files_path.open("w", encoding="utf-8", newline="")
+            self._files_csv_writer = csv.DictWriter(self._files_file, fieldnames=FILE_FIELDNAMES)
+            self._files_csv_writer.writeheader()
+
+    def write(self, result: Dict) -> None:
+        if self._columnar_writer is not None:
+            self._columnar_writer.write_file(summarise_file(result))
+            regions = result.get("regions_of_interest", [])
+            self._columnar_writer.write(result["data_hash"], result["data_title"], regions)
+        elif self._csv_writer is None:
+            self._file.write(json.dumps(result) + "\n")
+        else:
+            file_row = summarise_file(result)
+            if file_row["frame_level_min_n_agreement"] is not None:
+                file_row["frame_level_min_n_agreement"] = json.dumps(file_row["frame_level_min_n_agreement"])
+            self._files_csv_writer.writerow(file_row)
+            for region in result.get("regions_of_interest", []):
+                row = {"data_hash": result["data_hash"], "data_title": result["data_title"], **region}
+                row["min_n_agreement"] = json.dumps(row["min_n_agreement"])
+                row["n_scores"] = json.dumps(row["n_scores"])
+                self._csv_writer.writerow(row)
+        for file in (self._file, self._files_file):
+            if file is not None:
+                file.flush()
+
+    def close(self) -> None:
+        if self._columnar_writer is not None:
+            self._columnar_writer.close()
+            return
+        self._file.close()
+        if self._files_file is not None:
+            self._files_file.close()
+
+
+def _get_comparable_projects(user_client: EncordUserClient, project_hashes: List[str]) -> List[Project]:
+    projects = get_all_projects(user_client, project_hashes)
+    if any(get_all_dataset_hashes(p) != get_all_dataset_hashes(projects[0]) for p in projects):
+        raise ValueError("All projects must share the same attached datasets.")
+    if any(p.ontology_hash != projects[0].ontology_hash for p in projects):
+        raise ValueError("All projects must share the same ontology.")
+    return projects
+
+
+def run_batch_consensus(
+    path_to_keyfile: Optional[str],
+    project_hashes: List[str],
+    output_path: Path,
+    output_format: str = "jsonl",
+    max_workers: Optional[int] = None,
+    engine: str = "interval",
+    agreement: bool = False,
+    frame_vote_counts: bool = False,
+    request_timeout: Optional[float] = None,
+) -> int:
+    """
+    Run consensus on every supported file of the dataset shared by the given projects.
+
+    :param path_to_keyfile: Path to the private key used to access Encord.
+    :param project_hashes: The annotator projects to compare.
+    :param output_path: The file where the results are streamed, or the directory of the tables of the columnar
+        formats.
+    :param output_format: Either `jsonl`, `csv`, `parquet` or `arrow`.
+    :param max_workers: The size of the process pool, defaults to the number of CPUs.
+    :param engine: Either `interval` (sweep line over the labelled intervals) or `dense` (vote matrices).
+    :param agreement: Whether to compute the chance-corrected agreement between the projects. Each file's agreement
+        is added to the JSONL output and the agreement pooled over the whole dataset is written next to the output,
+        in `<output name>.agreement.json`.
+    :param frame_vote_counts: Whether to also write the vote count of every frame of the regions, only supported by
+        the columnar formats.
+    :param request_timeout: Seconds to connect, send and receive each request to Encord, see `read_requests_settings`.
+    :return: The number of files that could not be processed.
+    """
+    user_client = get_encord_client(path_to_keyfile, read_requests_settings(request_timeout))
+    projects = _get_comparable_projects(user_client, project_hashes)
+    data_rows = list_all_data_rows(user_client, get_all_dataset_hashes(projects[0]), data_types=SUPPORTED_DATA_TYPES)
+    logger.info(f"Running consensus on {len(data_rows)} files with {len(projects)} projects.")
+
+    writer = ResultWriter(output_path, output_format, frame_vote_counts)
+    failed_count = 0
+    dataset_agreement_by_classification: Dict[str, AgreementCounts] = {}
+    start = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=_init_worker,
+            initargs=(path_to_keyfile, project_hashes, request_timeout),
+        ) as executor:
+            futures = [
+                executor.submit(_process_file, dr.uid, dr.title, engine, agreement, frame_vote_counts)
+                for dr in data_rows
+            ]
+            for idx, future in enumerate(as_completed(futures), start=1):
+                result = future.result()
+                for classification, counts in result.pop("agreement_counts", {}).items():
+                    dataset_agreement_by_classification[classification] = dataset_agreement_by_classification.get(
+                        classification, AgreementCounts.empty(len(project_hashes))
+                    ) + AgreementCounts.from_dict(counts)
+                writer.write(result)
+                if result["status"] == "ok":
+                    logger.info(
+                        f"[{idx}/{len(data_rows)}] {result['data_title']}: "
+                        f"{len(result['regions_of_interest'])} regions in {result['duration_seconds']:.2f}s"
+                    )
+                else:
+                    failed_count += 1
+                    logger.warning(f"[{idx}/{len(data_rows)}] {result['data_title']}: {result['error']}")
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    logger.info(
+        f"Processed {len(data_rows)} files ({failed_count} failed) in {elapsed:.2f}s "
+        f"({len(data_rows) / elapsed if elapsed > 0 else 0:.2f} files/s)."
+    )
+    if agreement:
+        total = sum(dataset_agreement_by_classification.values(), AgreementCounts.empty(len(project_hashes)))
+        summary = summarise_agreement(total, dataset_agreement_by_classification, project_hashes)
+        agreement_path = output_path.with_name(f"{output_path.stem}.agreement.json")
+        agreement_path.write_text(json.dumps(summary, indent=2), encoding="utf-8")
+        logger.info(
+            f"Dataset agreement over {total.num_items} items: Fleiss' kappa {summary['total']['fleiss_kappa']}, "
+            f"Krippendorff's alpha {summary['total']['krippendorff_alpha']}, written to {agreement_path}."
+        )
+    return failed_count
+
+
+def run_copy_downstream(
+    path_to_keyfile: Optional[str],
+    project_hashes: List[str],
+    min_agreement: int = 1,
+    min_integrated_score: float = 0.0,
+    max_workers: Optional[int] = None,
+    max_writers: int = DEFAULT_MAX_WRITERS,
+    engine: str = "interval",
+    export_dir: Optional[Path] = None,
+    request_timeout: Optional[float] = None,
+) -> int:
+    """
+    Copy the regions of interest of every file of the dataset shared by the given projects to the downstream project
+    of their copy downstream workflow.
+
+    The downstream label rows are listed once and indexed by data hash. Consensus is computed by a pool of worker
+    processes while the exports are written to the downstream project by a pool of `max_writers` threads.
+    Like in the app, the labels of a downstream file are replaced by the copied regions. Files without any region
+    passing the thresholds are left untouched.
+
+    :param path_to_keyfile: Path to the private key used to access Encord.
+    :param project_hashes: The annotator projects to compare.
+    :param min_agreement: Only regions where at least this many annotators agree on some frame are copied.
+    :param min_integrated_score: Only regions with at least this integrated agreement score are copied.
+    :param max_workers: The size of the process pool, defaults to the number of CPUs.
+    :param max_writers: Maximum number of label rows written to the downstream project at the same time.
+    :param engine: Either `interval` (sweep line over the labelled intervals) or `dense` (vote matrices).
+    :param export_dir: If given, the export of each file is also streamed to `<export_dir>/<data hash>.json`.
+    :param request_timeout: Seconds to connect, send and receive each request to Encord, see `read_requests_settings`.
+    :return: The number of files that could not be processed or copied.
+    """
+    user_client = get_encord_client(path_to_keyfile, read_requests_settings(request_timeout))
+    projects = _get_comparable_projects(user_client, project_hashes)
+    workflow = get_downstream_copy_workflow_for_selection(projects)
+    if workflow is None:
+        raise ValueError("No copy downstream workflow was created for these projects.")
+    downstream_project = get_project(user_client, workflow["spec"]["reference_project_hash"])
+    downstream_rows = index_label_rows_by_data_hash(downstream_project)
+    if export_dir is not None:
+        export_dir.mkdir(parents=True, exist_ok=True)
+    data_rows = list_all_data_rows(user_client, get_all_dataset_hashes(projects[0]), data_types=SUPPORTED_DATA_TYPES)
+    logger.info(
+        f"Copying the regions of {len(data_rows)} files from {len(projects)} projects "
+        f"to <{downstream_project.title}>."
+    )
+
+    failed_count = 0
+    copied_count = 0
+    # Bounds the exports held in memory while waiting to be written
+    pending_writes = threading.BoundedSemaphore(2 * max_writers)
+    counts_lock = threading.Lock()
+    start = time.perf_counter()
+
+    def write(data_title: str, label_row_metadata: LabelRowMetadata, export_plan: ExportPlan) -> None:
+        nonlocal failed_count, copied_count
+        try:
+            export = materialise_export(export_plan)
+            save_export_to_label_row(downstream_project, label_row_metadata, export)
+            with counts_lock:
+                copied_count += 1
+        except Exception as e:
+            with counts_lock:
+                failed_count += 1
+            logger.warning(f"{data_title}: could not be copied downstream: {e}")
+        finally:
+            pending_writes.release()
+
+    with ThreadPoolExecutor(max_workers=max_writers) as writer_executor:
+        with ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=_init_worker,
+            initargs=(path_to_keyfile, project_hashes, request_timeout),
+        ) as executor:
+            futures = [
+                executor.submit(
+                    _export_file_regions, dr.uid, dr.title, engine, min_agreement, min_integrated_score, export_dir
+                )
+                for dr in data_rows
+            ]
+            for idx, future in enumerate(as_completed(futures), start=1):
+                result = future.result()
+                if result["status"] != "ok":
+                    with counts_lock:
+                        failed_count += 1
+                    logger.warning(f"[{idx}/{len(data_rows)}] {result['data_title']}: {result['error']}")
+                    continue
+                logger.info(
+                    f"[{idx}/{len(data_rows)}] {result['data_title']}: "
+                    f"{result['num_regions']} regions to copy in {result['duration_seconds']:.2f}s"
+                )
+                if result["export"] is None:
+                    continue
+                label_row_metadata = downstream_rows.get(result["data_hash"])
+                if label_row_metadata is None:
+                    with counts_lock:
+                        failed_count += 1
+                    logger.warning(f"{result['data_title']}: missing from <{downstream_project.title}>.")
+                    continue
+                pending_writes.acquire()
+                writer_executor.submit(write, result["data_title"], label_row_metadata, result["export"])
+
+    elapsed = time.perf_counter() - start
+    logger.info(
+        f"Copied {copied_count} of {len(data_rows)} files ({failed_count} failed) in {elapsed:.2f}s "
+        f"({len(data_rows) / elapsed if elapsed > 0 else 0:.2f} files/s)."
+    )
+    return failed_count
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="encord-consensus batch",
+        description="Run consensus on every file of the dataset shared by the given projects.",
+    )
+    parser.add_argument("project_hashes", nargs="+", help="Hashes of the annotator projects to compare.")
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=Path,
+        required=True,
+        help="File where the results are streamed, or directory of the tables of the parquet and arrow formats.",
+    )
+    parser.add_argument(
+        "-f",
+        "--format",
+        choices=OUTPUT_FORMATS,
+        default=None,
+        help="Output format. Inferred from the output file extension if not given (defaults to jsonl).",
+    )
+    parser.add_argument("-w", "--workers", type=int, default=None, help="Number of worker processes.")
+    parser.add_argument(
+        "--engine",
+        choices=["interval", "dense"],
+        default="interval",
+        help="Consensus engine: sweep line over the labelled intervals or dense vote matrices. Results are identical.",
+    )
+    parser.add_argument(
+        "--agreement",
+        action="store_true",
+        help="Compute Fleiss' kappa, Krippendorff's alpha and pairwise Cohen's kappa per file and over the dataset.",
+    )
+    parser.add_argument(
+        "--frame-vote-counts",
+        action="store_true",
+        help="Also write the vote count of every frame of the regions (parquet and arrow formats only).",
+    )
+    parser.add_argument(
+        "--keyfile",
+        default=None,
+        help="Path to the Encord private key. Defaults to the ENCORD_KEYFILE environment variable.",
+    )
+    parser.add_argument(
+        "--request-timeout",
+        type=float,
+        default=None,
+        help=f"Seconds to connect, send and receive each request to Encord. Defaults to the {REQUEST_TIMEOUT_ENV_VAR} "
+        f"environment variable, or {DEFAULT_REQUEST_TIMEOUT}.",
+    )
+    return parser
+
+
+def build_copy_downstream_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="encord-consensus copy-downstream",
+        description="Copy the regions of interest of every file to the downstream project of the projects' "
+        "copy downstream workflow.",
+    )
+    parser.add_argument("project_hashes", nargs="+", help="Hashes of the annotator projects to compare.")
+    parser.add_argument(
+        "--min-agreement",
+        type=int,
+        default=1,
+        help="Only copy regions where at least this many annotators agree on some frame.",
+    )
+    parser.add_argument(
+        "--min-score",
+        type=float,
+        default=0.0,
+        help="Only copy regions with at least this integrated agreement score.",
+    )
+    parser.add_argument("-w", "--workers", type=int, default=None, help="Number of worker processes.")
+    parser.add_argument(
+        "--writers",
+        type=int,
+        default=DEFAULT_MAX_WRITERS,
+        help="Maximum number of label rows written to the downstream project at the same time.",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=["interval", "dense"],
+        default="interval",
+        help="Consensus engine: sweep line over the labelled intervals or dense vote matrices. Results are identical.",
+    )
+    parser.add_argument(
+        "--export-dir",
+        type=Path,
+        default=None,
+        help="Also write the export of each file to <export dir>/<data hash>.json.",
+    )
+    parser.add_argument(
+        "--keyfile",
+        default=None,
+        help="Path to the Encord private key. Defaults to the ENCORD_KEYFILE environment variable.",
+    )
+    parser.add_argument(
+        "--request-timeout",
+        type=float,
+        default=None,
+        help=f"Seconds to connect, send and receive each request to Encord. Defaults to the {REQUEST_TIMEOUT_ENV_VAR} "
+        f"environment variable, or {DEFAULT_REQUEST_TIMEOUT}.",
+    )
+    return parser
+
+
+def _get_keyfile(args: argparse.Namespace) -> Optional[str]:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    load_dotenv(encoding="utf-8")
+    configure_tracing_outputs()
+    path_to_keyfile = args.keyfile or os.getenv("ENCORD_KEYFILE")
+    if is_fake_backend_enabled():
+        logger.info(f"Using the fake Encord backend set by {FAKE_BACKEND_ENV_VAR}.")
+    elif not path_to_keyfile:
+        logger.error("No keyfile given, use --keyfile or set ENCORD_KEYFILE.")
+    return path_to_keyfile
+
+
+def main(argv: List[str]) -> int:
+    args = build_parser().parse_args(argv)
+    path_to_keyfile = _get_keyfile(args)
+    if not path_to_keyfile and not is_fake_backend_enabled():
+        return 2
+    suffix = args.output.suffix.lower().lstrip(".")
+    output_format = args.format or (suffix if suffix in OUTPUT_FORMATS else "jsonl")
+    if args.frame_vote_counts and output_format not in COLUMNAR_FORMATS:
+        logger.error("--frame-vote-counts is only supported by the parquet and arrow formats.")
+        return 2
+    failed_count = run_batch_consensus(
+        path_to_keyfile,
+        args.project_hashes,
+        args.output,
+        output_format,
+        args.workers,
+        args.engine,
+        args.agreement,
+        args.frame_vote_counts,
+        args.request_timeout,
+    )
+    get_tracer().write_prometheus()
+    return 1 if failed_count > 0 else 0
+
+
+def copy_downstream_main(argv: List[str]) -> int:
+    args = build_copy_downstream_parser().parse_args(argv)
+    path_to_keyfile = _get_keyfile(args)
+    if not path_to_keyfile and not is_fake_backend_enabled():
+        return 2
+    failed_count = run_copy_downstream(
+        path_to_keyfile,
+        args.project_hashes,
+        args.min_agreement,
+        args.min_score,
+        args.workers,
+        args.writers,
+        args.engine,
+        args.export_dir,
+        args.request_timeout,
+    )
+    get_tracer().write_prometheus()
+    return 1 if failed_count > 0 else 0
@@ -7,11 +7,28 @@ from encord_consensus.app.common.constants import HOME_PAGE_TITLE
 
 
 def launch():
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        batch()
+    if len(sys.argv) > 1 and sys.argv[1] == "copy-downstream":
+        copy_downstream()
+
     streamlit_page = (Path(__file__).parent / f"app/{HOME_PAGE_TITLE.replace(' ', '_')}.py").expanduser().resolve()
     sys.argv = ["streamlit", "run", streamlit_page.as_posix()]
 
     sys.exit(stcli.main())
 
 
+def batch():
+    from encord_consensus.batch import main
+
+    sys.exit(main(sys.argv[2:]))
+
+
+def copy_downstream():
+    from encord_consensus.batch import copy_downstream_main
+
+    sys.exit(copy_downstream_main(sys.argv[2:]))
+
+
 if __name__ == "__main__":
     launch()
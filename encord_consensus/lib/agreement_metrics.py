@@ -0,0 +1,250 @@
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from .data_model import ClassificationView, CompactClassificationView
+
+# Category of the items a classification is rated on, for the annotators who didn't answer it
+NO_ANSWER = "<no answer>"
+
+
+@dataclass
+class AgreementCounts:
+    """
+    Sufficient statistics of the chance-corrected agreement between annotators rating items with categories.
+
+    An item is a (frame, classification) pair answered by at least one annotator. Every annotator rates it with the
+    answer they chose, or with the "no answer" category of the classification.
+    `agreements[a, b]` is the number of items rated alike by annotators `a` and `b`, so its diagonal holds the number
+    of items. `category_counts[a, c]` is the number of items annotator `a` rated with `categories[c]`. Counts of
+    several classifications or files are combined with `+`, which pools their items.
+
+    When every rating falls in the same category, chance agreement is 1 and the usual formulas are undefined: the
+    metrics are then 1, since the annotators agree perfectly.
+    """
+
+    num_items: int
+    agreements: np.ndarray
+    categories: List[str]
+    category_counts: np.ndarray
+
+    def __add__(self, other: "AgreementCounts") -> "AgreementCounts":
+        categories = self.categories + [c for c in other.categories if c not in set(self.categories)]
+        category_idx = {category: idx for idx, category in enumerate(categories)}
+        category_counts = np.zeros((self.num_annotators, len(categories)), dtype=np.int64)
+        category_counts[:, : len(self.categories)] = self.category_counts
+        category_counts[:, [category_idx[c] for c in other.categories]] += other.category_counts
+        return AgreementCounts(
+            num_items=self.num_items + other.num_items,
+            agreements=self.agreements + other.agreements,
+            categories=categories,
+            category_counts=category_counts,
+        )
+
+    @property
+    def num_annotators(self) -> int:
+        return self.agreements.shape[0]
+
+    def _pairs(self) -> Tuple[float, float, float]:
+        """
+        Return the number of ratings, the number of ordered pairs of ratings of the same item in different categories,
+        and the number of ordered pairs of ratings of any items in different categories.
+        """
+        num_ratings = self.num_items * self.num_annotators
+        category_totals = self.category_counts.sum(axis=0).astype(np.float64)
+        # The agreements sum to the number of ordered pairs of ratings of the same item in the same category
+        disagreeing_pairs = self.num_items * self.num_annotators**2 - float(self.agreements.sum())
+        different_pairs = float(num_ratings) ** 2 - float(np.sum(category_totals**2))
+        return num_ratings, disagreeing_pairs, different_pairs
+
+    @property
+    def fleiss_kappa(self) -> float:
+        m = self.num_annotators
+        if self.num_items == 0 or m < 2:
+            return float("nan")
+        num_ratings, disagreeing_pairs, different_pairs = self._pairs()
+        if different_pairs == 0:
+            return 1.0
+        # 1 - observed and 1 - expected agreement
+        observed_disagreement = disagreeing_pairs / (num_ratings * (m - 1))
+        expected_disagreement = different_pairs / num_ratings**2
+        return 1 - observed_disagreement / expected_disagreement
+
+    @property
+    def krippendorff_alpha(self) -> float:
+        """Krippendorff's alpha for nominal data, every annotator rating every item."""
+        m = self.num_annotators
+        if self.num_items == 0 or m < 2:
+            return float("nan")
+        num_ratings, disagreeing_pairs, different_pairs = self._pairs()
+        if different_pairs == 0:
+            return 1.0
+        return 1 - (num_ratings - 1) * disagreeing_pairs / ((m - 1) * different_pairs)
+
+    @property
+    def cohen_kappa(self) -> np.ndarray:
+        """Cohen's kappa of every pair of annotators, as a symmetric (annotators x annotators) matrix."""
+        if self.num_items == 0:
+            return np.full(self.agreements.shape, np.nan)
+        observed = self.agreements / self.num_items
+        # Number of pairs of items rated in the same category by both annotators, chance agreement is 1 if it's all
+        same_category_pairs = self.category_counts @ self.category_counts.T
+        expected = same_category_pairs / self.num_items**2
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(same_category_pairs == self.num_items**2, 1.0, (observed - expected) / (1 - expected))
+
+    def summarise(self, project_hashes: List[str]) -> Dict:
+        """Return a JSON serialisable summary of the metrics, undefined metrics are `None`."""
+        cohen_kappa = self.cohen_kappa
+        return {
+            "num_items": self.num_items,
+            "fleiss_kappa": _round_or_none(self.fleiss_kappa),
+            "krippendorff_alpha": _round_or_none(self.krippendorff_alpha),
+            "cohen_kappa": {
+                a: {b: _round_or_none(cohen_kappa[i, j]) for j, b in enumerate(project_hashes) if i != j}
+                for i, a in enumerate(project_hashes)
+            },
+        }
+
+    def to_dict(self) -> Dict:
+        return {
+            "num_items": self.num_items,
+            "agreements": self.agreements.tolist(),
+            "categories": self.categories,
+            "category_counts": self.category_counts.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, counts: Dict) -> "AgreementCounts":
+        agreements = np.asarray(counts["agreements"], dtype=np.int64)
+        return cls(
+            num_items=counts["num_items"],
+            agreements=agreements,
+            categories=list(counts["categories"]),
+            category_counts=np.asarray(counts["category_counts"], dtype=np.int64).reshape(
+                agreements.shape[0], len(counts["categories"])
+            ),
+        )
+
+    @classmethod
+    def empty(cls, num_annotators: int) -> "AgreementCounts":
+        return cls(
+            num_items=0,
+            agreements=np.zeros((num_annotators, num_annotators), dtype=np.int64),
+            categories=[],
+            category_counts=np.zeros((num_annotators, 0), dtype=np.int64),
+        )
+
+
+def _round_or_none(value: float) -> float | None:
+    return None if np.isnan(value) else round(float(value), 4)
+
+
+def build_vote_tensor(
+    prepared_data: List[CompactClassificationView] | List[ClassificationView], project_hashes: List[str]
+) -> Tuple[np.ndarray, List[str], np.ndarray]:
+    """
+    Build the boolean (frames x annotators x answers) vote tensor of a file.
+
+    Only the frames labelled by at least one annotator are kept. `rate_items` further restricts the items of each
+    classification to the frames where someone answered it.
+
+    :param prepared_data: The prepared data of the file.
+    :param project_hashes: The annotator projects, in the order of the annotator axis.
+    :return: The labelled frames, the fully qualified names of the answers and the vote tensor.
+    """
+    frames_per_view = [np.asarray(c.frames, dtype=np.int64) for c in prepared_data]
+    frames_per_view = [view_frames for view_frames in frames_per_view if view_frames.size > 0]
+    annotator_idx = {project_hash: idx for idx, project_hash in enumerate(project_hashes)}
+    answer_idx: Dict[str, int] = {}
+    for c in prepared_data:
+        answer_idx.setdefault(c.answer.fq_name, len(answer_idx))
+    if not frames_per_view:
+        return np.empty(0, dtype=np.int64), list(answer_idx), np.zeros((0, len(project_hashes), len(answer_idx)), bool)
+
+    # Frame numbers are dense, so a mask over their range is cheaper than sorting all the labelled frames
+    first_frame = min(int(view_frames.min()) for view_frames in frames_per_view)
+    last_frame = max(int(view_frames.max()) for view_frames in frames_per_view)
+    labelled = np.zeros(last_frame - first_frame + 1, dtype=bool)
+    for view_frames in frames_per_view:
+        labelled[view_frames - first_frame] = True
+    frames = np.flatnonzero(labelled) + first_frame
+    row_of_frame = np.cumsum(labelled) - 1
+
+    votes = np.zeros((frames.size, len(project_hashes), len(answer_idx)), dtype=bool)
+    for c in prepared_data:
+        view_frames = np.asarray(c.frames, dtype=np.int64)
+        rows = row_of_frame[view_frames - first_frame]
+        votes[rows, annotator_idx[c.source_project_hash], answer_idx[c.answer.fq_name]] = True
+    return frames, list(answer_idx), votes
+
+
+def rate_items(answer_votes: np.ndarray, fq_names: List[str], classification: str) -> Tuple[np.ndarray, List[str]]:
+    """
+    Turn the (frames x annotators x answers) vote tensor of the answers of a classification into the category chosen
+    by each annotator on each item.
+
+    The items are the frames where at least one annotator answered the classification: frames where no one did would
+    otherwise count as unanimous and inflate the agreement. Annotators who didn't answer are rated with the "no answer"
+    category, those who chose several answers of the classification with a category for this combination.
+
+    :param answer_votes: The votes of the answers of the classification.
+    :param fq_names: The fully qualified names of the answers, in the order of the answer axis.
+    :param classification: The name of the classification, which names its "no answer" category.
+    :return: The (items x annotators) indices of the chosen categories, and the names of the categories.
+    """
+    answered = answer_votes.any(axis=2)
+    items = answered.any(axis=1)
+    answer_votes, answered = answer_votes[items], answered[items]
+    categories = [f"{classification}={NO_ANSWER}", *fq_names]
+    ratings = np.where(answered, answer_votes.argmax(axis=2) + 1, 0)
+    multiple = answer_votes.sum(axis=2) > 1
+    if multiple.any():
+        combinations, combination_idx = np.unique(answer_votes[multiple], axis=0, return_inverse=True)
+        ratings[multiple] = len(categories) + combination_idx.ravel()
+        categories += ["|".join(fq_names[i] for i in np.flatnonzero(combination)) for combination in combinations]
+    return ratings, categories
+
+
+def count_agreement(ratings: np.ndarray, categories: List[str]) -> AgreementCounts:
+    """
+    Compute the agreement counts of (items x annotators) ratings, see `rate_items`.
+
+    :param ratings: The index of the category chosen by each annotator on each item.
+    :param categories: The names of the categories.
+    """
+    num_items, num_annotators = ratings.shape
+    category_counts = np.zeros((num_annotators, len(categories)), dtype=np.int64)
+    agreements = np.zeros((num_annotators, num_annotators), dtype=np.int64)
+    for a in range(num_annotators):
+        category_counts[a] = np.bincount(ratings[:, a], minlength=len(categories))
+        # Compare the annotator with itself and the next ones at once, the matrix is symmetric
+        agreements[a, a:] = np.count_nonzero(ratings[:, a:] == ratings[:, a, None], axis=0)
+        agreements[a:, a] = agreements[a, a:]
+    return AgreementCounts(
+        num_items=num_items, agreements=agreements, categories=categories, category_counts=category_counts
+    )
+
+
+def calculate_file_agreement(
+    prepared_data: List[CompactClassificationView] | List[ClassificationView], project_hashes: List[str]
+) -> Tuple[Dict[str, AgreementCounts], AgreementCounts]:
+    """
+    Compute the agreement between annotators on a file, rating each classification on each frame.
+
+    :return: The agreement counts of each classification keyed by its value, and the counts pooling all the
+        classifications.
+    """
+    _, fq_names, votes = build_vote_tensor(prepared_data, project_hashes)
+    classification_of_answer = {c.answer.fq_name: c.answer.value for c in prepared_data}
+    answers_by_classification: Dict[str, List[int]] = {}
+    for idx, fq_name in enumerate(fq_names):
+        answers_by_classification.setdefault(classification_of_answer[fq_name], []).append(idx)
+
+    counts_by_classification = {}
+    for classification, answer_idx in answers_by_classification.items():
+        ratings, categories = rate_items(votes[:, :, answer_idx], [fq_names[i] for i in answer_idx], classification)
+        counts_by_classification[classification] = count_agreement(ratings, categories)
+    total = sum(counts_by_classification.values(), AgreementCounts.empty(len(project_hashes)))
+    return counts_by_classification, total
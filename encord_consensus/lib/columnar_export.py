@@ -0,0 +1,237 @@
+"""
+Columnar export of consensus results to Parquet or Arrow IPC files, for analytics outside of the app.
+
+The results are written to tables in the output directory, joined on `(data_hash, answer_fq_name, region_number)`:
+- `files`: one row per file, with its status (`ok` or `error`), error and file level results. It's joined to the
+  other tables on `data_hash`, and is the only table listing the files that failed or have no region.
+- `regions`: one row per region of interest.
+- `n_scores`: one row per region and number of agreeing annotators.
+- `frame_vote_counts` (optional): one row per frame of each region, with its number of votes.
+
+Rows are buffered as record batches and written once a table has `batch_size` rows, so the memory of a dataset-wide
+export doesn't grow with the number of files.
+"""
+from enum import Enum
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+
+from .tracing import traced
+
+DEFAULT_BATCH_SIZE = 100_000
+
+FILES_SCHEMA = pa.schema(
+    [
+        ("data_hash", pa.string()),
+        ("data_title", pa.string()),
+        ("status", pa.string()),
+        ("error", pa.string()),
+        ("num_regions", pa.int32()),
+        ("duration_seconds", pa.float64()),
+        # Number of frames of the file where at least `n` annotators agree, keyed by `n`
+        ("frame_level_min_n_agreement", pa.map_(pa.int32(), pa.int64())),
+        ("num_agreement_items", pa.int64()),
+        ("fleiss_kappa", pa.float64()),
+        ("krippendorff_alpha", pa.float64()),
+    ]
+)
+REGIONS_SCHEMA = pa.schema(
+    [
+        ("data_hash", pa.string()),
+        ("data_title", pa.string()),
+        ("answer_fq_name", pa.string()),
+        ("region_number", pa.int32()),
+        ("start_frame", pa.int64()),
+        ("end_frame", pa.int64()),
+        ("max_agreement", pa.int32()),
+        ("integrated_agreement_score", pa.float64()),
+    ]
+)
+N_SCORES_SCHEMA = pa.schema(
+    [
+        ("data_hash", pa.string()),
+        ("answer_fq_name", pa.string()),
+        ("region_number", pa.int32()),
+        ("n", pa.int32()),
+        # Number of frames of the region where at least `n` annotators agree
+        ("min_n_agreement", pa.int64()),
+        ("n_score", pa.float64()),
+    ]
+)
+FRAME_VOTE_COUNTS_SCHEMA = pa.schema(
+    [
+        ("data_hash", pa.string()),
+        ("answer_fq_name", pa.string()),
+        ("region_number", pa.int32()),
+        ("frame", pa.int64()),
+        ("vote_count", pa.int32()),
+    ]
+)
+
+
+class ColumnarFormat(str, Enum):
+    PARQUET = "parquet"
+    ARROW = "arrow"
+
+
+class _TableWriter:
+    """Buffer the record batches of a table and write them to its file in batches of at least `batch_size` rows."""
+
+    def __init__(self, path: Path, schema: pa.Schema, file_format: ColumnarFormat, batch_size: int):
+        self.schema = schema
+        self.batch_size = batch_size
+        self.num_rows = 0
+        self._pending: List[pa.RecordBatch] = []
+        self._pending_rows = 0
+        if file_format == ColumnarFormat.PARQUET:
+            self._writer = pq.ParquetWriter(str(path), schema)
+        else:
+            self._writer = ipc.new_file(str(path), schema)
+
+    def append(self, columns: Dict[str, Sequence | pa.Array]) -> None:
+        batch = pa.RecordBatch.from_pydict(columns, schema=self.schema)
+        if batch.num_rows == 0:
+            return
+        self._pending.append(batch)
+        self._pending_rows += batch.num_rows
+        if self._pending_rows >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._pending:
+            return
+        # Small batches, e.g. the regions of a single file, are merged into a single row group or record batch
+        table = pa.Table.from_batches(self._pending, schema=self.schema).combine_chunks()
+        if isinstance(self._writer, pq.ParquetWriter):
+            self._writer.write_table(table, row_group_size=self.batch_size)
+        else:
+            self._writer.write_table(table, max_chunksize=self.batch_size)
+        self.num_rows += self._pending_rows
+        self._pending = []
+        self._pending_rows = 0
+
+    def close(self) -> None:
+        self.flush()
+        self._writer.close()
+
+
+def _expand_runs(runs: List[Tuple[int, int, int]]) -> Tuple[np.ndarray, np.ndarray]:
+    """Turn `(start, end, count)` runs into the frames they cover and the vote count of each frame."""
+    if not runs:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int32)
+    starts, ends, counts = (np.asarray(column, dtype=np.int64) for column in zip(*runs))
+    lengths = ends - starts + 1
+    offsets = np.cumsum(lengths) - lengths
+    frames = np.arange(lengths.sum(), dtype=np.int64) + np.repeat(starts - offsets, lengths)
+    return frames, np.repeat(counts, lengths).astype(np.int32)
+
+
+class ColumnarResultWriter:
+    """
+    Write the consensus results of many files to the columnar tables, see the module docstring.
+
+    :param output_dir: The directory of the tables, created if needed.
+    :param file_format: Parquet (`<table>.parquet`) or Arrow IPC (`<table>.arrow`) files.
+    :param frame_vote_counts: Whether to write the `frame_vote_counts` table, from the `vote_count_runs` of each
+        region summary.
+    :param batch_size: Number of rows of a table buffered before being written, i.e. its Parquet row group size.
+    """
+
+    def __init__(
+        self,
+        output_dir: Path,
+        file_format: ColumnarFormat = ColumnarFormat.PARQUET,
+        frame_vote_counts: bool = False,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ):
+        file_format = ColumnarFormat(file_format)
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        def open_table(name: str, schema: pa.Schema) -> _TableWriter:
+            return _TableWriter(output_dir / f"{name}.{file_format.value}", schema, file_format, batch_size)
+
+        self._files = open_table("files", FILES_SCHEMA)
+        self._regions = open_table("regions", REGIONS_SCHEMA)
+        self._n_scores = open_table("n_scores", N_SCORES_SCHEMA)
+        self._frame_vote_counts: Optional[_TableWriter] = None
+        if frame_vote_counts:
+            self._frame_vote_counts = open_table("frame_vote_counts", FRAME_VOTE_COUNTS_SCHEMA)
+
+    @traced(payload_size=lambda num_rows: num_rows)
+    def write(self, data_hash: str, data_title: str, region_summaries: List[Dict]) -> int:
+        """
+        Append the regions of a file.
+
+        :param region_summaries: The regions as summarised by `batch.summarise_region`.
+        :return: The number of rows appended to the tables.
+        """
+        self._regions.append(
+            {
+                "data_hash": [data_hash] * len(region_summaries),
+                "data_title": [data_title] * len(region_summaries),
+                **{
+                    column: [summary[column] for summary in region_summaries]
+                    for column in REGIONS_SCHEMA.names[2:]
+                },
+            }
+        )
+        # The keys are strings in the summaries read back from a JSONL output
+        n_score_rows = [
+            (summary, n, count, {int(k): v for k, v in (summary["n_scores"] or {}).items()})
+            for summary in region_summaries
+            for n, count in sorted((int(n), count) for n, count in summary["min_n_agreement"].items())
+        ]
+        self._n_scores.append(
+            {
+                "data_hash": [data_hash] * len(n_score_rows),
+                "answer_fq_name": [summary["answer_fq_name"] for summary, _, _, _ in n_score_rows],
+                "region_number": [summary["region_number"] for summary, _, _, _ in n_score_rows],
+                "n": [n for _, n, _, _ in n_score_rows],
+                "min_n_agreement": [count for _, _, count, _ in n_score_rows],
+                "n_score": [n_scores.get(n) for _, n, _, n_scores in n_score_rows],
+            }
+        )
+        num_rows = len(region_summaries) + len(n_score_rows)
+        if self._frame_vote_counts is not None:
+            for summary in region_summaries:
+                frames, vote_counts = _expand_runs(summary["vote_count_runs"])
+                self._frame_vote_counts.append(
+                    {
+                        "data_hash": pa.repeat(data_hash, frames.size),
+                        "answer_fq_name": pa.repeat(summary["answer_fq_name"], frames.size),
+                        "region_number": np.full(frames.size, summary["region_number"], dtype=np.int32),
+                        "frame": frames,
+                        "vote_count": vote_counts,
+                    }
+                )
+                num_rows += frames.size
+        return num_rows
+
+    def write_file(self, file_summary: Dict) -> None:
+        """
+        Append the row of a file to the `files` table.
+
+        :param file_summary: The file as summarised by `batch.summarise_file`, with the columns of `FILES_SCHEMA`.
+        """
+        row = dict(file_summary)
+        if row["frame_level_min_n_agreement"] is not None:
+            # The keys are strings in the results read back from a JSONL output
+            row["frame_level_min_n_agreement"] = sorted(
+                (int(n), count) for n, count in row["frame_level_min_n_agreement"].items()
+            )
+        self._files.append({column: [row[column]] for column in FILES_SCHEMA.names})
+
+    def close(self) -> None:
+        for table in (self._files, self._regions, self._n_scores, self._frame_vote_counts):
+            if table is not None:
+                table.close()
+
+    def __enter__(self) -> "ColumnarResultWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
@@ -1,3 +1,6 @@
 from encord.constants.enums import DataType
 
+APP_NAME = "encord-consensus"
+APP_AUTHOR = "Encord"
+
 SUPPORTED_DATA_TYPES = [DataType.VIDEO, DataType.IMAGE]
@@ -1,80 +1,214 @@
 import base64
+import json
 import uuid
+from dataclasses import dataclass
 from datetime import datetime
-from typing import Dict, List, Set
+from typing import Dict, Iterator, List, Set, TextIO, Tuple
 
 import pytz
 
-from .data_model import RegionOfInterest
+from .data_model import CompactRegion, IntervalRegion, RegionOfInterest
+from .tracing import traced
 
 
 GMT_TIMEZONE = pytz.timezone("GMT")
 DATETIME_STRING_FORMAT = "%a, %d %b %Y %H:%M:%S %Z"
+EXPORT_HEADER_KEYS = ["dataset_hash", "dataset_title", "data_title", "data_hash", "data_type"]
+# Number of frames encoded in each chunk of a streamed export
+FRAMES_PER_CHUNK = 1000
 
 
 def _get_timestamp(now=datetime.now()):
     new_timezone_timestamp = now.astimezone(GMT_TIMEZONE)
     return new_timezone_timestamp.strftime(DATETIME_STRING_FORMAT)
 
-def _initialise_export_dict(lr_data: Dict) -> Dict:
-    first_lr = list(lr_data.values())[0]
-    export_dict = {
-        k: first_lr[k]
-        for k in [
-            "dataset_hash",
-            "dataset_title",
-            "data_title",
-            "data_hash",
-            "data_type",
-        ]
-    }
-    export_dict["data_units"] = first_lr["data_units"]
-    export_dict["data_units"][export_dict["data_hash"]]["labels"] = {}
-    for k in ["classification_answers", "consensus_meta"]:
-        export_dict[k] = {}
-    return export_dict
-
 
 def _short_uuid_str() -> str:
     """This is being used as a condensed uuid."""
     return base64.b64encode(uuid.uuid4().bytes[:6]).decode("utf-8")
 
 
-def export_regions_of_interest(
-    regions: List[RegionOfInterest],
+@dataclass(frozen=True, slots=True)
+class RegionExport:
+    """
+    The labels of an exported region: one classification entry shared by all the frames of its ranges.
+    The entry is referenced by every frame of the materialised export, so it must not be mutated.
+    """
+
+    object_hash: str
+    classification_answers: Dict
+    classification_entry: Dict
+    # Inclusive (start, end) frame ranges, sorted and disjoint
+    frame_ranges: Tuple[Tuple[int, int], ...]
+
+
+@dataclass(frozen=True, slots=True)
+class ExportPlan:
+    """
+    Range-compressed export of regions of interest, its size doesn't depend on the length of the regions.
+    The per-frame labels are only generated when materialising or streaming it.
+    """
+
+    header: Dict
+    # The data units of the file, the labels of the exported one are left out
+    data_units: Dict
+    regions: Tuple[RegionExport, ...]
+
+    @property
+    def data_hash(self) -> str:
+        return self.header["data_hash"]
+
+
+def _get_frame_ranges(region: RegionOfInterest | CompactRegion | IntervalRegion) -> Tuple[Tuple[int, int], ...]:
+    if isinstance(region, (CompactRegion, IntervalRegion)):
+        return ((region.first_frame, region.last_frame),)
+    ranges = []
+    for frame in sorted(region.frame_votes):
+        if ranges and ranges[-1][1] == frame - 1:
+            ranges[-1][1] = frame
+        else:
+            ranges.append([frame, frame])
+    return tuple((start, end) for start, end in ranges)
+
+
+@traced(payload_size=lambda plan: len(plan.regions))
+def plan_export(
+    regions: List[RegionOfInterest] | List[CompactRegion] | List[IntervalRegion],
     lr_data: Dict,
     region_hashes_to_include: Set[int] = None,
-) -> Dict:
-    now = datetime.now()
-    created_at = _get_timestamp(now)
-    export_dict = _initialise_export_dict(lr_data)
-    data_hash = export_dict["data_hash"]
+) -> ExportPlan:
+    """
+    Build the export of the regions of interest to the first label row of `lr_data`, without expanding the frames
+    of the regions. `lr_data` is left untouched.
+    """
+    created_at = _get_timestamp(datetime.now())
+    first_lr = next(iter(lr_data.values()))
+    header = {k: first_lr[k] for k in EXPORT_HEADER_KEYS}
+    data_hash = header["data_hash"]
+    data_units = dict(first_lr["data_units"])
+    data_units[data_hash] = {k: v for k, v in data_units[data_hash].items() if k != "labels"}
     filtered_regions = regions
     if region_hashes_to_include:
         filtered_regions = [r for r in regions if hash(r) in region_hashes_to_include]
+    region_exports = []
     for region in filtered_regions:
         object_hash = _short_uuid_str()
-        export_dict["classification_answers"][object_hash] = {
-            "classificationHash": object_hash,
-            "classifications": region.answer.classification_answers["classifications"],
-        }
-
-        for frame in region.frame_votes.keys():
-            classification_entry = {
-                "name": region.answer.name,
-                "value": region.answer.value,
-                "featureHash": region.answer.feature_hash,
-                "createdAt": created_at,
-                "createdBy": "robot@encord.com",  # YOU CAN CHANGE THIS TO BE EMAIL OF UPLOADING USER
-                "confidence": 1,
-                "classificationHash": object_hash,
-                "manualAnnotation": True,
-            }
-            if not export_dict["data_units"][data_hash]["labels"].get(frame):
-                export_dict["data_units"][data_hash]["labels"][frame] = {
-                    'objects': [],
-                    'classifications': [classification_entry]
-                }
+        region_exports.append(
+            RegionExport(
+                object_hash=object_hash,
+                classification_answers={
+                    "classificationHash": object_hash,
+                    "classifications": region.answer.classification_answers["classifications"],
+                },
+                classification_entry={
+                    "name": region.answer.name,
+                    "value": region.answer.value,
+                    "featureHash": region.answer.feature_hash,
+                    "createdAt": created_at,
+                    "createdBy": "robot@encord.com",  # YOU CAN CHANGE THIS TO BE EMAIL OF UPLOADING USER
+                    "confidence": 1,
+                    "classificationHash": object_hash,
+                    "manualAnnotation": True,
+                },
+                frame_ranges=_get_frame_ranges(region),
+            )
+        )
+    return ExportPlan(header=header, data_units=data_units, regions=tuple(region_exports))
+
+
+@traced(payload_size=lambda export: len(export["data_units"][export["data_hash"]]["labels"]))
+def materialise_export(plan: ExportPlan) -> Dict:
+    """
+    Build the export dict of the plan, in the label row format. All the frames of a region reference the same
+    classification entry, so the size of the export is a few pointers per frame.
+    """
+    labels = {}
+    for region in plan.regions:
+        for start, end in region.frame_ranges:
+            for frame in range(start, end + 1):
+                frame_labels = labels.get(frame)
+                if frame_labels is None:
+                    labels[frame] = {"objects": [], "classifications": [region.classification_entry]}
+                else:
+                    frame_labels["classifications"].append(region.classification_entry)
+    data_units = dict(plan.data_units)
+    data_units[plan.data_hash] = {**data_units[plan.data_hash], "labels": labels}
+    return {
+        **plan.header,
+        "data_units": data_units,
+        "classification_answers": {region.object_hash: region.classification_answers for region in plan.regions},
+        "consensus_meta": {},
+    }
+
+
+def export_regions_of_interest(
+    regions: List[RegionOfInterest] | List[CompactRegion] | List[IntervalRegion],
+    lr_data: Dict,
+    region_hashes_to_include: Set[int] = None,
+) -> Dict:
+    return materialise_export(plan_export(regions, lr_data, region_hashes_to_include))
+
+
+def _iter_frame_segments(plan: ExportPlan) -> Iterator[Tuple[int, int, List[int]]]:
+    """
+    Split the frames of the plan into `(start, end, region indices)` segments labelled by the same regions.
+    """
+    changes: Dict[int, List[Tuple[int, bool]]] = {}
+    for idx, region in enumerate(plan.regions):
+        for start, end in region.frame_ranges:
+            changes.setdefault(start, []).append((idx, True))
+            changes.setdefault(end + 1, []).append((idx, False))
+    active: Set[int] = set()
+    boundaries = sorted(changes)
+    for boundary, next_boundary in zip(boundaries, boundaries[1:]):
+        for idx, starts in changes[boundary]:
+            if starts:
+                active.add(idx)
             else:
-                export_dict["data_units"][data_hash]["labels"][frame]['classifications'].append(classification_entry)
-    return export_dict
+                active.discard(idx)
+        if active:
+            yield boundary, next_boundary - 1, sorted(active)
+
+
+def iter_export_json(plan: ExportPlan) -> Iterator[str]:
+    """
+    Generate the JSON of the export in chunks, e.g. to stream it to a file or a request body.
+    Memory stays flat with the length of the regions: the frames are generated from the ranges of the regions, and
+    the labels of the frames covered by the same regions are encoded once.
+    """
+    yield "{"
+    for key, value in plan.header.items():
+        yield f"{json.dumps(key)}: {json.dumps(value)}, "
+    yield '"data_units": {'
+    for unit_idx, (unit_hash, data_unit) in enumerate(plan.data_units.items()):
+        yield f"{', ' if unit_idx else ''}{json.dumps(unit_hash)}: "
+        if unit_hash != plan.data_hash:
+            yield json.dumps(data_unit)
+            continue
+        yield "{"
+        for key, value in data_unit.items():
+            yield f"{json.dumps(key)}: {json.dumps(value)}, "
+        yield '"labels": {'
+        entries = [json.dumps(region.classification_entry) for region in plan.regions]
+        separator = ""
+        for start, end, region_indices in _iter_frame_segments(plan):
+            frame_labels = f'{{"objects": [], "classifications": [{", ".join(entries[i] for i in region_indices)}]}}'
+            for chunk_start in range(start, end + 1, FRAMES_PER_CHUNK):
+                chunk_frames = range(chunk_start, min(chunk_start + FRAMES_PER_CHUNK, end + 1))
+                yield separator + ", ".join(f'"{frame}": {frame_labels}' for frame in chunk_frames)
+                separator = ", "
+        yield "}}"
+    yield '}, "classification_answers": {'
+    yield ", ".join(
+        f"{json.dumps(region.object_hash)}: {json.dumps(region.classification_answers)}" for region in plan.regions
+    )
+    yield '}, "consensus_meta": {}}'
+
+
+@traced(payload_size=lambda num_characters: num_characters)
+def write_export_json(plan: ExportPlan, file: TextIO) -> int:
+    """
+    Stream the JSON of the export to a text file.
+    :return: The number of characters written.
+    """
+    return sum(file.write(chunk) for chunk in iter_export_json(plan))
@@ -1,6 +1,8 @@
 from collections import defaultdict
-from typing import DefaultDict, Dict, List, Tuple
+from dataclasses import dataclass, field
+from typing import DefaultDict, Dict, List, Optional, Tuple
 
+import numpy as np
 from pydantic import BaseModel, Field
 
 
@@ -69,3 +71,187 @@ class RegionOfInterest(BaseModel):
                     res[source].append((start_frame_by_source.get(source, frame), frame))
                     del start_frame_by_source[source]
         return res
+
+
+# ---------- COMPACT HOT PATH REPRESENTATION ----------
+# The consensus pipeline works on the slotted classes below, which avoid pydantic validation and dict copies.
+# They are converted to the pydantic models above only at the UI/export boundary.
+
+
+@dataclass(slots=True, eq=False)
+class CompactAnswer:
+    """Counterpart of `Answer` that references the raw classification answers instead of copying them."""
+
+    classification_answers: Dict
+    name: str
+    value: str
+    feature_hash: str
+    fq_name: str
+    fq_parts: Tuple[FQPart, ...]
+    _answer: Optional[Answer] = field(default=None, init=False, repr=False)
+
+    def __hash__(self) -> int:
+        return hash(self.fq_name)
+
+    def __eq__(self, other):
+        return self.fq_name == other.fq_name
+
+    def to_answer(self) -> Answer:
+        if self._answer is None:
+            self._answer = Answer(
+                classification_answers=self.classification_answers,
+                name=self.name,
+                value=self.value,
+                feature_hash=self.feature_hash,
+                fq_name=self.fq_name,
+                fq_parts=list(self.fq_parts),
+            )
+        return self._answer
+
+
+@dataclass(slots=True)
+class CompactClassificationView:
+    """Counterpart of `ClassificationView` holding the frames in an integer array."""
+
+    answer: CompactAnswer
+    frames: np.ndarray
+    source_project_hash: str
+
+    def to_classification_view(self) -> ClassificationView:
+        return ClassificationView(
+            answer=self.answer.to_answer(), frames=self.frames.tolist(), source_project_hash=self.source_project_hash
+        )
+
+
+@dataclass(slots=True, eq=False)
+class CompactRegion:
+    """
+    Counterpart of `RegionOfInterest` backed by a boolean (sources x frames) vote matrix.
+
+    Row `i` of `votes` holds the frames voted by `source_project_hashes[i]`, column `j` represents the frame
+    `first_frame + j`. The per-frame dictionaries of `RegionOfInterest` are only built on demand.
+    """
+
+    answer: CompactAnswer | Answer
+    region_number: int
+    first_frame: int
+    source_project_hashes: Tuple[str, ...]
+    votes: np.ndarray
+    consensus_data: ConsensusData | None = None
+
+    def __hash__(self) -> int:
+        return hash(hash(self.answer) + self.region_number)
+
+    @property
+    def last_frame(self) -> int:
+        return self.first_frame + self.votes.shape[1] - 1
+
+    @property
+    def vote_counts(self) -> np.ndarray:
+        return self.votes.sum(axis=0, dtype=np.int64)
+
+    @property
+    def frame_vote_counts(self) -> Dict[int, int]:
+        return dict(zip(range(self.first_frame, self.last_frame + 1), self.vote_counts.tolist()))
+
+    @property
+    def vote_count_runs(self) -> List[Tuple[int, int, int]]:
+        """The `(start, end, count)` runs of constant vote count, like `IntervalRegion.vote_count_runs`."""
+        vote_counts = self.vote_counts
+        run_starts = np.flatnonzero(np.diff(vote_counts, prepend=-1))
+        run_ends = np.append(run_starts[1:], vote_counts.size) - 1
+        return list(
+            zip(
+                (run_starts + self.first_frame).tolist(),
+                (run_ends + self.first_frame).tolist(),
+                vote_counts[run_starts].tolist(),
+            )
+        )
+
+    @property
+    def frame_votes(self) -> Dict[int, List[str]]:
+        # Identical columns share the same voters, so the project hashes are only looked up once per distinct column
+        unique_columns, inverse = np.unique(self.votes, axis=1, return_inverse=True)
+        source_project_hashes = np.asarray(self.source_project_hashes, dtype=object)
+        voters = [source_project_hashes[column].tolist() for column in unique_columns.T]
+        return {
+            frame: list(voters[column])
+            for frame, column in zip(range(self.first_frame, self.last_frame + 1), inverse.reshape(-1).tolist())
+        }
+
+    @property
+    def ranges_by_source(self) -> DefaultDict[str, List[Tuple[int, int]]]:
+        padded_votes = np.pad(self.votes.astype(np.int8), ((0, 0), (1, 1)))
+        edges = np.diff(padded_votes, axis=1)
+        ranges = {}
+        for row, source in enumerate(self.source_project_hashes):
+            starts = np.flatnonzero(edges[row] == 1) + self.first_frame
+            ends = np.flatnonzero(edges[row] == -1) + self.first_frame - 1
+            if len(starts) > 0:
+                ranges[source] = list(zip(starts.tolist(), ends.tolist()))
+        # Keep the order of `RegionOfInterest.ranges_by_source`: sources sorted by the end of their first range
+        res = defaultdict(list)
+        for source in sorted(ranges, key=lambda s: ranges[s][0][1]):
+            res[source] = ranges[source]
+        return res
+
+    def to_region_of_interest(self) -> RegionOfInterest:
+        return RegionOfInterest(
+            answer=self.answer.to_answer() if isinstance(self.answer, CompactAnswer) else self.answer,
+            frame_votes=self.frame_votes,
+            frame_vote_counts=self.frame_vote_counts,
+            region_number=self.region_number,
+            consensus_data=self.consensus_data,
+        )
+
+
+@dataclass(slots=True, eq=False)
+class IntervalRegion:
+    """
+    Counterpart of `RegionOfInterest` backed by the voting intervals of each source.
+
+    All intervals are inclusive `(start, end)` frame ranges. `vote_count_runs` holds the `(start, end, count)` runs of
+    constant vote count that cover the region, the per-frame dictionaries of `RegionOfInterest` are only built on
+    demand.
+    """
+
+    answer: CompactAnswer | Answer
+    region_number: int
+    first_frame: int
+    last_frame: int
+    source_intervals: Dict[str, List[Tuple[int, int]]]
+    vote_count_runs: List[Tuple[int, int, int]]
+    consensus_data: ConsensusData | None = None
+
+    def __hash__(self) -> int:
+        return hash(hash(self.answer) + self.region_number)
+
+    @property
+    def frame_vote_counts(self) -> Dict[int, int]:
+        return {frame: count for start, end, count in self.vote_count_runs for frame in range(start, end + 1)}
+
+    @property
+    def frame_votes(self) -> Dict[int, List[str]]:
+        res = {frame: [] for frame in range(self.first_frame, self.last_frame + 1)}
+        for source, intervals in self.source_intervals.items():
+            for start, end in intervals:
+                for frame in range(start, end + 1):
+                    res[frame].append(source)
+        return res
+
+    @property
+    def ranges_by_source(self) -> DefaultDict[str, List[Tuple[int, int]]]:
+        # Keep the order of `RegionOfInterest.ranges_by_source`: sources sorted by the end of their first range
+        res = defaultdict(list)
+        for source in sorted(self.source_intervals, key=lambda s: self.source_intervals[s][0][1]):
+            res[source] = list(self.source_intervals[source])
+        return res
+
+    def to_region_of_interest(self) -> RegionOfInterest:
+        return RegionOfInterest(
+            answer=self.answer.to_answer() if isinstance(self.answer, CompactAnswer) else self.answer,
+            frame_votes=self.frame_votes,
+            frame_vote_counts=self.frame_vote_counts,
+            region_number=self.region_number,
+            consensus_data=self.consensus_data,
+        )
@@ -1,19 +1,101 @@
+import hashlib
+import json
 import logging
+import sys
+import threading
 from collections import defaultdict
-from typing import DefaultDict, Dict, List
+from typing import DefaultDict, Dict, List, Optional, Tuple
 
+import numpy as np
 from encord.constants.enums import DataType
 from encord.project import LabelRow
 
-from .data_model import Answer, ClassificationView, FQPart
+from .data_model import (
+    ClassificationView,
+    CompactAnswer,
+    CompactClassificationView,
+    FQPart,
+)
+from .tracing import traced
 
 
+class OntologyIndex:
+    """
+    Precomputed precedence of every nested attribute of the ontology's classifications.
+    Equivalent to calling `get_precedence` for each (classification feature hash, attribute feature hash) pair.
+    """
+
+    def __init__(self, ontology: List[Dict]):
+        self._precedence: Dict[Tuple[str, str], int] = {}
+        for classification in ontology:
+            attributes = classification.get("attributes") or []
+            if len(attributes) > 0:
+                self._index_subtree(classification["featureNodeHash"], attributes[0])
+
+    def _index_subtree(self, feature_hash: str, root: Dict) -> None:
+        to_visit = [root]
+        while to_visit:
+            subtree = to_visit.pop()
+            key = (feature_hash, subtree["featureNodeHash"])
+            if key in self._precedence:
+                continue
+            self._precedence[key] = int("".join(subtree["id"].split(".")))
+            to_visit.extend(reversed(subtree.get("options", [])))
+
+    def get_precedence(self, feature_hash: str, answer_hash: str) -> int:
+        return self._precedence[(feature_hash, answer_hash)]
+
+    def sort_key(self, feature_hash: str, answer_hash: str) -> Tuple[int, int, str]:
+        """
+        Sort key of the answers of a classification by precedence. Answers missing from the ontology, e.g. options
+        added since it was fetched, are sorted last by hash instead of failing.
+        """
+        precedence = self._precedence.get((feature_hash, answer_hash))
+        if precedence is None:
+            return 1, 0, answer_hash
+        return 0, precedence, answer_hash
+
+
+# The index of each ontology hash, with the classifications it was built from and their fingerprint
+_ontology_indexes: Dict[str, Tuple[List[Dict], str, OntologyIndex]] = {}
+_ontology_indexes_lock = threading.Lock()
+
+
+def _fingerprint(ontology: List[Dict]) -> str:
+    return hashlib.sha1(json.dumps(ontology, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+@traced()
+def get_ontology_index(ontology_hash: str, ontology: List[Dict]) -> OntologyIndex:
+    """
+    Return the index of an ontology, building it only the first time this version of the ontology is seen in this
+    process. Ontologies edited in place keep their hash, so the classifications are fingerprinted once per fetch,
+    i.e. whenever a new classifications object is passed, and the index is rebuilt only when the fingerprint changes.
+
+    :param ontology_hash: The hash of the ontology, used as cache key.
+    :param ontology: The classifications of the ontology.
+    """
+    with _ontology_indexes_lock:
+        cached = _ontology_indexes.get(ontology_hash)
+        if cached is not None and cached[0] is ontology:
+            return cached[2]
+    fingerprint = _fingerprint(ontology)
+    with _ontology_indexes_lock:
+        cached = _ontology_indexes.get(ontology_hash)
+        index = cached[2] if cached is not None and cached[1] == fingerprint else OntologyIndex(ontology)
+        _ontology_indexes[ontology_hash] = (ontology, fingerprint, index)
+        return index
+
+
+@traced()
 def get_precedence(ontology, feature_hash, answer_hash):
     attributes = [x for x in ontology if x["featureNodeHash"] == feature_hash]
     assert len(attributes) == 1
     attributes = attributes[0]
 
-    def recurse(subtree, answer_hash, res=set()):
+    def recurse(subtree, answer_hash, res=None):
+        if res is None:
+            res = set()
         if subtree["featureNodeHash"] == answer_hash:
             return res.union({subtree["id"]})
         else:
@@ -44,11 +126,50 @@ def from_label_row_to_labels_per_frame(lr: LabelRow) -> dict:
     return frames
 
 
-def prepare_data_for_consensus(ontology, lr_data) -> List[ClassificationView]:
+# Label row fields still needed once the label row has been prepared for consensus
+SLIM_LABEL_ROW_FIELDS = [
+    "label_hash",
+    "last_edited_at",
+    "dataset_hash",
+    "dataset_title",
+    "data_title",
+    "data_hash",
+    "data_type",
+]
+
+
+def slim_label_row(lr: LabelRow) -> LabelRow:
+    """
+    Project a label row on what is needed after its classifications have been prepared for consensus: its version
+    (label hash and last edit), the fields of the export header and its data units without their labels.
+    """
+    slim_lr = {k: lr.get(k) for k in SLIM_LABEL_ROW_FIELDS}
+    slim_lr["data_units"] = {
+        du_hash: {k: v for k, v in du.items() if k != "labels"} for du_hash, du in lr.get("data_units", {}).items()
+    }
+    return LabelRow(slim_lr)
+
+
+@traced()
+def prepare_data_for_consensus(
+    ontology, lr_data, ontology_index: Optional[OntologyIndex] = None
+) -> List[ClassificationView]:
+    return [
+        view.to_classification_view()
+        for view in prepare_compact_data_for_consensus(ontology, lr_data, ontology_index=ontology_index)
+    ]
+
+
+@traced()
+def prepare_compact_data_for_consensus(
+    ontology, lr_data, ontology_index: Optional[OntologyIndex] = None
+) -> List[CompactClassificationView]:
+    if ontology_index is None:
+        ontology_index = OntologyIndex(ontology)
     out = []
     for project_hash, lr in lr_data.items():
-        lookup: Dict[str, Answer] = {}
-        res: DefaultDict[Answer, list[int]] = defaultdict(list[int])
+        lookup: Dict[str, CompactAnswer] = {}
+        res: DefaultDict[CompactAnswer, list[int]] = defaultdict(list[int])
 
         labels_per_frame = from_label_row_to_labels_per_frame(lr)
         for frame, labels in labels_per_frame.items():
@@ -73,21 +194,24 @@ def prepare_data_for_consensus(ontology, lr_data) -> List[ClassificationView]:
                                 f"Only 1 answer is currently supported."
                             )
                     sorted_fq_parts = sorted(
-                        fq_parts,
-                        key=lambda x: get_precedence(ontology, cl["featureHash"], x.feature_hash),
+                        fq_parts, key=lambda x: ontology_index.sort_key(cl["featureHash"], x.feature_hash)
                     )
-                    fq_name = "&".join([x.fq_part for x in sorted_fq_parts])
-                    lookup[cl["classificationHash"]] = Answer(
+                    lookup[cl["classificationHash"]] = CompactAnswer(
                         classification_answers=classification_answers,
-                        name=cl["name"],
-                        value=cl["value"],
-                        feature_hash=cl["featureHash"],
-                        fq_name=fq_name,
-                        fq_parts=sorted_fq_parts,
+                        name=sys.intern(cl["name"]),
+                        value=sys.intern(cl["value"]),
+                        feature_hash=sys.intern(cl["featureHash"]),
+                        fq_name=sys.intern("&".join([x.fq_part for x in sorted_fq_parts])),
+                        fq_parts=tuple(sorted_fq_parts),
                     )
                 answer = lookup[cl["classificationHash"]]
                 res[answer].append(int(frame))
         out.extend(
-            [ClassificationView(answer=kv[0], frames=kv[1], source_project_hash=project_hash) for kv in res.items()]
+            [
+                CompactClassificationView(
+                    answer=answer, frames=np.asarray(frames, dtype=np.int64), source_project_hash=project_hash
+                )
+                for answer, frames in res.items()
+            ]
         )
     return out
@@ -0,0 +1,653 @@
+"""
+In-process stand-in for the Encord API, to load test and benchmark the app and the CLI without the platform.
+
+The fake client implements the subset of `EncordUserClient`, `Project` and `Dataset` used by this package. It's backed
+by synthetic label rows (see `synthetic_data`) or by label rows recorded with `save_recording`, and every call can be
+slowed down, throttled or failed on purpose. Enable it by setting `ENCORD_CONSENSUS_FAKE_BACKEND` to `1` (default
+config) or to the path of a JSON file with the fields of `FakeBackendConfig`. `0`, `false` and `no` disable it.
+"""
+import dataclasses
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from encord.constants.enums import DataType
+from encord.exceptions import (
+    GenericServerError,
+    RequestException,
+    ResourceExistsError,
+    ResourceNotFoundError,
+)
+from encord.orm.dataset import DataRow, StorageLocation
+from encord.orm.label_row import (
+    AnnotationTaskStatus,
+    LabelRow,
+    LabelRowMetadata,
+    LabelStatus,
+    WorkflowGraphNode,
+)
+
+from .synthetic_data import SyntheticDataSpec, generate_label_rows, generate_ontology
+
+FAKE_BACKEND_ENV_VAR = "ENCORD_CONSENSUS_FAKE_BACKEND"
+FAKE_DATASET_HASH = "fake-dataset"
+# Workflow stages of the label rows, the annotated ones are complete
+COMPLETE_STAGE = "COMPLETE"
+ANNOTATE_STAGE = "ANNOTATE"
+DEFAULT_PRIORITY = 0.5
+SIGNED_URL_EXPIRY_SECONDS = 7 * 24 * 3600
+
+
+class FakeRateLimitError(RequestException):
+    """Injected 429 Too Many Requests."""
+
+    status_code = 429
+
+
+class FakeServerError(GenericServerError):
+    """Injected 5xx server error."""
+
+    status_code = 503
+
+
+@dataclass
+class FakeBackendConfig:
+    """
+    :param num_annotator_projects: Number of projects whose label rows are annotated.
+    :param num_empty_projects: Number of projects whose label rows were never opened, e.g. downstream projects.
+    :param num_files: Number of videos of the dataset shared by all the projects.
+    :param data: The synthetic data of each video, its number of annotators is the number of annotator projects.
+    :param recording_dir: Directory written by `save_recording`, its label rows replace the synthetic ones.
+    :param latency: Mean number of seconds taken by each call.
+    :param latency_jitter: Maximum number of seconds randomly added to or removed from the latency.
+    :param max_calls_per_second: Calls over this throughput wait for their turn, unlimited if `None`.
+    :param rate_limit_error_rate: Probability that a call fails with a 429 error.
+    :param server_error_rate: Probability that a call fails with a 5xx error.
+    :param seed: Seed of the latency and error injection.
+    """
+
+    num_annotator_projects: int = 3
+    num_empty_projects: int = 1
+    num_files: int = 20
+    data: SyntheticDataSpec = field(default_factory=SyntheticDataSpec)
+    recording_dir: Optional[str] = None
+    latency: float = 0.05
+    latency_jitter: float = 0.02
+    max_calls_per_second: Optional[float] = None
+    rate_limit_error_rate: float = 0.0
+    server_error_rate: float = 0.0
+    seed: int = 0
+
+    @classmethod
+    def from_dict(cls, config: Dict) -> "FakeBackendConfig":
+        config = dict(config)
+        if "data" in config:
+            config["data"] = SyntheticDataSpec(**config["data"])
+        return cls(**config)
+
+
+@dataclass
+class _StoredLabelRow:
+    project_hash: str
+    data_hash: str
+    label_hash: Optional[str]
+    workflow_stage: str
+    priority: float = DEFAULT_PRIORITY
+    last_edited_at: Optional[datetime] = None
+    # Serialised like an API response, so every read returns a fresh copy and costs what parsing a response costs
+    serialised: Optional[str] = None
+
+
+def _stable_hash(*parts) -> str:
+    return hashlib.sha1("/".join(map(str, parts)).encode()).hexdigest()[:16]
+
+
+class FakeBackend:
+    """
+    The state shared by all the fake clients of the process: projects, label rows and call counters.
+    """
+
+    def __init__(self, config: FakeBackendConfig):
+        self.config = config
+        self._lock = threading.Lock()
+        self._rng = random.Random(config.seed)
+        self._next_call_slot = 0.0
+        self.call_counts: Counter = Counter()
+        self.error_counts: Counter = Counter()
+        self.bytes_sent = 0
+        self.throttled_seconds = 0.0
+
+        self._recorded: Dict[str, Dict[str, LabelRow]] = {}
+        if config.recording_dir is not None:
+            self.ontology, self._recorded = load_recording(Path(config.recording_dir))
+            annotator_project_hashes = list(self._recorded)
+            self.data_hashes = sorted({data_hash for rows in self._recorded.values() for data_hash in rows})
+        else:
+            self.ontology = generate_ontology(config.data)
+            annotator_project_hashes = [f"fake-project-{idx}" for idx in range(config.num_annotator_projects)]
+            self.data_hashes = [f"fake-data-{idx:05d}" for idx in range(config.num_files)]
+        empty_project_hashes = [
+            f"fake-project-{idx}"
+            for idx in range(len(annotator_project_hashes), len(annotator_project_hashes) + config.num_empty_projects)
+        ]
+        self.annotator_project_hashes = annotator_project_hashes
+        self.project_titles = {
+            **{p_hash: f"Fake annotator project {idx}" for idx, p_hash in enumerate(annotator_project_hashes)},
+            **{p_hash: f"Fake empty project {idx}" for idx, p_hash in enumerate(empty_project_hashes)},
+        }
+        self.ontology_hash = _stable_hash(json.dumps(self.ontology, sort_keys=True))
+        created_at = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        self._rows: Dict[Tuple[str, str], _StoredLabelRow] = {}
+        self._keys_by_label_hash: Dict[str, Tuple[str, str]] = {}
+        for project_hash in self.project_titles:
+            for data_hash in self.data_hashes:
+                annotated = project_hash in annotator_project_hashes
+                label_hash = _stable_hash("label", project_hash, data_hash) if annotated else None
+                self._rows[(project_hash, data_hash)] = _StoredLabelRow(
+                    project_hash=project_hash,
+                    data_hash=data_hash,
+                    label_hash=label_hash,
+                    workflow_stage=COMPLETE_STAGE if annotated else ANNOTATE_STAGE,
+                    last_edited_at=created_at if annotated else None,
+                )
+                if label_hash is not None:
+                    self._keys_by_label_hash[label_hash] = (project_hash, data_hash)
+        # Synthetic label rows are generated on first read, all the projects of a video at once
+        self._generation_locks: Dict[str, threading.Lock] = defaultdict(threading.Lock)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "calls": dict(self.call_counts),
+                "total_calls": sum(self.call_counts.values()),
+                "errors": dict(self.error_counts),
+                "bytes_sent": self.bytes_sent,
+                "throttled_seconds": round(self.throttled_seconds, 3),
+            }
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.call_counts.clear()
+            self.error_counts.clear()
+            self.bytes_sent = 0
+            self.throttled_seconds = 0.0
+
+    def call(self, name: str) -> None:
+        """Account for a call to the API: throttle it, wait for its latency and maybe fail it."""
+        config = self.config
+        with self._lock:
+            self.call_counts[name] += 1
+            now = time.monotonic()
+            wait = 0.0
+            if config.max_calls_per_second:
+                slot = max(now, self._next_call_slot)
+                self._next_call_slot = slot + 1 / config.max_calls_per_second
+                wait = slot - now
+                self.throttled_seconds += wait
+            latency = max(0.0, config.latency + self._rng.uniform(-config.latency_jitter, config.latency_jitter))
+            draw = self._rng.random()
+        time.sleep(wait + latency)
+        if draw < config.rate_limit_error_rate:
+            self._count_error("429")
+            raise FakeRateLimitError(f"429 Too Many Requests on {name}")
+        if draw < config.rate_limit_error_rate + config.server_error_rate:
+            self._count_error("5xx")
+            raise FakeServerError(f"503 Service Unavailable on {name}")
+
+    def _count_error(self, kind: str) -> None:
+        with self._lock:
+            self.error_counts[kind] += 1
+
+    def _count_bytes(self, payload: str) -> None:
+        with self._lock:
+            self.bytes_sent += len(payload)
+
+    def get_row(self, project_hash: str, data_hash: str) -> _StoredLabelRow:
+        try:
+            return self._rows[(project_hash, data_hash)]
+        except KeyError:
+            raise ResourceNotFoundError(f"Data {data_hash} is not in project {project_hash}.") from None
+
+    def rows_of_project(self, project_hash: str) -> List[_StoredLabelRow]:
+        return [self._rows[(project_hash, data_hash)] for data_hash in self.data_hashes]
+
+    def key_of_label_hash(self, label_hash: str) -> Tuple[str, str]:
+        try:
+            return self._keys_by_label_hash[label_hash]
+        except KeyError:
+            raise ResourceNotFoundError(f"Label row {label_hash} does not exist.") from None
+
+    def read_label_row(self, row: _StoredLabelRow) -> LabelRow:
+        if row.serialised is None:
+            self._materialise(row.data_hash)
+        self._count_bytes(row.serialised)
+        return LabelRow(json.loads(row.serialised))
+
+    def write_label_row(self, row: _StoredLabelRow, label_row: Dict) -> None:
+        with self._lock:
+            if row.label_hash is None:
+                row.label_hash = _stable_hash("label", row.project_hash, row.data_hash)
+                self._keys_by_label_hash[row.label_hash] = (row.project_hash, row.data_hash)
+            row.serialised = json.dumps({**label_row, "label_hash": row.label_hash})
+            row.last_edited_at = datetime.now(timezone.utc)
+
+    def _materialise(self, data_hash: str) -> None:
+        with self._lock:
+            generation_lock = self._generation_locks[data_hash]
+        with generation_lock:
+            rows = [self._rows[(project_hash, data_hash)] for project_hash in self.project_titles]
+            if all(row.serialised is not None for row in rows):
+                return
+            if self._recorded:
+                label_rows = {p_hash: rows_by_data[data_hash] for p_hash, rows_by_data in self._recorded.items()}
+            else:
+                spec = dataclasses.replace(self.config.data, num_annotators=len(self.annotator_project_hashes))
+                generated = generate_label_rows(spec, self.ontology, data_hash)
+                label_rows = dict(zip(self.annotator_project_hashes, generated.values()))
+            template = next(iter(label_rows.values()))
+            for row in rows:
+                if row.serialised is not None:
+                    continue
+                label_row = label_rows.get(row.project_hash)
+                if label_row is None:
+                    label_row = _empty_label_row(template)
+                label_row = {
+                    **label_row,
+                    "label_hash": row.label_hash,
+                    "data_title": self.data_title(data_hash),
+                    "dataset_hash": FAKE_DATASET_HASH,
+                    "dataset_title": "Fake dataset",
+                }
+                row.serialised = json.dumps(label_row)
+
+    def data_title(self, data_hash: str) -> str:
+        return f"{data_hash}.mp4"
+
+
+def _empty_label_row(template: Dict) -> Dict:
+    data_units = {
+        data_hash: {**data_unit, "labels": {}} for data_hash, data_unit in template["data_units"].items()
+    }
+    return {
+        **template,
+        "data_units": data_units,
+        "object_answers": {},
+        "classification_answers": {},
+        "object_actions": {},
+        "label_status": LabelStatus.NOT_LABELLED.value,
+    }
+
+
+class _FakeBundle:
+    """Operations added to a bundle are applied together on exit, as a single call per kind of operation."""
+
+    def __init__(self, backend: FakeBackend):
+        self._backend = backend
+        self._operations: Dict[str, List[Callable[[], None]]] = defaultdict(list)
+
+    def add(self, kind: str, operation: Callable[[], None]) -> None:
+        self._operations[kind].append(operation)
+
+    def __enter__(self) -> "_FakeBundle":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        if exc_type is not None:
+            return
+        for kind, operations in self._operations.items():
+            self._backend.call(f"bundle.{kind}")
+            for operation in operations:
+                operation()
+
+
+class _FakeInstance:
+    """Object or classification instance of a `_FakeLabelRowV2`: its answers and its entries on each frame."""
+
+    def __init__(self, answers: Dict, frame_entries: Dict[str, Dict]):
+        self.answers = answers
+        self.frame_entries = frame_entries
+
+    def copy(self) -> "_FakeInstance":
+        return _FakeInstance(json.loads(json.dumps(self.answers)), {f: dict(e) for f, e in self.frame_entries.items()})
+
+
+def _instances_of(label_row: Dict, kind: str, answers_key: str, hash_key: str) -> List[_FakeInstance]:
+    frame_entries: Dict[str, Dict[str, Dict]] = defaultdict(dict)
+    for data_unit in label_row["data_units"].values():
+        for frame, labels in data_unit.get("labels", {}).items():
+            for entry in labels.get(kind, []):
+                frame_entries[entry[hash_key]][frame] = entry
+    return [
+        _FakeInstance(label_row[answers_key].get(instance_hash, {}), entries)
+        for instance_hash, entries in frame_entries.items()
+    ]
+
+
+class _FakeLabelRowV2:
+    """The subset of `LabelRowV2` used to sync workflows."""
+
+    def __init__(self, project: "FakeProject", row: _StoredLabelRow):
+        self._project = project
+        self._row = row
+        self.data_hash = row.data_hash
+        self.label_hash = row.label_hash
+        self.priority = row.priority
+        self.workflow_graph_node = WorkflowGraphNode(uuid=row.workflow_stage, title=row.workflow_stage)
+        self.is_labelling_initialised = False
+        self._label_row: Optional[Dict] = None
+        self._objects: List[_FakeInstance] = []
+        self._classifications: List[_FakeInstance] = []
+
+    def initialise_labels(
+        self,
+        include_object_feature_hashes: Optional[Set[str]] = None,
+        include_classification_feature_hashes: Optional[Set[str]] = None,
+        overwrite: bool = False,
+        bundle: Optional[_FakeBundle] = None,
+        **kwargs,
+    ) -> None:
+        def initialise() -> None:
+            self._label_row = self._project._backend.read_label_row(self._row)
+            self._objects = _instances_of(self._label_row, "objects", "object_answers", "objectHash")
+            self._classifications = _instances_of(
+                self._label_row, "classifications", "classification_answers", "classificationHash"
+            )
+            if include_object_feature_hashes is not None:
+                self._objects = [
+                    o for o in self._objects if o.answers.get("featureHash") in include_object_feature_hashes
+                ]
+            if include_classification_feature_hashes is not None:
+                self._classifications = [
+                    c
+                    for c in self._classifications
+                    if any(e["featureHash"] in include_classification_feature_hashes for e in c.frame_entries.values())
+                ]
+            self.is_labelling_initialised = True
+
+        self._project._run("initialise_labels", initialise, bundle)
+
+    def get_object_instances(self) -> List[_FakeInstance]:
+        return list(self._objects)
+
+    def get_classification_instances(self) -> List[_FakeInstance]:
+        return list(self._classifications)
+
+    def add_object_instance(self, instance: _FakeInstance) -> None:
+        self._objects.append(instance)
+
+    def add_classification_instance(self, instance: _FakeInstance) -> None:
+        self._classifications.append(instance)
+
+    def set_priority(self, priority: float, bundle: Optional[_FakeBundle] = None) -> None:
+        def set_priority() -> None:
+            self._row.priority = self.priority = priority
+
+        self._project._run("set_priority", set_priority, bundle)
+
+    def save(self, bundle: Optional[_FakeBundle] = None) -> None:
+        if not self.is_labelling_initialised:
+            raise ValueError("Label rows must be initialised before being saved.")
+
+        def save() -> None:
+            label_row = dict(self._label_row)
+            data_hash = self.data_hash
+            labels: Dict[str, Dict] = {}
+            for kind, answers_key, hash_key, instances in (
+                ("objects", "object_answers", "objectHash", self._objects),
+                ("classifications", "classification_answers", "classificationHash", self._classifications),
+            ):
+                label_row[answers_key] = {}
+                for instance in instances:
+                    for frame, entry in instance.frame_entries.items():
+                        labels.setdefault(frame, {"objects": [], "classifications": []})[kind].append(entry)
+                        label_row[answers_key][entry[hash_key]] = instance.answers
+            label_row["data_units"] = {**label_row["data_units"]}
+            label_row["data_units"][data_hash] = {**label_row["data_units"][data_hash], "labels": labels}
+            self._project._backend.write_label_row(self._row, label_row)
+            self.label_hash = self._row.label_hash
+
+        self._project._run("save", save, bundle)
+
+
+class FakeProject:
+    """The subset of `Project` used by this package."""
+
+    def __init__(self, backend: FakeBackend, project_hash: str):
+        self._backend = backend
+        self.project_hash = project_hash
+        self.title = backend.project_titles[project_hash]
+        self.ontology_hash = backend.ontology_hash
+        self.ontology = {"objects": [], "classifications": backend.ontology}
+        self.datasets = [{"dataset_hash": FAKE_DATASET_HASH, "title": "Fake dataset"}]
+
+    def _run(self, kind: str, operation: Callable[[], None], bundle: Optional[_FakeBundle]) -> None:
+        if bundle is None:
+            self._backend.call(kind)
+            operation()
+        else:
+            bundle.add(kind, operation)
+
+    def get_project(self) -> Dict:
+        self._backend.call("get_project")
+        return {
+            "project_hash": self.project_hash,
+            "title": self.title,
+            "editor_ontology": {"objects": [], "classifications": self._backend.ontology},
+        }
+
+    def _metadata(self, row: _StoredLabelRow) -> LabelRowMetadata:
+        annotated = row.label_hash is not None
+        return LabelRowMetadata(
+            label_hash=row.label_hash,
+            created_at=row.last_edited_at,
+            last_edited_at=row.last_edited_at,
+            data_hash=row.data_hash,
+            dataset_hash=FAKE_DATASET_HASH,
+            dataset_title="Fake dataset",
+            data_title=self._backend.data_title(row.data_hash),
+            data_type=DataType.VIDEO.value,
+            data_link=None,
+            label_status=LabelStatus.LABELLED if annotated else LabelStatus.NOT_LABELLED,
+            annotation_task_status=AnnotationTaskStatus.COMPLETED if annotated else AnnotationTaskStatus.QUEUED,
+            workflow_graph_node=WorkflowGraphNode(uuid=row.workflow_stage, title=row.workflow_stage),
+            is_shadow_data=False,
+            number_of_frames=self._backend.config.data.num_frames,
+            duration=None,
+            frames_per_second=None,
+            height=None,
+            width=None,
+            priority=row.priority,
+        )
+
+    def list_label_rows(
+        self,
+        data_hashes: Optional[List[str]] = None,
+        include_uninitialised_labels: bool = False,
+        **kwargs,
+    ) -> List[LabelRowMetadata]:
+        self._backend.call("list_label_rows")
+        rows = self._backend.rows_of_project(self.project_hash)
+        if data_hashes is not None:
+            wanted = set(data_hashes)
+            rows = [row for row in rows if row.data_hash in wanted]
+        if not include_uninitialised_labels:
+            rows = [row for row in rows if row.label_hash is not None]
+        return [self._metadata(row) for row in rows]
+
+    def list_label_rows_v2(
+        self,
+        data_hashes: Optional[List[str]] = None,
+        workflow_graph_node_title_eq: Optional[str] = None,
+        **kwargs,
+    ) -> List[_FakeLabelRowV2]:
+        self._backend.call("list_label_rows_v2")
+        rows = self._backend.rows_of_project(self.project_hash)
+        if data_hashes is not None:
+            wanted = set(data_hashes)
+            rows = [row for row in rows if row.data_hash in wanted]
+        if workflow_graph_node_title_eq is not None:
+            rows = [row for row in rows if row.workflow_stage == workflow_graph_node_title_eq]
+        return [_FakeLabelRowV2(self, row) for row in rows]
+
+    def get_label_row(self, uid: str, **kwargs) -> LabelRow:
+        self._backend.call("get_label_row")
+        project_hash, data_hash = self._backend.key_of_label_hash(uid)
+        if project_hash != self.project_hash:
+            raise ResourceNotFoundError(f"Label row {uid} is not in project {self.project_hash}.")
+        return self._backend.read_label_row(self._backend.get_row(project_hash, data_hash))
+
+    def create_label_row(self, uid: str, **kwargs) -> LabelRow:
+        self._backend.call("create_label_row")
+        row = self._backend.get_row(self.project_hash, uid)
+        if row.label_hash is not None:
+            raise ResourceExistsError(f"The label row of data {uid} already exists.")
+        label_row = self._backend.read_label_row(row)
+        self._backend.write_label_row(row, label_row)
+        return LabelRow({**label_row, "label_hash": row.label_hash})
+
+    def save_label_row(self, uid: str, label: Dict, **kwargs) -> bool:
+        self._backend.call("save_label_row")
+        project_hash, data_hash = self._backend.key_of_label_hash(uid)
+        self._backend.write_label_row(self._backend.get_row(project_hash, data_hash), label)
+        return True
+
+    def get_data(self, data_hash: str, get_signed_url: bool = False) -> Tuple[Optional[Dict], Optional[List[Dict]]]:
+        self._backend.call("get_data")
+        self._backend.get_row(self.project_hash, data_hash)
+        file_link = f"https://storage.example.com/{data_hash}.mp4"
+        if get_signed_url:
+            signed_at = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+            file_link += f"?X-Amz-Date={signed_at}&X-Amz-Expires={SIGNED_URL_EXPIRY_SECONDS}"
+        video = {"data_hash": data_hash, "title": self._backend.data_title(data_hash), "file_link": file_link}
+        return video, None
+
+    def create_bundle(self) -> _FakeBundle:
+        return _FakeBundle(self._backend)
+
+
+class FakeDataset:
+    def __init__(self, backend: FakeBackend, dataset_hash: str):
+        self._backend = backend
+        self.dataset_hash = dataset_hash
+
+    def list_data_rows(self, data_types: Optional[List[DataType]] = None, **kwargs) -> List[DataRow]:
+        self._backend.call("list_data_rows")
+        if data_types is not None and DataType.VIDEO not in data_types:
+            return []
+        created_at = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        return [
+            DataRow(
+                uid=data_hash,
+                title=self._backend.data_title(data_hash),
+                data_type=DataType.VIDEO,
+                created_at=created_at,
+                last_edited_at=created_at,
+                width=None,
+                height=None,
+                file_link=None,
+                file_size=None,
+                file_type="video/mp4",
+                storage_location=StorageLocation.CORD_STORAGE,
+                client_metadata=None,
+                frames_per_second=None,
+                duration=None,
+                images_data=None,
+                signed_url=None,
+                is_optimised_image_group=None,
+                backing_item_uuid=None,
+            )
+            for data_hash in self._backend.data_hashes
+        ]
+
+
+class FakeEncordUserClient:
+    """The subset of `EncordUserClient` used by this package."""
+
+    def __init__(self, backend: FakeBackend):
+        self.backend = backend
+
+    def get_project(self, project_hash: str) -> FakeProject:
+        self.backend.call("get_project")
+        if project_hash not in self.backend.project_titles:
+            raise ResourceNotFoundError(f"Project {project_hash} does not exist.")
+        return FakeProject(self.backend, project_hash)
+
+    def get_projects(self, title_like: Optional[str] = None, **kwargs) -> List[Dict]:
+        self.backend.call("get_projects")
+        query = (title_like or "").strip("%").lower()
+        return [
+            {"project": FakeProject(self.backend, project_hash), "user_role": "ADMIN"}
+            for project_hash, title in self.backend.project_titles.items()
+            if query in title.lower()
+        ]
+
+    def get_dataset(self, dataset_hash: str, **kwargs) -> FakeDataset:
+        self.backend.call("get_dataset")
+        if dataset_hash != FAKE_DATASET_HASH:
+            raise ResourceNotFoundError(f"Dataset {dataset_hash} does not exist.")
+        return FakeDataset(self.backend, dataset_hash)
+
+
+def save_recording(directory: Path, ontology: List[Dict], label_rows: Dict[str, Dict[str, Dict]]) -> None:
+    """
+    Record label rows to replay them with the fake backend.
+
+    :param directory: The directory to write to.
+    :param ontology: The classifications of the ontology of the projects.
+    :param label_rows: The label rows keyed by project hash, then by data hash.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    (directory / "ontology.json").write_text(json.dumps(ontology), encoding="utf-8")
+    for project_hash, rows in label_rows.items():
+        project_dir = directory / "label_rows" / project_hash
+        project_dir.mkdir(parents=True, exist_ok=True)
+        for data_hash, label_row in rows.items():
+            (project_dir / f"{data_hash}.json").write_text(json.dumps(label_row), encoding="utf-8")
+
+
+def load_recording(directory: Path) -> Tuple[List[Dict], Dict[str, Dict[str, LabelRow]]]:
+    """Load the ontology and the label rows written by `save_recording`."""
+    ontology = json.loads((directory / "ontology.json").read_text(encoding="utf-8"))
+    label_rows: Dict[str, Dict[str, LabelRow]] = {}
+    for project_dir in sorted((directory / "label_rows").iterdir()):
+        label_rows[project_dir.name] = {
+            path.stem: LabelRow(json.loads(path.read_text(encoding="utf-8")))
+            for path in sorted(project_dir.glob("*.json"))
+        }
+    return ontology, label_rows
+
+
+def is_fake_backend_enabled() -> bool:
+    return os.getenv(FAKE_BACKEND_ENV_VAR, "").strip().lower() not in ("", "0", "false", "no")
+
+
+def read_fake_backend_config() -> FakeBackendConfig:
+    value = os.getenv(FAKE_BACKEND_ENV_VAR, "").strip()
+    if value.lower() in ("1", "true", "yes"):
+        return FakeBackendConfig()
+    return FakeBackendConfig.from_dict(json.loads(Path(value).read_text(encoding="utf-8")))
+
+
+_fake_backend: Optional[FakeBackend] = None
+_fake_backend_lock = threading.Lock()
+
+
+def get_fake_backend() -> FakeBackend:
+    """Return the fake backend of the process, configured from the environment on first use."""
+    global _fake_backend
+    with _fake_backend_lock:
+        if _fake_backend is None:
+            _fake_backend = FakeBackend(read_fake_backend_config())
+        return _fake_backend
+
+
+def get_fake_encord_client() -> FakeEncordUserClient:
+    return FakeEncordUserClient(get_fake_backend())
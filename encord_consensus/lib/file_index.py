@@ -0,0 +1,116 @@
+import re
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from encord import EncordUserClient, Project
+from encord.orm.label_row import LabelRowMetadata
+
+from .constants import SUPPORTED_DATA_TYPES
+from .project_access import (
+    MetadataCache,
+    get_all_dataset_hashes,
+    index_label_rows_by_data_hash,
+    list_all_data_rows,
+)
+
+# Separates the titles in the search haystack, it can't be part of a lowercased title
+_TITLE_SEPARATOR = "\n"
+
+
+@dataclass(slots=True)
+class FileIndexEntry:
+    title: str
+    data_hash: str
+    data_type: str
+    # Label status (or annotation task status in workflow projects) keyed by project hash
+    annotation_status: Dict[str, Optional[str]]
+
+
+class FileIndex:
+    """
+    Searchable index of the files of a dataset, ordered by title.
+
+    Prefix queries are answered with a bisection over the sorted lowercased titles. Substring queries are found by a
+    regular expression over a single string joining all of them, and the titles of the matches with a vectorised
+    lookup of their offsets, so a search only iterates over the matches in Python, never over all the entries.
+    """
+
+    def __init__(self, entries: List[FileIndexEntry]):
+        self.entries = sorted(entries, key=lambda e: (e.title.lower(), e.data_hash))
+        self._lower_titles = [e.title.lower().replace(_TITLE_SEPARATOR, " ") for e in self.entries]
+        self._haystack = _TITLE_SEPARATOR.join(self._lower_titles)
+        title_ends = np.cumsum([len(lower_title) + len(_TITLE_SEPARATOR) for lower_title in self._lower_titles])
+        self._title_offsets = np.concatenate(([0], title_ends[:-1])).astype(np.int64)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def search(self, query: str = "", page: int = 0, page_size: int = 50) -> Tuple[List[FileIndexEntry], int]:
+        """
+        Find the files whose title contains the query, case insensitively.
+        Files whose title starts with the query come first, both groups are ordered by title.
+
+        :param query: The text to look for, all the files match an empty query.
+        :param page: The page to return, starting at 0.
+        :param page_size: The number of files per page.
+        :return: The files of the page and the total number of matching files.
+        """
+        matches = self._match(query.strip().lower())
+        start = page * page_size
+        return [self.entries[idx] for idx in matches[start: start + page_size]], len(matches)
+
+    def count(self, query: str = "") -> int:
+        """Return the number of files whose title contains the query, case insensitively."""
+        return len(self._match(query.strip().lower()))
+
+    def _match(self, query: str) -> List[int] | range:
+        if not query:
+            return range(len(self.entries))
+        prefix_start = bisect_left(self._lower_titles, query)
+        # Titles starting with the query sort between the query and the query followed by the highest character
+        prefix_end = bisect_right(self._lower_titles, query + chr(0x10FFFF), lo=prefix_start)
+        positions = np.fromiter(
+            (match.start() for match in re.finditer(re.escape(query), self._haystack)), dtype=np.int64
+        )
+        # Titles with several matches are listed once, in title order
+        matched = np.unique(np.searchsorted(self._title_offsets, positions, side="right") - 1)
+        substring_matches = matched[(matched < prefix_start) | (matched >= prefix_end)]
+        return list(range(prefix_start, prefix_end)) + substring_matches.tolist()
+
+
+def _annotation_status(lr_metadata: LabelRowMetadata) -> Optional[str]:
+    # Workflow projects only have a task status
+    status = lr_metadata.annotation_task_status or lr_metadata.label_status
+    return status.value if status is not None else None
+
+
+def build_file_index(
+    user_client: EncordUserClient, projects: List[Project], cache: Optional[MetadataCache] = None
+) -> FileIndex:
+    """
+    Index the supported files of the dataset shared by the projects, with one listing per dataset and per project.
+    """
+    data_rows = list_all_data_rows(
+        user_client, get_all_dataset_hashes(projects[0]), data_types=SUPPORTED_DATA_TYPES, cache=cache
+    )
+    status_by_project = {
+        project.project_hash: {
+            data_hash: _annotation_status(lrm) for data_hash, lrm in index_label_rows_by_data_hash(project).items()
+        }
+        for project in projects
+    }
+    return FileIndex(
+        [
+            FileIndexEntry(
+                title=dr.title,
+                data_hash=dr.uid,
+                data_type=dr.data_type.value,
+                annotation_status={
+                    project_hash: statuses.get(dr.uid) for project_hash, statuses in status_by_project.items()
+                },
+            )
+            for dr in data_rows
+        ]
+    )
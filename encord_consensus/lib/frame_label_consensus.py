@@ -9,8 +9,10 @@ from .data_model import (
     ConsensusData,
     RegionOfInterest,
 )
+from .tracing import traced
 
 
+@traced()
 def aggregate_by_answer(
     prepared_data: List[ClassificationView],
 ) -> List[AggregatedView]:
@@ -27,6 +29,7 @@ def aggregate_by_answer(
     return processed_aggregated
 
 
+@traced()
 def find_regions_of_interest(
     aggregated_data: List[AggregatedView], total_num_annotators: int
 ) -> List[RegionOfInterest]:
@@ -37,7 +40,7 @@ def find_regions_of_interest(
         sections = []
         section = {}
         for f, n in sorted(agg_view.frame_votes.items()):
-            if not last_frame:
+            if last_frame is None:
                 last_frame = f - 1
             if f - 1 != last_frame:
                 sections.append(section)
@@ -100,7 +103,10 @@ def calculate_region_frame_level_min_n_agreement(
 
 
 def calculate_n_scores(region: RegionOfInterest) -> Dict[int, float]:
-    frame_level_min_n_agreement = calculate_region_frame_level_min_n_agreement(region)
+    return calculate_n_scores_from_min_n_agreement(calculate_region_frame_level_min_n_agreement(region))
+
+
+def calculate_n_scores_from_min_n_agreement(frame_level_min_n_agreement: Dict[int, int]) -> Dict[int, float]:
     n_scores = {}
     total_num_annotators = max(frame_level_min_n_agreement.keys())
     for n in range(2, total_num_annotators + 1):
@@ -1,13 +1,106 @@
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
 import altair as alt
 import altair.vegalite.v5.api as alt_api
 import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
 from matplotlib.figure import Figure
 from matplotlib.patches import Rectangle
 
-from encord_consensus.lib.data_model import RegionOfInterest
+from encord_consensus.lib.data_model import (
+    CompactRegion,
+    IntervalRegion,
+    RegionOfInterest,
+)
+from encord_consensus.lib.tracing import traced
+
+# Maximum number of data points (or intervals) sent to the browser per chart, about the width of a chart in pixels
+DEFAULT_MAX_CHART_POINTS = 1500
+
+
+def _count_chart_rows(chart: Optional[alt_api.TopLevelMixin]) -> Optional[int]:
+    data = getattr(chart, "data", None)
+    return len(data) if isinstance(data, pd.DataFrame) else None
+
+
+def compress_to_change_points(xs: np.ndarray, ys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Keep the first and last point of each run of consecutive points with the same value.
+    A step series drawn from the remaining points looks the same as the full series.
+    """
+    if xs.size <= 2:
+        return xs, ys
+    changes = np.flatnonzero(np.diff(ys) != 0)
+    keep = np.unique(np.concatenate(([0], changes, changes + 1, [xs.size - 1])))
+    return xs[keep], ys[keep]
+
+
+def runs_to_change_points(runs: List[Tuple[int, int, int]]) -> Tuple[np.ndarray, np.ndarray]:
+    """Turn `(start, end, value)` runs into their start and end points, single frame runs give a single point."""
+    xs, ys = [], []
+    for start, end, value in runs:
+        xs.append(start)
+        ys.append(value)
+        if end != start:
+            xs.append(end)
+            ys.append(value)
+    return np.asarray(xs, dtype=np.int64), np.asarray(ys, dtype=np.int64)
+
+
+def lttb_downsample(xs: np.ndarray, ys: np.ndarray, max_points: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Downsample a series with the Largest-Triangle-Three-Buckets algorithm, which keeps its visual shape.
+    The first and last points are always kept.
+    """
+    if xs.size <= max_points or max_points < 3:
+        return xs, ys
+    x_float, y_float = xs.astype(np.float64), ys.astype(np.float64)
+    bucket_edges = np.linspace(1, xs.size - 1, max_points - 1).astype(np.int64)
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0], selected[-1] = 0, xs.size - 1
+    previous = 0
+    for bucket in range(max_points - 2):
+        start, end = bucket_edges[bucket], bucket_edges[bucket + 1]
+        # The third vertex of the triangles is the average point of the next bucket
+        next_start, next_end = end, bucket_edges[bucket + 2] if bucket + 2 < max_points - 1 else xs.size
+        next_x, next_y = x_float[next_start:next_end].mean(), y_float[next_start:next_end].mean()
+        areas = np.abs(
+            (x_float[previous] - next_x) * (y_float[start:end] - y_float[previous])
+            - (x_float[previous] - x_float[start:end]) * (next_y - y_float[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    return xs[selected], ys[selected]
+
+
+def prepare_line_chart_data(
+    data: Dict[int, int] | List[Tuple[int, int, int]], max_points: int = DEFAULT_MAX_CHART_POINTS
+) -> pd.DataFrame:
+    """
+    Build the points of a line chart from per-frame values or `(start, end, value)` runs.
+    Only the change points are kept, and they are downsampled with LTTB if there are more than `max_points`.
+    """
+    if isinstance(data, dict):
+        xs, ys = compress_to_change_points(
+            np.fromiter(data.keys(), dtype=np.int64, count=len(data)),
+            np.fromiter(data.values(), dtype=np.int64, count=len(data)),
+        )
+    else:
+        xs, ys = runs_to_change_points(data)
+    xs, ys = lttb_downsample(xs, ys, max_points)
+    return pd.DataFrame({"x": xs, "y": ys})
+
+
+def merge_close_intervals(intervals: List[Tuple[int, int]], max_gap: float) -> List[Tuple[int, int]]:
+    """Merge the sorted intervals separated by at most `max_gap` frames, they can't be told apart on the chart."""
+    merged: List[Tuple[int, int]] = []
+    for start, end in intervals:
+        if merged and start - merged[-1][1] <= max_gap:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
 
 
 def generate_stacked_chart(
@@ -44,6 +137,7 @@ def generate_stacked_chart(
     return fig
 
 
+@traced(payload_size=_count_chart_rows)
 def get_bar_chart(data: dict, title: str, x_title: str, y_title: str) -> alt_api.Chart:
     data_df = pd.DataFrame({x_title: list(data.keys()), y_title: list(data.values())})
     chart = alt.Chart(
@@ -60,8 +154,19 @@ def get_bar_chart(data: dict, title: str, x_title: str, y_title: str) -> alt_api
     )
 
 
-def get_line_chart(data: dict, title: str, x_title: str, y_title: str) -> alt_api.Chart:
-    data_df = pd.DataFrame({"x": list(data.keys()), "y": list(data.values())})
+@traced(payload_size=_count_chart_rows)
+def get_line_chart(
+    data: Dict[int, int] | List[Tuple[int, int, int]],
+    title: str,
+    x_title: str,
+    y_title: str,
+    max_points: int = DEFAULT_MAX_CHART_POINTS,
+) -> alt_api.Chart:
+    """
+    :param data: The values per frame, or `(start, end, value)` runs of frames with the same value.
+    :param max_points: The maximum number of points sent to the browser, see `prepare_line_chart_data`.
+    """
+    data_df = prepare_line_chart_data(data, max_points)
     data_df["diff"] = data_df["y"].diff().fillna(0)
     data_df["segment"] = (data_df["diff"] != 0).cumsum()
     max_y = data_df["y"].max(skipna=True)
@@ -81,11 +186,22 @@ def get_line_chart(data: dict, title: str, x_title: str, y_title: str) -> alt_ap
     )
 
 
+@traced(payload_size=_count_chart_rows)
 def get_consensus_label_agreement_project_view_chart(
-    region: RegionOfInterest,
+    region: RegionOfInterest | CompactRegion | IntervalRegion,
     project_title_lookup: dict[str, str],
+    max_points: int = DEFAULT_MAX_CHART_POINTS,
 ) -> Optional[alt_api.Chart]:
     source_boxes = region.ranges_by_source
+    num_intervals = sum(len(intervals) for intervals in source_boxes.values())
+    if num_intervals > max_points:
+        # Intervals closer than the width covered by a single point would be drawn as one
+        first_frame = min(intervals[0][0] for intervals in source_boxes.values() if intervals)
+        last_frame = max(intervals[-1][1] for intervals in source_boxes.values() if intervals)
+        max_gap = (last_frame - first_frame + 1) * len(source_boxes) / max_points
+        source_boxes = {
+            proj_hash: merge_close_intervals(intervals, max_gap) for proj_hash, intervals in source_boxes.items()
+        }
 
     raw_data = []
     # Extract projects' data points from the region of interest
@@ -0,0 +1,144 @@
+from typing import Dict, List, Optional, Set, Tuple
+
+from encord.orm.label_row import LabelRow
+
+from .data_model import CompactAnswer, IntervalRegion
+from .data_transformation import OntologyIndex, prepare_compact_data_for_consensus
+from .interval_consensus import (
+    AnswerIntervals,
+    calculate_min_n_agreement_from_runs,
+    find_interval_regions,
+    frames_to_intervals,
+)
+from .tracing import traced
+
+
+class IncrementalConsensus:
+    """
+    Consensus of a file that can be patched when a single project is added, removed or updated.
+
+    The classification views of each project are kept (as intervals) keyed by the label row they come from,
+    so a change only re-derives the contribution of the affected project and re-sweeps the answers it votes on.
+    The regions of the other answers are kept, only their integrated agreement score is rescaled when the number
+    of annotators changes.
+    """
+
+    def __init__(self, ontology: List, ontology_index: Optional[OntologyIndex] = None):
+        self.ontology = ontology
+        self.ontology_index = ontology_index if ontology_index is not None else OntologyIndex(ontology)
+        self._project_hashes: List[str] = []
+        self._label_versions: Dict[str, Tuple[Optional[str], Optional[str]]] = {}
+        self._intervals_by_project: Dict[str, Dict[str, Tuple[CompactAnswer, List[Tuple[int, int]]]]] = {}
+        self._regions_by_answer: Dict[str, List[IntervalRegion]] = {}
+
+    @property
+    def project_hashes(self) -> List[str]:
+        return list(self._project_hashes)
+
+    @property
+    def total_num_annotators(self) -> int:
+        return len(self._project_hashes)
+
+    @property
+    def regions(self) -> List[IntervalRegion]:
+        return [region for regions in self._regions_by_answer.values() for region in regions]
+
+    @property
+    def frame_level_min_n_agreement(self) -> Dict[int, int]:
+        return calculate_min_n_agreement_from_runs([run for region in self.regions for run in region.vote_count_runs])
+
+    @traced()
+    def set_label_rows(self, lr_data: Dict[str, LabelRow]) -> Set[str]:
+        """
+        Add or update the label rows of several projects, re-sweeping each affected answer only once.
+
+        :param lr_data: The label rows keyed by project hash.
+        :return: The fully qualified names of the answers whose regions were recomputed.
+        """
+        affected_fq_names: Set[str] = set()
+        total_num_annotators = self.total_num_annotators
+        for project_hash, label_row in lr_data.items():
+            affected_fq_names |= self._set_project_intervals(project_hash, label_row)
+        self._patch(affected_fq_names, total_num_annotators != self.total_num_annotators)
+        return affected_fq_names
+
+    @traced()
+    def set_label_row(self, project_hash: str, label_row: LabelRow) -> Set[str]:
+        """
+        Add a project or update its label row. Nothing is recomputed if the label row hasn't been edited.
+
+        :return: The fully qualified names of the answers whose regions were recomputed.
+        """
+        return self.set_label_rows({project_hash: label_row})
+
+    @traced()
+    def remove_project(self, project_hash: str) -> Set[str]:
+        """
+        Remove a project from the consensus.
+
+        :return: The fully qualified names of the answers whose regions were recomputed.
+        """
+        if project_hash not in self._intervals_by_project:
+            return set()
+        self._project_hashes.remove(project_hash)
+        self._label_versions.pop(project_hash)
+        affected_fq_names = set(self._intervals_by_project.pop(project_hash))
+        self._patch(affected_fq_names, True)
+        return affected_fq_names
+
+    def _set_project_intervals(self, project_hash: str, label_row: LabelRow) -> Set[str]:
+        label_version = (label_row.get("label_hash"), label_row.get("last_edited_at"))
+        if project_hash in self._intervals_by_project and self._label_versions[project_hash] == label_version:
+            return set()
+
+        prepared_data = prepare_compact_data_for_consensus(
+            self.ontology, {project_hash: label_row}, ontology_index=self.ontology_index
+        )
+        project_intervals = {
+            view.answer.fq_name: (view.answer, intervals)
+            for view in prepared_data
+            if (intervals := frames_to_intervals(view.frames))
+        }
+        previous_intervals = self._intervals_by_project.get(project_hash, {})
+        if project_hash not in self._intervals_by_project:
+            self._project_hashes.append(project_hash)
+        self._label_versions[project_hash] = label_version
+        self._intervals_by_project[project_hash] = project_intervals
+        return {
+            fq_name
+            for fq_name in previous_intervals.keys() | project_intervals.keys()
+            if previous_intervals.get(fq_name, (None, None))[1] != project_intervals.get(fq_name, (None, None))[1]
+        }
+
+    def _patch(self, affected_fq_names: Set[str], total_num_annotators_changed: bool) -> None:
+        if total_num_annotators_changed:
+            for fq_name, regions in self._regions_by_answer.items():
+                if fq_name not in affected_fq_names:
+                    for region in regions:
+                        self._rescore(region)
+
+        for fq_name in affected_fq_names:
+            intervals_by_source = {}
+            answer = None
+            # Sources follow the projects' order so the votes are ordered as in a full recomputation
+            for project_hash in self._project_hashes:
+                if fq_name in self._intervals_by_project[project_hash]:
+                    project_answer, intervals = self._intervals_by_project[project_hash][fq_name]
+                    answer = answer or project_answer
+                    intervals_by_source[project_hash] = intervals
+            if answer is None:
+                self._regions_by_answer.pop(fq_name, None)
+                continue
+            self._regions_by_answer[fq_name] = find_interval_regions(
+                [AnswerIntervals(answer=answer, intervals_by_source=intervals_by_source)], self.total_num_annotators
+            )
+
+    def _rescore(self, region: IntervalRegion) -> None:
+        total_votes = sum((end - start + 1) * count for start, end, count in region.vote_count_runs)
+        region.consensus_data = region.consensus_data.model_copy(
+            update={
+                "integrated_agreement_score": round(
+                    total_votes / (self.total_num_annotators * (region.last_frame - region.first_frame + 1)), 4
+                )
+            }
+        )
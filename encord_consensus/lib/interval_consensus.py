@@ -0,0 +1,143 @@
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from .data_model import (
+    Answer,
+    ClassificationView,
+    CompactAnswer,
+    CompactClassificationView,
+    ConsensusData,
+    IntervalRegion,
+)
+from .frame_label_consensus import calculate_n_scores_from_min_n_agreement
+from .tracing import traced
+
+
+@dataclass
+class AnswerIntervals:
+    """Sorted, non-overlapping and inclusive `(start, end)` frame intervals voted by each source for an answer."""
+
+    answer: CompactAnswer | Answer
+    intervals_by_source: Dict[str, List[Tuple[int, int]]]
+
+
+def frames_to_intervals(frames) -> List[Tuple[int, int]]:
+    """Compress a collection of frames into sorted, non-overlapping and inclusive `(start, end)` intervals."""
+    frames = np.unique(np.asarray(frames, dtype=np.int64))
+    if frames.size == 0:
+        return []
+    breaks = np.flatnonzero(np.diff(frames) > 1)
+    starts = np.concatenate(([frames[0]], frames[breaks + 1]))
+    ends = np.concatenate((frames[breaks], [frames[-1]]))
+    return list(zip(starts.tolist(), ends.tolist()))
+
+
+@traced()
+def aggregate_intervals_by_answer(
+    prepared_data: List[CompactClassificationView] | List[ClassificationView],
+) -> List[AnswerIntervals]:
+    """Interval counterpart of `aggregate_by_answer`, each source keeps its frames as a list of intervals."""
+    aggregated: Dict[CompactAnswer | Answer, AnswerIntervals] = {}
+    for c in prepared_data:
+        intervals = frames_to_intervals(c.frames)
+        if not intervals:
+            continue
+        answer_intervals = aggregated.setdefault(c.answer, AnswerIntervals(answer=c.answer, intervals_by_source={}))
+        answer_intervals.intervals_by_source[c.source_project_hash] = intervals
+    return list(aggregated.values())
+
+
+def sweep_vote_count_runs(intervals_by_source: Dict[str, List[Tuple[int, int]]]) -> List[List[Tuple[int, int, int]]]:
+    """
+    Sweep over the interval endpoints to find the runs of constant vote count.
+
+    :return: The `(start, end, count)` runs of each region, a region being a maximal section of frames with votes.
+    """
+    deltas: Dict[int, int] = {}
+    for intervals in intervals_by_source.values():
+        for start, end in intervals:
+            deltas[start] = deltas.get(start, 0) + 1
+            deltas[end + 1] = deltas.get(end + 1, 0) - 1
+
+    regions: List[List[Tuple[int, int, int]]] = []
+    runs: List[Tuple[int, int, int]] = []
+    active = 0
+    previous_position = None
+    for position in sorted(deltas):
+        if active > 0:
+            runs.append((previous_position, position - 1, active))
+        active += deltas[position]
+        if active == 0 and runs:
+            regions.append(runs)
+            runs = []
+        previous_position = position
+    return regions
+
+
+def calculate_min_n_agreement_from_runs(runs: List[Tuple[int, int, int]]) -> Dict[int, int]:
+    """Interval counterpart of `process_vote_counts`."""
+    if not runs:
+        return {}
+    counts = np.asarray([count for _, _, count in runs], dtype=np.int64)
+    lengths = np.asarray([end - start + 1 for start, end, _ in runs], dtype=np.int64)
+    agreement_count_ge = np.cumsum(np.bincount(counts, weights=lengths)[::-1])[::-1][1:]
+    return {annotators_amount: int(count) for annotators_amount, count in enumerate(agreement_count_ge, start=1)}
+
+
+@traced()
+def find_interval_regions(
+    aggregated_intervals: List[AnswerIntervals], total_num_annotators: int
+) -> List[IntervalRegion]:
+    """
+    Interval counterpart of `find_regions_of_interest`.
+    The cost is proportional to the number of intervals instead of the number of frames.
+    """
+    regions: List[IntervalRegion] = []
+    for answer_intervals in aggregated_intervals:
+        runs_per_region = sweep_vote_count_runs(answer_intervals.intervals_by_source)
+        region_starts = [runs[0][0] for runs in runs_per_region]
+
+        # Every interval of a source lies within a single region, since regions are the union of all intervals
+        source_intervals_per_region: List[Dict[str, List[Tuple[int, int]]]] = [{} for _ in runs_per_region]
+        for source, intervals in answer_intervals.intervals_by_source.items():
+            for start, end in intervals:
+                region_idx = bisect_right(region_starts, start) - 1
+                source_intervals_per_region[region_idx].setdefault(source, []).append((start, end))
+
+        for idx, (runs, source_intervals) in enumerate(zip(runs_per_region, source_intervals_per_region)):
+            first_frame, last_frame = runs[0][0], runs[-1][1]
+            min_n_agreement = calculate_min_n_agreement_from_runs(runs)
+            total_votes = sum((end - start + 1) * count for start, end, count in runs)
+            regions.append(
+                IntervalRegion(
+                    answer=answer_intervals.answer,
+                    region_number=idx,
+                    first_frame=first_frame,
+                    last_frame=last_frame,
+                    source_intervals=source_intervals,
+                    vote_count_runs=runs,
+                    consensus_data=ConsensusData(
+                        max_agreement=max(count for _, _, count in runs),
+                        integrated_agreement_score=round(
+                            total_votes / (total_num_annotators * (last_frame - first_frame + 1)), 4
+                        ),
+                        min_n_agreement=min_n_agreement,
+                        n_scores=calculate_n_scores_from_min_n_agreement(min_n_agreement),
+                    ),
+                )
+            )
+    return regions
+
+
+def calculate_frame_level_min_n_agreement_from_intervals(aggregated_intervals: List[AnswerIntervals]) -> Dict[int, int]:
+    """Interval counterpart of `calculate_frame_level_min_n_agreement`."""
+    runs = [
+        run
+        for answer_intervals in aggregated_intervals
+        for region_runs in sweep_vote_count_runs(answer_intervals.intervals_by_source)
+        for run in region_runs
+    ]
+    return calculate_min_n_agreement_from_runs(runs)
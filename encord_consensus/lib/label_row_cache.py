@@ -0,0 +1,178 @@
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from encord.orm.label_row import LabelRow
+from platformdirs import user_data_dir
+
+from .constants import APP_AUTHOR, APP_NAME
+
+DEFAULT_MAX_SIZE_BYTES = 2 * 1024**3
+# Label rows embed signed urls of the data, which expire after 7 days
+DEFAULT_MAX_AGE = timedelta(days=6)
+
+
+class LabelRowCache:
+    """
+    On-disk cache of label rows keyed by project hash and label hash.
+
+    Entries are validated against the label row's last edited timestamp, so an edited label row is never served
+    from the cache. The least recently used entries are evicted once the cache exceeds its size cap (the file
+    modification time is used as the access time, so the cache can be shared between processes).
+    """
+
+    def __init__(
+        self,
+        cache_dir: Path,
+        max_size_bytes: int = DEFAULT_MAX_SIZE_BYTES,
+        max_age: timedelta = DEFAULT_MAX_AGE,
+    ):
+        """
+        :param cache_dir: The directory where the label rows are stored.
+        :param max_size_bytes: The maximum size of the cache on disk.
+        :param max_age: Entries older than this are considered stale, regardless of their last edited timestamp.
+        """
+        self.cache_dir = cache_dir
+        self.max_size_bytes = max_size_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._size_bytes = sum(path.stat().st_size for path in self._entry_paths())
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": sum(1 for _ in self._entry_paths()),
+            "size_bytes": self._size_bytes,
+        }
+
+    def get(self, project_hash: str, label_hash: str, last_edited_at: Optional[datetime]) -> Optional[LabelRow]:
+        """
+        Get a label row from the cache.
+
+        :param project_hash: The hash of the project the label row belongs to.
+        :param label_hash: The hash of the label row.
+        :param last_edited_at: The current last edited timestamp of the label row, as listed by the platform.
+        :return: The cached label row, or `None` if it's missing or outdated.
+        """
+        path = self._entry_path(project_hash, label_hash)
+        # Entries are replaced atomically, so they are read without the lock: the concurrent downloads of a file from
+        # several projects don't wait for each other's reads
+        try:
+            version = _file_version(path)
+            entry = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        cached_at = datetime.fromisoformat(entry["cached_at"])
+        if entry["last_edited_at"] != _serialise_timestamp(last_edited_at) or (
+            datetime.now() - cached_at > self.max_age
+        ):
+            with self._lock:
+                self._remove(path, version)
+                self.misses += 1
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+        return LabelRow(entry["label_row"])
+
+    def put(self, project_hash: str, label_hash: str, last_edited_at: Optional[datetime], label_row: LabelRow) -> None:
+        """
+        Store a label row in the cache and evict the least recently used entries if the size cap is exceeded.
+
+        :param project_hash: The hash of the project the label row belongs to.
+        :param label_hash: The hash of the label row.
+        :param last_edited_at: The last edited timestamp of the label row, as listed by the platform.
+        :param label_row: The label row to store.
+        """
+        path = self._entry_path(project_hash, label_hash)
+        content = json.dumps(
+            {
+                "last_edited_at": _serialise_timestamp(last_edited_at),
+                "cached_at": datetime.now().isoformat(),
+                "label_row": label_row,
+            }
+        )
+        with self._lock:
+            self._remove(path)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Write to a temporary file first so other processes never read a partially written entry
+            tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp_path.write_text(content, encoding="utf-8")
+            os.replace(tmp_path, path)
+            self._size_bytes += path.stat().st_size
+            self._evict()
+
+    def clear(self) -> None:
+        with self._lock:
+            for path in list(self._entry_paths()):
+                self._remove(path)
+            self.hits = 0
+            self.misses = 0
+
+    def _entry_path(self, project_hash: str, label_hash: str) -> Path:
+        return self.cache_dir / project_hash / f"{label_hash}.json"
+
+    def _entry_paths(self):
+        return self.cache_dir.glob("*/*.json")
+
+    def _remove(self, path: Path, version: Optional[Tuple[int, int]] = None) -> None:
+        """Remove an entry, if it's still at `version` when given, i.e. it wasn't replaced since it was read."""
+        try:
+            stat = path.stat()
+            if version is not None and (stat.st_ino, stat.st_mtime_ns) != version:
+                return
+            path.unlink()
+        except OSError:
+            return
+        self._size_bytes -= stat.st_size
+
+    def _evict(self) -> None:
+        if self._size_bytes <= self.max_size_bytes:
+            return
+        entries = []
+        for path in self._entry_paths():
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        # Resynchronise with the disk, other processes may have added or removed entries
+        self._size_bytes = sum(size for _, size, _ in entries)
+        for _, _, path in sorted(entries, key=lambda e: e[0]):
+            if self._size_bytes <= self.max_size_bytes:
+                break
+            self._remove(path)
+
+
+def _file_version(path: Path) -> Tuple[int, int]:
+    stat = path.stat()
+    return stat.st_ino, stat.st_mtime_ns
+
+
+def _serialise_timestamp(timestamp: Optional[datetime]) -> Optional[str]:
+    return timestamp.isoformat() if timestamp is not None else None
+
+
+_default_label_row_cache: Optional[LabelRowCache] = None
+
+
+def get_default_label_row_cache() -> LabelRowCache:
+    """Return the label row cache stored in the user data directory of the application."""
+    global _default_label_row_cache
+    if _default_label_row_cache is None:
+        app_dir = Path(user_data_dir(appname=APP_NAME, appauthor=APP_AUTHOR))
+        _default_label_row_cache = LabelRowCache(app_dir / "label_row_cache")
+    return _default_label_row_cache
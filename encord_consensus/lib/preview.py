@@ -0,0 +1,160 @@
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+from encord import Project
+from encord.constants.enums import DataType
+
+from .project_access import call_with_retries
+
+DEFAULT_PREFETCH_WORKERS = 4
+# Used when the expiry can't be read from the signed url
+DEFAULT_SIGNED_URL_TTL = timedelta(hours=1)
+# Signed urls are renewed this long before they expire, so a page never renders a url that expires while loading
+SIGNED_URL_EXPIRY_MARGIN = timedelta(minutes=5)
+
+
+@dataclass(slots=True, frozen=True)
+class MediaPreview:
+    data_hash: str
+    data_type: DataType
+    title: str
+    signed_url: str
+    expires_at: datetime
+
+
+def get_signed_url_expiry(signed_url: str) -> Optional[datetime]:
+    """
+    Read the expiry of a signed url, for the GCS (v2 and v4), S3 and Azure formats.
+    """
+    query = {key.lower(): values[0] for key, values in parse_qs(urlparse(signed_url).query).items()}
+    try:
+        if "x-goog-date" in query and "x-goog-expires" in query:
+            signed_at = datetime.strptime(query["x-goog-date"], "%Y%m%dT%H%M%SZ").replace(tzinfo=timezone.utc)
+            return signed_at + timedelta(seconds=int(query["x-goog-expires"]))
+        if "x-amz-date" in query and "x-amz-expires" in query:
+            signed_at = datetime.strptime(query["x-amz-date"], "%Y%m%dT%H%M%SZ").replace(tzinfo=timezone.utc)
+            return signed_at + timedelta(seconds=int(query["x-amz-expires"]))
+        if "expires" in query:
+            return datetime.fromtimestamp(int(query["expires"]), tz=timezone.utc)
+        if "se" in query:
+            return datetime.fromisoformat(query["se"].replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return None
+
+
+class PreviewService:
+    """
+    Fetch the signed urls used to preview files, and cache them until shortly before they expire.
+
+    Only the media metadata of the data is requested (`Project.get_data`), so previews never download, create or
+    modify label rows. Urls can be prefetched in the background, a preview then waits for the prefetch in flight
+    instead of requesting the same url again.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = DEFAULT_PREFETCH_WORKERS,
+        default_ttl: timedelta = DEFAULT_SIGNED_URL_TTL,
+        expiry_margin: timedelta = SIGNED_URL_EXPIRY_MARGIN,
+    ):
+        self.default_ttl = default_ttl
+        self.expiry_margin = expiry_margin
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._previews: Dict[str, MediaPreview] = {}
+        self._in_flight: Dict[str, Future] = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="preview")
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._previews)}
+
+    def get(self, project: Project, data_hash: str) -> Optional[MediaPreview]:
+        """
+        :param project: Any project the data is attached to.
+        :param data_hash: The data hash of the file.
+        :return: The preview of the file, or `None` if the file has no media.
+        """
+        with self._lock:
+            preview = self._get_fresh(data_hash)
+            if preview is not None:
+                self.hits += 1
+                return preview
+            self.misses += 1
+            future = self._submit(project, data_hash)
+        return future.result()
+
+    def prefetch(self, project: Project, data_hashes: List[str]) -> None:
+        """Fetch the previews of the files in the background, the ones cached or in flight are skipped."""
+        with self._lock:
+            for data_hash in data_hashes:
+                if self._get_fresh(data_hash) is None:
+                    self._submit(project, data_hash)
+
+    def invalidate(self, data_hash: Optional[str] = None) -> None:
+        with self._lock:
+            if data_hash is None:
+                self._previews.clear()
+            else:
+                self._previews.pop(data_hash, None)
+
+    def _get_fresh(self, data_hash: str) -> Optional[MediaPreview]:
+        preview = self._previews.get(data_hash)
+        if preview is not None and datetime.now(timezone.utc) < preview.expires_at - self.expiry_margin:
+            return preview
+        return None
+
+    def _submit(self, project: Project, data_hash: str) -> Future:
+        future = self._in_flight.get(data_hash)
+        if future is None:
+            future = self._executor.submit(self._fetch, project, data_hash)
+            self._in_flight[data_hash] = future
+        return future
+
+    def _fetch(self, project: Project, data_hash: str) -> Optional[MediaPreview]:
+        try:
+            requested_at = time.time()
+            video, images = call_with_retries(project.get_data, data_hash, get_signed_url=True)
+            if video is not None:
+                media, data_type = video, DataType.VIDEO
+            elif images:
+                media, data_type = images[0], DataType.IMAGE
+            else:
+                return None
+            signed_url = media["file_link"]
+            expires_at = get_signed_url_expiry(signed_url) or (
+                datetime.fromtimestamp(requested_at, tz=timezone.utc) + self.default_ttl
+            )
+            preview = MediaPreview(
+                data_hash=data_hash,
+                data_type=data_type,
+                title=media["title"],
+                signed_url=signed_url,
+                expires_at=expires_at,
+            )
+            with self._lock:
+                self._previews[data_hash] = preview
+            return preview
+        finally:
+            with self._lock:
+                self._in_flight.pop(data_hash, None)
+
+
+_default_preview_service: Optional[PreviewService] = None
+_default_preview_service_lock = threading.Lock()
+
+
+def get_default_preview_service() -> PreviewService:
+    global _default_preview_service
+    with _default_preview_service_lock:
+        if _default_preview_service is None:
+            _default_preview_service = PreviewService()
+        return _default_preview_service
@@ -1,83 +1,637 @@
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import replace
+from enum import Enum
 from pathlib import Path
-from typing import Dict, List, Optional, Set, Union
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    TypeVar,
+    Union,
+)
 
 from encord import EncordUserClient, Project
 from encord.constants.enums import DataType
-from encord.exceptions import GenericServerError
-from encord.orm.label_row import LabelRow
+from encord.exceptions import (
+    GenericServerError,
+    RequestException,
+    ResourceExistsError,
+    TimeOutError,
+)
+from encord.http.constants import DEFAULT_REQUESTS_SETTINGS, RequestsSettings
+from encord.orm.label_row import LabelRow, LabelRowMetadata
+from requests.exceptions import JSONDecodeError, RetryError, Timeout
 
+from .fake_encord import get_fake_encord_client, is_fake_backend_enabled
+from .label_row_cache import LabelRowCache
+from .single_flight import SingleFlight
+from .tracing import span, traced
 
-def get_encord_client(path_to_keyfile: str) -> EncordUserClient:
+T = TypeVar("T")
+
+DEFAULT_DOWNLOAD_WORKERS = 8
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BACKOFF_FACTOR = 0.5
+REQUEST_TIMEOUT_ENV_VAR = "ENCORD_CONSENSUS_REQUEST_TIMEOUT"
+# Seconds to connect, send and receive each request to Encord
+DEFAULT_REQUEST_TIMEOUT = 60
+# Seconds to download the label rows of a file from all the projects, retries included
+DEFAULT_DOWNLOAD_TIMEOUT = 5 * 60
+# Seconds to wait for the identical call of another thread before making the call again
+DEFAULT_IN_FLIGHT_WAIT_TIMEOUT = 2 * DEFAULT_REQUEST_TIMEOUT
+# urllib3 only reports the status of the responses it gave up on in the message of its error
+_RETRY_ERROR_STATUS = re.compile(r"too many (\d{3}) error responses")
+
+
+class CacheKind(str, Enum):
+    PROJECT = "project"
+    PROJECT_SEARCH = "project_search"
+    DATA_ROWS = "data_rows"
+    ONTOLOGY = "ontology"
+    LABEL_ROW_METADATA = "label_row_metadata"
+
+
+# Seconds before an entry is considered stale. Project searches and label rows change the most often.
+DEFAULT_CACHE_TTLS: Dict[CacheKind, float] = {
+    CacheKind.PROJECT: 30 * 60,
+    CacheKind.PROJECT_SEARCH: 60,
+    CacheKind.DATA_ROWS: 10 * 60,
+    CacheKind.ONTOLOGY: 30 * 60,
+    CacheKind.LABEL_ROW_METADATA: 60,
+}
+
+
+class MetadataCache:
+    """
+    In-memory cache of the Encord metadata calls, with a time to live per kind of entry.
+
+    It's shared by all the threads of the process, so the Streamlit reruns of every session are served from it.
+    Concurrent misses of the same key are coalesced into a single call, counted as `coalesced` in the stats.
+    """
+
+    def __init__(
+        self,
+        ttls: Optional[Dict[CacheKind, float]] = None,
+        clock: Callable[[], float] = time.monotonic,
+        in_flight_wait_timeout: Optional[float] = DEFAULT_IN_FLIGHT_WAIT_TIMEOUT,
+    ):
+        """
+        :param ttls: The time to live of the entries of each kind, overriding `DEFAULT_CACHE_TTLS`.
+        :param clock: The clock of the entries' age.
+        :param in_flight_wait_timeout: Maximum number of seconds a miss waits for the identical call of another
+            thread, before making the call itself.
+        """
+        self.ttls = {**DEFAULT_CACHE_TTLS, **(ttls or {})}
+        self.in_flight_wait_timeout = in_flight_wait_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: Dict[Tuple[CacheKind, Hashable], Tuple[float, Any]] = {}
+        self._hits: Dict[CacheKind, int] = {kind: 0 for kind in CacheKind}
+        self._misses: Dict[CacheKind, int] = {kind: 0 for kind in CacheKind}
+        self._coalesced: Dict[CacheKind, int] = {kind: 0 for kind in CacheKind}
+        self._in_flight = SingleFlight()
+        # Incremented by `invalidate`, so the calls in flight during an invalidation don't store their result
+        self._generation = 0
+
+    @property
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            entries = {kind: 0 for kind in CacheKind}
+            for kind, _ in self._entries:
+                entries[kind] += 1
+            return {
+                kind.value: {
+                    "hits": self._hits[kind],
+                    "misses": self._misses[kind],
+                    "coalesced": self._coalesced[kind],
+                    "entries": entries[kind],
+                }
+                for kind in CacheKind
+            }
+
+    def get_or_compute(self, kind: CacheKind, key: Hashable, compute: Callable[[], T]) -> T:
+        """
+        Return the cached value of the key, or compute and cache it if it's missing or expired.
+        If the value of the key is already being computed by another thread, wait for it instead.
+        """
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get((kind, key))
+            if entry is not None and now - entry[0] < self.ttls[kind]:
+                self._hits[kind] += 1
+                return entry[1]
+            generation = self._generation
+
+        def compute_and_store() -> T:
+            value = compute()
+            with self._lock:
+                if self._generation == generation:
+                    self._entries[(kind, key)] = (now, value)
+            return value
+
+        value, coalesced = self._in_flight.do((kind, key), compute_and_store, wait_timeout=self.in_flight_wait_timeout)
+        with self._lock:
+            if coalesced:
+                self._coalesced[kind] += 1
+            else:
+                self._misses[kind] += 1
+        return value
+
+    def invalidate(self, kind: Optional[CacheKind] = None, key: Optional[Hashable] = None) -> None:
+        """
+        Drop entries from the cache. The calls in flight for these entries are not joined by the next misses, which
+        make a new call instead.
+
+        :param kind: Only drop the entries of this kind. All the entries are dropped if `None`.
+        :param key: Only drop the entry with this key, `kind` must be given.
+        """
+        self._in_flight.forget(
+            lambda entry_key: kind is None or (entry_key[0] == kind and (key is None or entry_key[1] == key))
+        )
+        with self._lock:
+            self._generation += 1
+            if kind is None:
+                self._entries.clear()
+            elif key is not None:
+                self._entries.pop((kind, key), None)
+            else:
+                for entry_key in [entry_key for entry_key in self._entries if entry_key[0] == kind]:
+                    del self._entries[entry_key]
+
+
+_default_metadata_cache = MetadataCache()
+
+
+def get_default_metadata_cache() -> MetadataCache:
+    return _default_metadata_cache
+
+
+class UnannotatedProjectsError(Exception):
+    def __init__(self, project_titles: List[str]):
+        self.project_titles = project_titles
+        super().__init__(
+            f"Task in projects {', '.join(f'<{title}>' for title in project_titles)} is not annotated!"
+        )
+
+
+def read_requests_settings(request_timeout: Optional[float] = None) -> RequestsSettings:
+    """
+    Return the settings of the requests to Encord, with a timeout per request.
+    The SDK doesn't retry the requests itself: `call_with_retries` does, and retrying in both would multiply the
+    attempts of a call.
+
+    :param request_timeout: Seconds to connect, send and receive each request. Defaults to
+        `ENCORD_CONSENSUS_REQUEST_TIMEOUT`, or `DEFAULT_REQUEST_TIMEOUT` if it isn't set.
+    """
+    if request_timeout is None:
+        value = os.getenv(REQUEST_TIMEOUT_ENV_VAR)
+        try:
+            request_timeout = float(value) if value else DEFAULT_REQUEST_TIMEOUT
+        except ValueError:
+            logging.warning(f"Invalid {REQUEST_TIMEOUT_ENV_VAR}={value!r}, using the default request timeout.")
+            request_timeout = DEFAULT_REQUEST_TIMEOUT
+    return replace(
+        DEFAULT_REQUESTS_SETTINGS,
+        max_retries=0,
+        connection_retries=0,
+        connect_timeout=request_timeout,
+        read_timeout=request_timeout,
+        write_timeout=request_timeout,
+    )
+
+
+def get_encord_client(
+    path_to_keyfile: Optional[str], requests_settings: Optional[RequestsSettings] = None
+) -> EncordUserClient:
+    """
+    Create a client authenticated with the private key, or a client of the in-process fake backend when
+    `ENCORD_CONSENSUS_FAKE_BACKEND` is set (see `fake_encord`), in which case no keyfile is needed.
+
+    :param requests_settings: The settings of the requests, defaults to `read_requests_settings()`.
+    """
+    if is_fake_backend_enabled():
+        return get_fake_encord_client()
+    if requests_settings is None:
+        requests_settings = read_requests_settings()
     with Path(path_to_keyfile).open(encoding="utf-8") as f:
         private_key = f.read()
-    return EncordUserClient.create_with_ssh_private_key(private_key)
+    return EncordUserClient.create_with_ssh_private_key(private_key, requests_settings=requests_settings)
+
+
+class EncordClientPool:
+    """
+    The clients of the process, one per keyfile, shared by all the app sessions instead of authenticating a new
+    client for each of them. The SDK opens a new HTTP session for each request, so a client can be used by several
+    threads at once.
+
+    A client is created again if its keyfile is modified, e.g. when the key is rotated.
+    """
 
+    def __init__(self, requests_settings: Optional[RequestsSettings] = None):
+        """
+        :param requests_settings: The settings of the requests of the clients, defaults to `read_requests_settings()`
+            when the first client is created.
+        """
+        self.requests_settings = requests_settings
+        self._lock = threading.Lock()
+        self._clients: Dict[Tuple[str, int], EncordUserClient] = {}
+        self._hits = 0
+        self._creations = SingleFlight()
 
-def get_project_title_if_exists(user_client: EncordUserClient, project_hash: str) -> str | None:
+    @property
+    def stats(self) -> Dict[str, int]:
+        creations = self._creations.stats
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "misses": creations["calls"],
+                "coalesced": creations["coalesced"],
+                "entries": len(self._clients),
+            }
+
+    def get(self, path_to_keyfile: Optional[str]) -> EncordUserClient:
+        """
+        Return the client authenticated with the private key, creating it on first use.
+        See `get_encord_client` for the fake backend.
+        """
+        if is_fake_backend_enabled():
+            return get_fake_encord_client()
+        path = Path(path_to_keyfile).resolve()
+        key = (str(path), path.stat().st_mtime_ns)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self._hits += 1
+                return client
+
+        def create() -> EncordUserClient:
+            client = get_encord_client(str(path), self.requests_settings)
+            with self._lock:
+                # Drop the clients of previous versions of the keyfile
+                for outdated_key in [k for k in self._clients if k[0] == key[0]]:
+                    del self._clients[outdated_key]
+                self._clients[key] = client
+            return client
+
+        client, _ = self._creations.do(key, create)
+        return client
+
+
+_default_encord_client_pool = EncordClientPool()
+
+
+def get_default_encord_client_pool() -> EncordClientPool:
+    return _default_encord_client_pool
+
+
+def _status_code(error: BaseException) -> Optional[int]:
+    """Return the HTTP status of the response that made an Encord call fail, if it's known."""
+    if isinstance(error, RetryError):
+        match = _RETRY_ERROR_STATUS.search(str(error))
+        return int(match.group(1)) if match else None
+    if isinstance(error, RequestException) and isinstance(error.__cause__, JSONDecodeError):
+        # The API always answers with JSON, other responses are the error pages of its gateways (502, 504)
+        return 502
+    return getattr(error, "status_code", None)
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """
+    Whether a failed Encord call is worth retrying: it timed out or got a 5xx response.
+    The errors reported by the API itself (authentication, permissions, missing or existing resources, etc.) and the
+    rate limits are not retried.
+    """
+    if isinstance(error, (TimeOutError, Timeout)):
+        return True
+    status_code = _status_code(error)
+    return status_code is not None and status_code >= 500
+
+
+def call_with_retries(
+    fn: Callable[..., T],
+    *args,
+    max_retries: int = DEFAULT_MAX_RETRIES,
+    backoff_factor: float = DEFAULT_BACKOFF_FACTOR,
+    **kwargs,
+) -> T:
+    """
+    Call `fn` and retry it on transient errors, see `is_transient_error`. The clients of `get_encord_client` don't
+    retry their requests, so these are the only retries of the call.
+
+    :param fn: The function to call.
+    :param max_retries: Number of retries after the first failed attempt.
+    :param backoff_factor: Before each retry, there will be a sleep of backoff_factor * (2 ** retry_number).
+    :return: The result of `fn`.
+    """
+    for retry_number in range(max_retries + 1):
+        try:
+            with span(f"encord.{getattr(fn, '__name__', 'call')}"):
+                return fn(*args, **kwargs)
+        except Exception as e:
+            if retry_number == max_retries or not is_transient_error(e):
+                raise
+            time.sleep(backoff_factor * (2**retry_number))
+
+
+def _cached(cache: Optional[MetadataCache], kind: CacheKind, key: Hashable, compute: Callable[[], T]) -> T:
+    return compute() if cache is None else cache.get_or_compute(kind, key, compute)
+
+
+@traced()
+def get_project(
+    user_client: EncordUserClient, project_hash: str, cache: Optional[MetadataCache] = None
+) -> Project:
+    return _cached(
+        cache, CacheKind.PROJECT, project_hash, lambda: call_with_retries(user_client.get_project, project_hash)
+    )
+
+
+@traced()
+def get_project_title_if_exists(
+    user_client: EncordUserClient, project_hash: str, cache: Optional[MetadataCache] = None
+) -> str | None:
     try:
-        project = user_client.get_project(project_hash)
+        project = get_project(user_client, project_hash, cache)
     except GenericServerError:
         return None
     return project.title
 
 
-def list_projects(user_client: EncordUserClient, search_query: str) -> List[Dict]:
-    return user_client.get_projects(title_like=f"%{search_query}%")
+@traced()
+def list_projects(
+    user_client: EncordUserClient, search_query: str, cache: Optional[MetadataCache] = None
+) -> List[Dict]:
+    return _cached(
+        cache,
+        CacheKind.PROJECT_SEARCH,
+        search_query,
+        lambda: call_with_retries(user_client.get_projects, title_like=f"%{search_query}%"),
+    )
 
 
-def get_all_projects(user_client: EncordUserClient, project_hashes: List) -> List[Project]:
-    return [user_client.get_project(p_hash) for p_hash in project_hashes]
+@traced()
+def get_all_projects(
+    user_client: EncordUserClient, project_hashes: List, cache: Optional[MetadataCache] = None
+) -> List[Project]:
+    return [get_project(user_client, p_hash, cache) for p_hash in project_hashes]
 
 
 def get_all_dataset_hashes(project: Project) -> set[str]:
     return {d["dataset_hash"] for d in project.datasets}
 
 
-def get_classifications_ontology(user_client: EncordUserClient, project_hash: str) -> List:
-    project = user_client.get_project(project_hash)
-    return project.get_project()["editor_ontology"]["classifications"]
+@traced()
+def get_classifications_ontology(
+    user_client: EncordUserClient, project_hash: str, cache: Optional[MetadataCache] = None
+) -> List:
+    def compute() -> List:
+        project = get_project(user_client, project_hash, cache)
+        return call_with_retries(project.get_project)["editor_ontology"]["classifications"]
 
+    return _cached(cache, CacheKind.ONTOLOGY, project_hash, compute)
 
+
+@traced()
 def count_label_rows(user_client: EncordUserClient, project_hash: str) -> int:
-    project = user_client.get_project(project_hash)
-    label_hashes = [lrm.label_hash for lrm in project.list_label_rows()]
+    project = get_project(user_client, project_hash)
+    label_hashes = [lrm.label_hash for lrm in call_with_retries(project.list_label_rows)]
     return len(label_hashes)
 
 
+@traced()
 def list_all_data_rows(
     user_client: EncordUserClient,
     dataset_hashes: Union[Set[str], List[str]],
     data_types: Optional[List[DataType]] = None,
+    cache: Optional[MetadataCache] = None,
 ) -> List:
+
+    def compute(dataset_hash: str) -> List:
+        dataset = call_with_retries(user_client.get_dataset, dataset_hash)
+        return call_with_retries(dataset.list_data_rows, data_types=data_types)
+
     res = []
-    for dataset_hash in dataset_hashes:
-        res.extend(user_client.get_dataset(dataset_hash).list_data_rows(data_types=data_types))
+    for dataset_hash in sorted(dataset_hashes):
+        res.extend(
+            _cached(
+                cache,
+                CacheKind.DATA_ROWS,
+                (dataset_hash, tuple(data_types) if data_types is not None else None),
+                lambda: compute(dataset_hash),
+            )
+        )
     return res
 
 
-def download_label_row_from_projects(projects: list[Project], data_hash: str) -> dict:
-    lr_data = {}
-    for proj in projects:
-        matches = proj.list_label_rows(data_hashes=[data_hash])
-        if len(matches) == 0:
-            raise Exception(f'Task in project <{proj.title}> is not annotated!')
-        lr_hash = matches[0].label_hash
-        lr = proj.get_label_row(lr_hash)
-        lr_data[proj.project_hash] = lr
+@traced()
+def get_label_row_metadata(
+    project: Project, data_hash: str, cache: Optional[MetadataCache] = None
+) -> LabelRowMetadata | None:
+    """
+    :return: The metadata of the label row of the file in the project, even if it was never opened.
+    """
+
+    def compute() -> LabelRowMetadata | None:
+        matches = call_with_retries(
+            project.list_label_rows, data_hashes=[data_hash], include_uninitialised_labels=True
+        )
+        return matches[0] if matches else None
+
+    return _cached(cache, CacheKind.LABEL_ROW_METADATA, (project.project_hash, data_hash), compute)
+
+
+_label_row_downloads = SingleFlight()
+
+
+def get_label_row_downloads() -> SingleFlight:
+    """Return the label row downloads in flight in the process, shared by all the sessions and threads."""
+    return _label_row_downloads
+
+
+@traced(payload_size=lambda lr: _count_labelled_frames([lr]))
+def _download_label_row(
+    project: Project,
+    data_hash: str,
+    max_retries: int,
+    backoff_factor: float,
+    cache: Optional[LabelRowCache],
+    refresh: bool,
+) -> LabelRow | None:
+    # Concurrent downloads of the same file from the same project, e.g. by several sessions, share a single download
+    lr, _ = _label_row_downloads.do(
+        (project.project_hash, data_hash),
+        lambda: _fetch_label_row(project, data_hash, max_retries, backoff_factor, cache),
+        wait_timeout=DEFAULT_IN_FLIGHT_WAIT_TIMEOUT,
+        fresh=refresh,
+    )
+    return lr
+
+
+def _fetch_label_row(
+    project: Project,
+    data_hash: str,
+    max_retries: int,
+    backoff_factor: float,
+    cache: Optional[LabelRowCache],
+) -> LabelRow | None:
+    matches = call_with_retries(
+        project.list_label_rows, data_hashes=[data_hash], max_retries=max_retries, backoff_factor=backoff_factor
+    )
+    if len(matches) == 0:
+        return None
+    lr_metadata = matches[0]
+    if cache is not None:
+        lr = cache.get(project.project_hash, lr_metadata.label_hash, lr_metadata.last_edited_at)
+        if lr is not None:
+            return lr
+    lr = call_with_retries(
+        project.get_label_row, lr_metadata.label_hash, max_retries=max_retries, backoff_factor=backoff_factor
+    )
+    if cache is not None:
+        cache.put(project.project_hash, lr_metadata.label_hash, lr_metadata.last_edited_at, lr)
+    return lr
+
+
+@traced(payload_size=lambda lr_data: _count_labelled_frames(lr_data.values()))
+def download_label_row_from_projects(
+    projects: list[Project],
+    data_hash: str,
+    max_workers: int = DEFAULT_DOWNLOAD_WORKERS,
+    timeout: Optional[float] = DEFAULT_DOWNLOAD_TIMEOUT,
+    max_retries: int = DEFAULT_MAX_RETRIES,
+    backoff_factor: float = DEFAULT_BACKOFF_FACTOR,
+    cache: Optional[LabelRowCache] = None,
+    refresh: bool = False,
+) -> dict:
+    """
+    Download the label rows of a file from all the projects concurrently.
+    A download that is already in flight in another thread, e.g. for another session, is waited for instead of being
+    made again, for up to `DEFAULT_IN_FLIGHT_WAIT_TIMEOUT` seconds.
+
+    :param projects: The projects to download the label rows from.
+    :param data_hash: The data hash of the file.
+    :param max_workers: Maximum number of projects downloaded at the same time.
+    :param timeout: Maximum number of seconds to wait for all the downloads. Waits indefinitely if `None`. Each
+        request is also bounded by the timeout of the client's requests settings.
+    :param max_retries: Number of retries of each request on transient errors.
+    :param backoff_factor: Backoff factor of the exponential delay between retries.
+    :param cache: If given, label rows that haven't been edited since they were cached are read from it
+        and only their metadata is requested to the platform.
+    :param refresh: Don't wait for the downloads in flight, which may have started before the last edits.
+    :return: The label rows keyed by project hash, in the same order as `projects`.
+    """
+    if len(projects) == 0:
+        return {}
+    executor = ThreadPoolExecutor(max_workers=min(max_workers, len(projects)))
+    try:
+        futures = {
+            proj.project_hash: executor.submit(
+                _download_label_row, proj, data_hash, max_retries, backoff_factor, cache, refresh
+            )
+            for proj in projects
+        }
+        _, not_done = wait(futures.values(), timeout=timeout)
+        if not_done:
+            pending_titles = [proj.title for proj in projects if futures[proj.project_hash] in not_done]
+            raise TimeoutError(f"Timed out downloading the task from projects {', '.join(pending_titles)}.")
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    lr_data = {proj.project_hash: futures[proj.project_hash].result() for proj in projects}
+    unannotated_titles = [proj.title for proj in projects if lr_data[proj.project_hash] is None]
+    if unannotated_titles:
+        raise UnannotatedProjectsError(unannotated_titles)
     return lr_data
 
 
-def get_or_create_label_row(project: Project, label_row_metadata: dict) -> LabelRow:
+@traced(payload_size=lambda lr: _count_labelled_frames([lr]))
+def get_or_create_label_row(
+    project: Project,
+    label_row_metadata: dict,
+    max_retries: int = DEFAULT_MAX_RETRIES,
+    backoff_factor: float = DEFAULT_BACKOFF_FACTOR,
+) -> LabelRow:
     """
     Return a LabelRow associated with a particular label_row_metadata.
     :param project: The target project.
     :param label_row_metadata: The metadata of the desired label_row.
+    :param max_retries: Number of retries of each request on transient errors.
+    :param backoff_factor: Backoff factor of the exponential delay between retries.
     :return: A LabelRow object, which contains a collection of data units and associated labels.
     """
     label_hash = label_row_metadata['label_hash']
     data_hash = label_row_metadata['data_hash']
-    if label_hash is None:
-        label_row = project.create_label_row(data_hash)
-    else:
-        label_row = project.get_label_row(label_hash)
-    return label_row
+    retries = dict(max_retries=max_retries, backoff_factor=backoff_factor)
+    if label_hash is not None:
+        return call_with_retries(project.get_label_row, label_hash, **retries)
+    try:
+        return call_with_retries(project.create_label_row, data_hash, **retries)
+    except Exception as error:
+        # A creation that failed on a transient error may still have succeeded, making the retries fail because the
+        # label row already exists. Any other error is final.
+        if not isinstance(error, ResourceExistsError) and not is_transient_error(error):
+            raise
+        matches = call_with_retries(project.list_label_rows, data_hashes=[data_hash], **retries)
+        if not matches or matches[0].label_hash is None:
+            raise
+        return call_with_retries(project.get_label_row, matches[0].label_hash, **retries)
+
+
+@traced()
+def index_label_rows_by_data_hash(project: Project) -> Dict[str, LabelRowMetadata]:
+    """
+    List all the label rows of a project at once, including the ones that were never opened.
+
+    :return: The label row metadata keyed by data hash.
+    """
+    label_rows_metadata = call_with_retries(project.list_label_rows, include_uninitialised_labels=True)
+    return {lrm.data_hash: lrm for lrm in label_rows_metadata}
+
+
+def _count_labelled_frames(label_rows) -> int:
+    return sum(len(du.get("labels", {})) for lr in label_rows if lr is not None for du in lr["data_units"].values())
+
+
+def save_export_to_label_row(
+    project: Project,
+    label_row_metadata: LabelRowMetadata,
+    export: Dict,
+    max_retries: int = DEFAULT_MAX_RETRIES,
+    backoff_factor: float = DEFAULT_BACKOFF_FACTOR,
+) -> None:
+    """
+    Overwrite the labels of a label row with an export of regions of interest.
+    :param project: The target project.
+    :param label_row_metadata: The metadata of the label row to write to, it's created if it was never opened.
+    :param export: The export built by `export_regions_of_interest` or `materialise_export`.
+    :param max_retries: Number of retries of each request on transient errors. The label row is fetched or
+        created and saved by separate requests, so a label row created before a failed save is reused by the retries.
+    :param backoff_factor: Backoff factor of the exponential delay between retries.
+    """
+    data_hash = export['data_hash']
+    with span("project_access.save_export_to_label_row", payload_size=len(export['data_units'][data_hash]['labels'])):
+        label_row = get_or_create_label_row(
+            project,
+            {'label_hash': label_row_metadata.label_hash, 'data_hash': label_row_metadata.data_hash},
+            max_retries=max_retries,
+            backoff_factor=backoff_factor,
+        )
+        label_row['data_units'][data_hash]['labels'] = export['data_units'][data_hash]['labels']
+        label_row['classification_answers'] = export['classification_answers']
+        call_with_retries(
+            project.save_label_row,
+            label_row['label_hash'],
+            label_row,
+            max_retries=max_retries,
+            backoff_factor=backoff_factor,
+        )
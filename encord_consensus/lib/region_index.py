@@ -0,0 +1,70 @@
+from bisect import bisect_left
+from typing import Dict, List, Tuple
+
+from .data_model import CompactRegion, IntervalRegion, RegionOfInterest
+
+Region = RegionOfInterest | CompactRegion | IntervalRegion
+
+
+class RegionIndex:
+    """
+    Regions of interest grouped by max agreement and sorted by integrated agreement score within each group.
+
+    Filtering by a minimum max agreement and a minimum score is a bisection per group, and the matching regions
+    are listed from the highest (max agreement, integrated agreement score) without being sorted again.
+    Regions with the same scores keep their original order.
+    """
+
+    def __init__(self, regions: List[Region]):
+        self._groups: Dict[int, Tuple[List[float], List[Region]]] = {}
+        by_max_agreement: Dict[int, List[Tuple[float, int, Region]]] = {}
+        for position, region in enumerate(regions):
+            consensus_data = region.consensus_data
+            by_max_agreement.setdefault(consensus_data.max_agreement, []).append(
+                (consensus_data.integrated_agreement_score, -position, region)
+            )
+        for max_agreement in sorted(by_max_agreement, reverse=True):
+            entries = sorted(by_max_agreement[max_agreement], key=lambda e: (e[0], e[1]))
+            self._groups[max_agreement] = ([e[0] for e in entries], [e[2] for e in entries])
+
+    def __len__(self) -> int:
+        return sum(len(regions) for _, regions in self._groups.values())
+
+    def count(self, min_agreement: int, min_integrated_score: float) -> int:
+        """Return the number of regions passing both thresholds."""
+        return sum(
+            len(scores) - start for scores, start, _ in self._matching_groups(min_agreement, min_integrated_score)
+        )
+
+    def top(
+        self, min_agreement: int, min_integrated_score: float, page: int = 0, page_size: int | None = None
+    ) -> List[Region]:
+        """
+        List the regions passing both thresholds, from the highest (max agreement, integrated agreement score).
+
+        :param min_agreement: The minimum max agreement of the regions.
+        :param min_integrated_score: The minimum integrated agreement score of the regions.
+        :param page: The page to return, starting at 0.
+        :param page_size: The number of regions per page, all the matching regions are returned if `None`.
+        """
+        to_skip = page * page_size if page_size is not None else 0
+        res: List[Region] = []
+        for scores, start, regions in self._matching_groups(min_agreement, min_integrated_score):
+            group_size = len(scores) - start
+            if to_skip >= group_size:
+                to_skip -= group_size
+                continue
+            # Walk the group from its end, where the scores are the highest
+            end = len(scores) - to_skip
+            to_skip = 0
+            take_from = start if page_size is None else max(start, end - (page_size - len(res)))
+            res.extend(reversed(regions[take_from:end]))
+            if page_size is not None and len(res) == page_size:
+                break
+        return res
+
+    def _matching_groups(self, min_agreement: int, min_integrated_score: float):
+        for max_agreement, (scores, regions) in self._groups.items():
+            if max_agreement < min_agreement:
+                break
+            yield scores, bisect_left(scores, min_integrated_score), regions
@@ -0,0 +1,114 @@
+"""
+Memory footprint of the app sessions and their memory budget.
+
+Each session reports the estimated size of the data it holds (label rows, consensus results, file index) to a
+registry shared by the process, so the footprint of every session can be shown in the app.
+"""
+import functools
+import logging
+import os
+import sys
+import threading
+import types
+import weakref
+from collections import deque
+from typing import Any, Dict, Tuple
+
+SESSION_MEMORY_BUDGET_ENV_VAR = "ENCORD_CONSENSUS_SESSION_MEMORY_MB"
+DEFAULT_SESSION_MEMORY_BUDGET = 512 * 1024**2
+
+_NOT_FOLLOWED = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType)
+
+
+@functools.lru_cache(maxsize=None)
+def _slot_names(cls: type) -> Tuple[str, ...]:
+    names = []
+    for klass in cls.__mro__:
+        slots = klass.__dict__.get("__slots__", ())
+        names.extend([slots] if isinstance(slots, str) else slots)
+    return tuple(name for name in names if name not in ("__dict__", "__weakref__"))
+
+
+def estimate_size(obj: Any) -> int:
+    """
+    Estimate the number of bytes used by an object and all the objects it references, each counted once.
+    Numpy arrays count their buffer, classes, functions and modules are not followed.
+    """
+    seen = set()
+    stack = [obj]
+    size = 0
+    while stack:
+        current = stack.pop()
+        if id(current) in seen or isinstance(current, _NOT_FOLLOWED):
+            continue
+        seen.add(id(current))
+        size += sys.getsizeof(current)
+        if isinstance(current, (str, bytes, int, float, bool)) or current is None:
+            continue
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset, deque)):
+            stack.extend(current)
+        else:
+            # Arrays that own their buffer include it in `getsizeof`, views reference their owner as `base`
+            base = getattr(current, "base", None)
+            if base is not None and type(current).__module__ == "numpy":
+                stack.append(base)
+                continue
+            if hasattr(current, "__dict__"):
+                stack.append(vars(current))
+            for name in _slot_names(type(current)):
+                value = getattr(current, name, None)
+                if value is not None:
+                    stack.append(value)
+    return size
+
+
+def read_session_memory_budget() -> int:
+    """Return the memory budget of a session in bytes, set in MiB by `ENCORD_CONSENSUS_SESSION_MEMORY_MB`."""
+    value = os.getenv(SESSION_MEMORY_BUDGET_ENV_VAR)
+    if not value:
+        return DEFAULT_SESSION_MEMORY_BUDGET
+    try:
+        return int(float(value) * 1024**2)
+    except ValueError:
+        logging.warning(f"Invalid {SESSION_MEMORY_BUDGET_ENV_VAR}={value!r}, using the default memory budget.")
+        return DEFAULT_SESSION_MEMORY_BUDGET
+
+
+class SessionMemoryRegistry:
+    """
+    The memory footprints reported by the sessions of the process.
+    Sessions are referenced weakly, the footprint of a session disappears once its state is garbage collected.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._owners: Dict[str, weakref.ref] = {}
+        self._footprints: Dict[str, Dict[str, int]] = {}
+
+    def report(self, session_id: str, owner: Any, footprint: Dict[str, int]) -> None:
+        """
+        :param session_id: The identifier of the session.
+        :param owner: The state of the session, the report is dropped once it's garbage collected.
+        :param footprint: The estimated number of bytes of each part of the session's data.
+        """
+        with self._lock:
+            self._owners[session_id] = weakref.ref(owner)
+            self._footprints[session_id] = dict(footprint)
+
+    def footprints(self) -> Dict[str, Dict[str, int]]:
+        """Return the last footprint reported by each live session."""
+        with self._lock:
+            for session_id in [s_id for s_id, owner in self._owners.items() if owner() is None]:
+                del self._owners[session_id]
+                del self._footprints[session_id]
+            return {session_id: dict(footprint) for session_id, footprint in self._footprints.items()}
+
+
+_registry = SessionMemoryRegistry()
+
+
+def get_default_session_memory_registry() -> SessionMemoryRegistry:
+    return _registry
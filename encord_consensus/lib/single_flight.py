@@ -0,0 +1,98 @@
+"""
+Coalescing of concurrent identical calls, so that the sessions of the app asking for the same resource at the same time
+(e.g. several reviewers opening the same file) only trigger one call to the Encord platform.
+"""
+import threading
+from typing import Callable, Dict, Generic, Hashable, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class _Call(Generic[T]):
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Optional[T] = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Run at most one call per key at a time. Callers arriving while the call of their key is in flight wait for it
+    and get its result, or its exception, instead of making the call again.
+
+    Results are not kept once the call is over, caching them is left to the caller.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._calls_made = 0
+        self._coalesced = 0
+        self._timed_out = 0
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "calls": self._calls_made,
+                "coalesced": self._coalesced,
+                "timed_out": self._timed_out,
+                "in_flight": len(self._calls),
+            }
+
+    def do(
+        self, key: Hashable, fn: Callable[[], T], wait_timeout: Optional[float] = None, fresh: bool = False
+    ) -> Tuple[T, bool]:
+        """
+        Call `fn`, unless a call with the same key is already in flight, in which case wait for its result.
+
+        :param key: The key identifying identical calls.
+        :param fn: The call to make.
+        :param wait_timeout: Maximum number of seconds to wait for a call in flight. Once elapsed, `fn` is called
+            without waiting any longer, so a hung call doesn't block the other callers. Waits indefinitely if `None`.
+        :param fresh: Don't join the call in flight, e.g. when it may have started before the data changed. Callers
+            arriving later join this call instead.
+        :return: The result of the call and whether it was shared with a call made by another thread.
+        """
+        with self._lock:
+            call = None if fresh else self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._calls_made += 1
+        if not leader:
+            if call.done.wait(wait_timeout):
+                with self._lock:
+                    self._coalesced += 1
+                if call.error is not None:
+                    raise call.error
+                return call.value, True
+            with self._lock:
+                self._timed_out += 1
+                self._calls_made += 1
+            return fn(), False
+        try:
+            call.value = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                # The key may have been taken over by a fresh call, or forgotten
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+            call.done.set()
+        return call.value, False
+
+    def forget(self, matches: Optional[Callable[[Hashable], bool]] = None) -> None:
+        """
+        Detach the calls in flight from their key, so that the next callers make a new call instead of joining them.
+        The callers already waiting still get their result.
+
+        :param matches: Only forget the calls whose key matches. All the calls are forgotten if `None`.
+        """
+        with self._lock:
+            for key in [key for key in self._calls if matches is None or matches(key)]:
+                del self._calls[key]
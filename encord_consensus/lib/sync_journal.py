@@ -0,0 +1,99 @@
+import hashlib
+import json
+import os
+import threading
+from enum import Enum
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from platformdirs import user_data_dir
+
+from .constants import APP_AUTHOR, APP_NAME
+
+
+class SyncState(str, Enum):
+    # The copied labels were saved to the target project
+    TARGET_SAVED = 'TARGET_SAVED'
+    # The priority of the source row was reset, the row is fully synced
+    SOURCE_RESET = 'SOURCE_RESET'
+
+
+class SyncJournal:
+    """
+    Append-only, on-disk journal of a workflow sync.
+
+    Each line records that a (source data hash, project hash) pair reached a `SyncState`, the target project hash
+    being used for `TARGET_SAVED` and the source project hash for `SOURCE_RESET`. Lines are flushed and fsynced
+    as soon as they are written, so a sync that dies at any point can be resumed from the last recorded state.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._states: Dict[Tuple[str, str], SyncState] = {}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.path.exists():
+            self._replay()
+        self._file = self.path.open('a', encoding='utf-8')
+        if self._file.tell() > 0 and not self.path.read_bytes().endswith(b'\n'):
+            # Terminate a partially written last line so the next entries are not appended to it
+            self._file.write('\n')
+
+    @property
+    def is_empty(self) -> bool:
+        return not self._states
+
+    def get_state(self, data_hash: str, project_hash: str) -> Optional[SyncState]:
+        return self._states.get((data_hash, project_hash))
+
+    def record(self, entries: Iterable[Tuple[str, str]], state: SyncState) -> None:
+        """
+        Durably record that each of the (data hash, project hash) pairs reached the given state.
+        """
+        lines = []
+        with self._lock:
+            for data_hash, project_hash in entries:
+                self._states[(data_hash, project_hash)] = state
+                lines.append(json.dumps({'data_hash': data_hash, 'project_hash': project_hash, 'state': state.value}))
+            if not lines:
+                return
+            self._file.write('\n'.join(lines) + '\n')
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def complete(self) -> None:
+        """Delete the journal once the sync went through, the next sync starts from scratch."""
+        with self._lock:
+            self._file.close()
+            self.path.unlink(missing_ok=True)
+            self._states.clear()
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+    def _replay(self) -> None:
+        with self.path.open(encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    self._states[(entry['data_hash'], entry['project_hash'])] = SyncState(entry['state'])
+                except (ValueError, KeyError):
+                    # The last line may have been partially written when the previous sync died
+                    continue
+
+
+def get_sync_journal(
+        reference_project_hash: str,
+        non_reference_project_hashes: List[str],
+        stage_filter: str,
+        journal_dir: Optional[Path] = None,
+) -> SyncJournal:
+    """
+    Open the journal of a workflow sync, resuming the one left by a previous sync of the same workflow if any.
+    """
+    if journal_dir is None:
+        journal_dir = Path(user_data_dir(appname=APP_NAME, appauthor=APP_AUTHOR)) / 'sync_journals'
+    workflow_key = json.dumps([reference_project_hash, sorted(non_reference_project_hashes), stage_filter])
+    journal_name = hashlib.sha256(workflow_key.encode('utf-8')).hexdigest()[:16]
+    return SyncJournal(journal_dir / f'{journal_name}.jsonl')
@@ -0,0 +1,256 @@
+"""
+Generate Encord-shaped ontologies and label rows, to benchmark and exercise the consensus pipeline without the API.
+"""
+import hashlib
+import random
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+from encord.constants.enums import DataType
+from encord.orm.label_row import LabelRow
+
+SYNTHETIC_CREATED_AT = "Mon, 01 Jan 2024 00:00:00 GMT"
+SYNTHETIC_CREATED_BY = "synthetic@encord.com"
+
+
+@dataclass(frozen=True)
+class SyntheticDataSpec:
+    """
+    Parameters of a synthetic video annotated by several annotators.
+
+    :param num_annotators: Number of annotator projects, each one producing a label row of the video.
+    :param num_frames: Number of frames of the video.
+    :param num_answers: Number of options of each radio question of the ontology.
+    :param nesting_depth: Number of nested radio questions, an answer is a path from the root question to a leaf.
+    :param num_classifications: Number of top-level classifications of the ontology.
+    :param label_density: Fraction of the frames labelled in the ground truth.
+    :param disagreement_rate: Probability that an annotator deviates from the ground truth on a labelled section,
+        by picking another answer or skipping the section. Boundaries of the sections are also jittered by it.
+    :param mean_section_length: Mean number of frames of a labelled section of the ground truth.
+    :param seed: Seed of the generator, the same spec always produces the same data.
+    """
+
+    num_annotators: int = 3
+    num_frames: int = 5_000
+    num_answers: int = 4
+    nesting_depth: int = 1
+    num_classifications: int = 1
+    label_density: float = 0.5
+    disagreement_rate: float = 0.1
+    mean_section_length: int = 300
+    seed: int = 0
+
+
+@dataclass(frozen=True)
+class _AnswerPath:
+    classification: Dict
+    # (attribute, option) pairs from the root question to the leaf answer
+    steps: Tuple[Tuple[Dict, Dict], ...]
+
+
+def _feature_hash(*parts) -> str:
+    return hashlib.sha1("/".join(map(str, parts)).encode()).hexdigest()[:8]
+
+
+def _build_attribute(node_id: str, depth: int, spec: SyntheticDataSpec) -> Dict:
+    options = []
+    for option_idx in range(1, spec.num_answers + 1):
+        option_id = f"{node_id}.{option_idx}"
+        option = {
+            "id": option_id,
+            "label": f"Answer {option_id}",
+            "value": f"answer_{option_id.replace('.', '_')}",
+            "featureNodeHash": _feature_hash("option", option_id),
+            "options": [],
+        }
+        if depth < spec.nesting_depth:
+            option["options"].append(_build_attribute(f"{option_id}.1", depth + 1, spec))
+        options.append(option)
+    return {
+        "id": node_id,
+        "name": f"Question {node_id}",
+        "type": "radio",
+        "required": False,
+        "featureNodeHash": _feature_hash("attribute", node_id),
+        "options": options,
+    }
+
+
+def generate_ontology(spec: SyntheticDataSpec) -> List[Dict]:
+    """Return the classifications of an ontology, as listed by `project.ontology["classifications"]`."""
+    return [
+        {
+            "id": str(idx),
+            "featureNodeHash": _feature_hash("classification", idx),
+            "attributes": [_build_attribute(f"{idx}.1", 1, spec)],
+        }
+        for idx in range(1, spec.num_classifications + 1)
+    ]
+
+
+def _answer_paths(ontology: List[Dict]) -> List[_AnswerPath]:
+    paths = []
+    for classification in ontology:
+        to_visit = [(classification["attributes"][0], ())]
+        while to_visit:
+            attribute, steps = to_visit.pop()
+            for option in attribute["options"]:
+                if option["options"]:
+                    to_visit.append((option["options"][0], steps + ((attribute, option),)))
+                else:
+                    paths.append(_AnswerPath(classification=classification, steps=steps + ((attribute, option),)))
+    return sorted(paths, key=lambda p: [option["id"] for _, option in p.steps])
+
+
+def _generate_ground_truth(spec: SyntheticDataSpec, num_paths: int, rng: random.Random) -> List[Tuple[int, int, int]]:
+    """Return the labelled `(start, end, answer path index)` sections, inclusive and non-overlapping."""
+    sections = []
+    mean_gap = spec.mean_section_length * (1 - spec.label_density) / max(spec.label_density, 1e-9)
+    frame = int(rng.expovariate(1 / mean_gap)) if mean_gap > 0 else 0
+    while frame < spec.num_frames:
+        length = max(1, int(rng.expovariate(1 / spec.mean_section_length)))
+        end = min(frame + length, spec.num_frames) - 1
+        sections.append((frame, end, rng.randrange(num_paths)))
+        frame = end + 1 + (int(rng.expovariate(1 / mean_gap)) if mean_gap > 0 else 0)
+    return sections
+
+
+def _annotate(
+    ground_truth: List[Tuple[int, int, int]], spec: SyntheticDataSpec, num_paths: int, rng: random.Random
+) -> List[Tuple[int, int, int]]:
+    sections = []
+    max_jitter = max(1, int(spec.mean_section_length * spec.disagreement_rate / 2))
+    for start, end, path_idx in ground_truth:
+        if rng.random() < spec.disagreement_rate:
+            if rng.random() < 0.5:
+                continue
+            path_idx = rng.randrange(num_paths)
+        if rng.random() < spec.disagreement_rate:
+            start = start + rng.randint(-max_jitter, max_jitter)
+            end = end + rng.randint(-max_jitter, max_jitter)
+        start, end = max(start, 0), min(end, spec.num_frames - 1)
+        if sections:
+            # Jittered sections must not overlap, every frame has at most one answer per classification
+            start = max(start, sections[-1][1] + 1)
+        if start <= end:
+            sections.append((start, end, path_idx))
+    return sections
+
+
+def _classification_answer(classification_hash: str, path: _AnswerPath) -> Dict:
+    return {
+        "classificationHash": classification_hash,
+        "classifications": [
+            {
+                "name": attribute["name"],
+                "value": attribute["name"].lower().replace(" ", "_"),
+                "answers": [
+                    {"name": option["label"], "value": option["value"], "featureHash": option["featureNodeHash"]}
+                ],
+                "featureHash": attribute["featureNodeHash"],
+                "manualAnnotation": True,
+            }
+            for attribute, option in path.steps
+        ],
+    }
+
+
+def _frame_classification(classification_hash: str, path: _AnswerPath) -> Dict:
+    attribute, _ = path.steps[0]
+    return {
+        "name": attribute["name"],
+        "value": attribute["name"].lower().replace(" ", "_"),
+        "featureHash": path.classification["featureNodeHash"],
+        "classificationHash": classification_hash,
+        "createdAt": SYNTHETIC_CREATED_AT,
+        "createdBy": SYNTHETIC_CREATED_BY,
+        "confidence": 1,
+        "manualAnnotation": True,
+        "reviews": [],
+    }
+
+
+def generate_label_row(
+    spec: SyntheticDataSpec,
+    ontology: List[Dict],
+    sections_by_classification: Dict[str, List[Tuple[int, int, int]]],
+    project_hash: str,
+    data_hash: str,
+) -> LabelRow:
+    paths = _answer_paths(ontology)
+    labels: Dict[str, Dict] = {}
+    classification_answers: Dict[str, Dict] = {}
+    for sections in sections_by_classification.values():
+        for start, end, path_idx in sections:
+            # Annotators extend a single classification instance over all the frames with the same answer
+            classification_hash = _feature_hash("instance", project_hash, data_hash, path_idx)
+            if classification_hash not in classification_answers:
+                classification_answers[classification_hash] = _classification_answer(
+                    classification_hash, paths[path_idx]
+                )
+            frame_classification = _frame_classification(classification_hash, paths[path_idx])
+            for frame in range(start, end + 1):
+                labels.setdefault(str(frame), {"objects": [], "classifications": []})["classifications"].append(
+                    dict(frame_classification)
+                )
+    data_unit = {
+        "data_hash": data_hash,
+        "data_title": f"synthetic_{data_hash}.mp4",
+        "data_type": "video/mp4",
+        "data_sequence": 0,
+        "data_link": f"https://storage.example.com/{data_hash}.mp4",
+        "data_fps": 25.0,
+        "data_duration": spec.num_frames / 25.0,
+        "width": 1920,
+        "height": 1080,
+        "labels": dict(sorted(labels.items(), key=lambda item: int(item[0]))),
+    }
+    return LabelRow(
+        {
+            "label_hash": _feature_hash("label", project_hash, data_hash),
+            "created_at": SYNTHETIC_CREATED_AT,
+            "last_edited_at": SYNTHETIC_CREATED_AT,
+            "dataset_hash": _feature_hash("dataset", spec.seed),
+            "dataset_title": "Synthetic dataset",
+            "data_title": data_unit["data_title"],
+            "data_hash": data_hash,
+            "data_type": DataType.VIDEO.value,
+            "data_units": {data_hash: data_unit},
+            "object_answers": {},
+            "classification_answers": classification_answers,
+            "object_actions": {},
+            "label_status": "LABELLED",
+            "annotation_task_status": None,
+        }
+    )
+
+
+def generate_label_rows(
+    spec: SyntheticDataSpec, ontology: List[Dict], data_hash: str = "synthetic-data"
+) -> Dict[str, LabelRow]:
+    """
+    Generate the label rows of a video annotated by `spec.num_annotators` projects, keyed by project hash like
+    `download_label_row_from_projects`.
+    """
+    rng = random.Random(f"{spec.seed}/{data_hash}")
+    paths = _answer_paths(ontology)
+    paths_by_classification: Dict[str, List[int]] = {}
+    for idx, path in enumerate(paths):
+        paths_by_classification.setdefault(path.classification["featureNodeHash"], []).append(idx)
+    # Sections hold the index of the answer among the answers of their classification
+    ground_truth = {
+        feature_hash: _generate_ground_truth(spec, len(path_indexes), rng)
+        for feature_hash, path_indexes in paths_by_classification.items()
+    }
+    lr_data = {}
+    for annotator in range(spec.num_annotators):
+        project_hash = f"synthetic-project-{annotator}"
+        sections_by_classification = {}
+        for feature_hash, sections in ground_truth.items():
+            path_indexes = paths_by_classification[feature_hash]
+            sections_by_classification[feature_hash] = [
+                (start, end, path_indexes[local_idx])
+                for start, end, local_idx in _annotate(sections, spec, len(path_indexes), rng)
+            ]
+        lr_data[project_hash] = generate_label_row(spec, ontology, sections_by_classification, project_hash, data_hash)
+    return lr_data
@@ -0,0 +1,233 @@
+"""
+Lightweight tracing spans: the duration, payload size and call count of the Encord calls and pipeline stages.
+
+Spans are aggregated in memory by name. They can also be written as structured JSON logs (one line per span) and as a
+Prometheus text file, see `configure_tracing_outputs`.
+"""
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+TRACE_LOG_ENV_VAR = "ENCORD_CONSENSUS_TRACE_LOG"
+PROMETHEUS_FILE_ENV_VAR = "ENCORD_CONSENSUS_PROMETHEUS_FILE"
+DEFAULT_MAX_RECENT_SPANS = 200
+# Minimum number of seconds between two writes of the Prometheus file
+DEFAULT_PROMETHEUS_WRITE_INTERVAL = 10.0
+PROMETHEUS_METRIC_PREFIX = "encord_consensus_span"
+
+span_logger = logging.getLogger("encord_consensus.tracing")
+# The JSON lines are only written once enabled by `configure_tracing_outputs`, not by the logging config of the app
+span_logger.setLevel(logging.WARNING)
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+
+@dataclass(slots=True)
+class Span:
+    name: str
+    parent: Optional[str] = None
+    started_at: float = 0.0
+    seconds: float = 0.0
+    # Number of items sent or received (label rows, frames, regions...), `None` if it doesn't apply
+    payload_size: Optional[int] = None
+    error: Optional[str] = None
+
+
+@dataclass(slots=True)
+class SpanStats:
+    count: int = 0
+    errors: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+    total_payload_size: int = 0
+
+    @property
+    def mean_seconds(self) -> float:
+        return self.total_seconds / self.count if self.count else 0.0
+
+
+class Tracer:
+    """
+    Aggregate the spans by name, and keep the most recent ones.
+
+    Recording a span takes a lock and a few additions, so spans can wrap any call that takes more than a few
+    microseconds.
+    """
+
+    def __init__(self, max_recent_spans: int = DEFAULT_MAX_RECENT_SPANS):
+        self._lock = threading.Lock()
+        self._stats: Dict[str, SpanStats] = {}
+        self._recent: Deque[Span] = deque(maxlen=max_recent_spans)
+        self.prometheus_path: Optional[Path] = None
+        self.prometheus_write_interval = DEFAULT_PROMETHEUS_WRITE_INTERVAL
+        self._last_prometheus_write = 0.0
+
+    @contextmanager
+    def span(self, name: str, payload_size: Optional[int] = None) -> Iterator[Span]:
+        """
+        Time the block, the yielded span's `payload_size` can be set inside it.
+        """
+        parent = _current_span.get()
+        span = Span(name=name, parent=parent.name if parent is not None else None, payload_size=payload_size)
+        token = _current_span.set(span)
+        span.started_at = time.time()
+        start = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.error = type(e).__name__
+            raise
+        finally:
+            span.seconds = time.perf_counter() - start
+            _current_span.reset(token)
+            self.record(span)
+
+    def record(self, span: Span) -> None:
+        with self._lock:
+            stats = self._stats.get(span.name)
+            if stats is None:
+                stats = self._stats[span.name] = SpanStats()
+            stats.count += 1
+            stats.errors += span.error is not None
+            stats.total_seconds += span.seconds
+            stats.max_seconds = max(stats.max_seconds, span.seconds)
+            stats.total_payload_size += span.payload_size or 0
+            self._recent.append(span)
+            write_prometheus = (
+                self.prometheus_path is not None
+                and span.started_at - self._last_prometheus_write >= self.prometheus_write_interval
+            )
+            if write_prometheus:
+                self._last_prometheus_write = span.started_at
+        if span_logger.isEnabledFor(logging.INFO):
+            span_logger.info(json.dumps({"event": "span", **asdict(span)}))
+        if write_prometheus:
+            self.write_prometheus()
+
+    def stats(self) -> Dict[str, SpanStats]:
+        """Return a copy of the stats of each span name."""
+        with self._lock:
+            return {name: SpanStats(**asdict(stats)) for name, stats in self._stats.items()}
+
+    def recent_spans(self) -> List[Span]:
+        """Return the most recent spans, the latest last."""
+        with self._lock:
+            return list(self._recent)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+            self._recent.clear()
+
+    def to_prometheus(self) -> str:
+        """Format the stats in the Prometheus text exposition format."""
+        metrics = [
+            ("count_total", "counter", "Number of finished spans.", lambda s: s.count),
+            ("errors_total", "counter", "Number of spans that raised an exception.", lambda s: s.errors),
+            ("seconds_total", "counter", "Total duration of the spans.", lambda s: s.total_seconds),
+            ("seconds_max", "gauge", "Longest duration of a span.", lambda s: s.max_seconds),
+            ("payload_size_total", "counter", "Total payload size of the spans.", lambda s: s.total_payload_size),
+        ]
+        stats = self.stats()
+        lines = []
+        for suffix, metric_type, description, value in metrics:
+            metric = f"{PROMETHEUS_METRIC_PREFIX}_{suffix}"
+            lines.append(f"# HELP {metric} {description}")
+            lines.append(f"# TYPE {metric} {metric_type}")
+            for name in sorted(stats):
+                escaped_name = name.replace("\\", "\\\\").replace('"', '\\"')
+                lines.append(f'{metric}{{span="{escaped_name}"}} {value(stats[name])}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: Optional[Path] = None) -> None:
+        """
+        Write the stats as a Prometheus text file, e.g. for the textfile collector of the node exporter.
+        The file is replaced atomically, so it's never read half written.
+        """
+        path = path or self.prometheus_path
+        if path is None:
+            return
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            tmp_path.write_text(self.to_prometheus())
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.warning(f"Could not write the tracing metrics to {path}: {e}")
+
+
+_tracer = Tracer()
+
+
+def get_tracer() -> Tracer:
+    return _tracer
+
+
+def span(name: str, payload_size: Optional[int] = None):
+    """Time a block with the default tracer, see `Tracer.span`."""
+    return _tracer.span(name, payload_size)
+
+
+def _default_payload_size(result: Any) -> Optional[int]:
+    # Only plain collections, the length of a label row or of a string isn't a meaningful payload size
+    return len(result) if type(result) in (list, tuple, dict, set) else None
+
+
+def traced(
+    name: Optional[str] = None, payload_size: Callable[[Any], Optional[int]] = _default_payload_size
+) -> Callable[[Callable[..., T]], Callable[..., T]]:
+    """
+    Record a span for every call of the decorated function.
+
+    :param name: The name of the span, defaults to the module and the qualified name of the function.
+    :param payload_size: Compute the payload size from the result of the function.
+        Defaults to the length of the results that are lists, tuples, dicts or sets.
+    """
+
+    def decorator(fn: Callable[..., T]) -> Callable[..., T]:
+        span_name = name or f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs) -> T:
+            with _tracer.span(span_name) as current:
+                result = fn(*args, **kwargs)
+                current.payload_size = payload_size(result)
+                return result
+
+        return wrapper
+
+    return decorator
+
+
+def configure_tracing_outputs(
+    trace_log_path: Optional[str] = None, prometheus_path: Optional[str] = None
+) -> None:
+    """
+    Write the spans to the outputs given, or to the ones set in the environment.
+
+    :param trace_log_path: File where each span is appended as a JSON line. Defaults to `ENCORD_CONSENSUS_TRACE_LOG`.
+    :param prometheus_path: Prometheus text file refreshed with the stats of the spans.
+        Defaults to `ENCORD_CONSENSUS_PROMETHEUS_FILE`.
+    """
+    trace_log_path = trace_log_path or os.getenv(TRACE_LOG_ENV_VAR)
+    prometheus_path = prometheus_path or os.getenv(PROMETHEUS_FILE_ENV_VAR)
+    if trace_log_path and not any(getattr(h, "trace_log", False) for h in span_logger.handlers):
+        handler = logging.FileHandler(trace_log_path, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        handler.trace_log = True
+        span_logger.addHandler(handler)
+        span_logger.setLevel(logging.INFO)
+        # The JSON lines only go to the trace log
+        span_logger.propagate = False
+    if prometheus_path:
+        _tracer.prometheus_path = Path(prometheus_path)
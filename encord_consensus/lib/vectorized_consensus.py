@@ -0,0 +1,140 @@
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from .data_model import (
+    Answer,
+    ClassificationView,
+    CompactAnswer,
+    CompactClassificationView,
+    CompactRegion,
+    ConsensusData,
+    RegionOfInterest,
+)
+from .frame_label_consensus import calculate_n_scores_from_min_n_agreement
+from .tracing import traced
+
+
+@dataclass
+class AnswerVotes:
+    """
+    Dense vote matrix of a single answer.
+
+    Row `i` of `votes` holds the frames voted by `source_project_hashes[i]`, column `j` represents
+    the frame `first_frame + j`.
+    """
+
+    answer: CompactAnswer | Answer
+    source_project_hashes: List[str]
+    first_frame: int
+    votes: np.ndarray
+
+    @property
+    def vote_counts(self) -> np.ndarray:
+        return self.votes.sum(axis=0, dtype=np.int64)
+
+
+@traced()
+def aggregate_votes_by_answer(
+    prepared_data: List[CompactClassificationView] | List[ClassificationView],
+) -> List[AnswerVotes]:
+    """
+    Vectorized counterpart of `aggregate_by_answer`.
+    Each answer is stored as a boolean (annotators x frames) matrix instead of a per-frame list of project hashes.
+    """
+    views_by_answer: Dict[CompactAnswer | Answer, List[CompactClassificationView | ClassificationView]] = {}
+    for c in prepared_data:
+        views_by_answer.setdefault(c.answer, []).append(c)
+
+    aggregated: List[AnswerVotes] = []
+    for answer, classification_views in views_by_answer.items():
+        frames_per_view = [np.asarray(c.frames, dtype=np.int64) for c in classification_views]
+        non_empty = [frames for frames in frames_per_view if frames.size > 0]
+        if not non_empty:
+            continue
+        first_frame = int(min(frames.min() for frames in non_empty))
+        last_frame = int(max(frames.max() for frames in non_empty))
+
+        votes = np.zeros((len(classification_views), last_frame - first_frame + 1), dtype=bool)
+        for row, frames in enumerate(frames_per_view):
+            votes[row, frames - first_frame] = True
+        aggregated.append(
+            AnswerVotes(
+                answer=answer,
+                source_project_hashes=[c.source_project_hash for c in classification_views],
+                first_frame=first_frame,
+                votes=votes,
+            )
+        )
+    return aggregated
+
+
+def find_region_bounds(vote_counts: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Find the contiguous sections of frames with at least one vote.
+
+    :return: The start (inclusive) and end (exclusive) column indices of each section.
+    """
+    padded_mask = np.concatenate(([0], (vote_counts > 0).astype(np.int8), [0]))
+    edges = np.diff(padded_mask)
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def calculate_min_n_agreement_from_counts(vote_counts: np.ndarray) -> Dict[int, int]:
+    """Vectorized counterpart of `process_vote_counts`, only frames with at least one vote are expected."""
+    if vote_counts.size == 0:
+        return {}
+    agreement_count_ge = np.cumsum(np.bincount(vote_counts)[::-1])[::-1][1:]
+    return {annotators_amount: int(count) for annotators_amount, count in enumerate(agreement_count_ge, start=1)}
+
+
+@traced()
+def find_compact_regions_from_votes(
+    aggregated_votes: List[AnswerVotes], total_num_annotators: int
+) -> List[CompactRegion]:
+    """Find the regions of interest and their consensus data without building any per-frame dictionary."""
+    regions: List[CompactRegion] = []
+    for answer_votes in aggregated_votes:
+        vote_counts = answer_votes.vote_counts
+        source_project_hashes = tuple(answer_votes.source_project_hashes)
+        starts, ends = find_region_bounds(vote_counts)
+        for idx, (start, end) in enumerate(zip(starts.tolist(), ends.tolist())):
+            region_vote_counts = vote_counts[start:end]
+            min_n_agreement = calculate_min_n_agreement_from_counts(region_vote_counts)
+            regions.append(
+                CompactRegion(
+                    answer=answer_votes.answer,
+                    region_number=idx,
+                    first_frame=answer_votes.first_frame + start,
+                    source_project_hashes=source_project_hashes,
+                    votes=answer_votes.votes[:, start:end],
+                    consensus_data=ConsensusData(
+                        max_agreement=int(region_vote_counts.max()),
+                        integrated_agreement_score=round(
+                            int(region_vote_counts.sum()) / (total_num_annotators * (end - start)), 4
+                        ),
+                        min_n_agreement=min_n_agreement,
+                        n_scores=calculate_n_scores_from_min_n_agreement(min_n_agreement),
+                    ),
+                )
+            )
+    return regions
+
+
+def find_regions_of_interest_from_votes(
+    aggregated_votes: List[AnswerVotes], total_num_annotators: int
+) -> List[RegionOfInterest]:
+    """Vectorized counterpart of `find_regions_of_interest`, it produces exactly the same regions of interest."""
+    return [
+        region.to_region_of_interest()
+        for region in find_compact_regions_from_votes(aggregated_votes, total_num_annotators)
+    ]
+
+
+def calculate_frame_level_min_n_agreement_from_votes(aggregated_votes: List[AnswerVotes]) -> Dict[int, int]:
+    """Vectorized counterpart of `calculate_frame_level_min_n_agreement`."""
+    if not aggregated_votes:
+        return {}
+    vote_counts = np.concatenate([answer_votes.vote_counts for answer_votes in aggregated_votes])
+    return calculate_min_n_agreement_from_counts(vote_counts[vote_counts > 0])
@@ -0,0 +1,162 @@
+import json
+import logging
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from encord_consensus.lib.utils import get_project_root
+
+root_dir = get_project_root()
+WORKFLOW_STORE_PATH = root_dir.joinpath(Path('.workflow_configs.sqlite'))
+LEGACY_WORKFLOW_CONFIG_PATH = root_dir.joinpath(Path('.workflow_configs.json'))
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS workflows (
+    name TEXT PRIMARY KEY,
+    workflow_type TEXT NOT NULL,
+    project_set_key TEXT NOT NULL,
+    workflow TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS workflows_by_type ON workflows (workflow_type);
+CREATE INDEX IF NOT EXISTS workflows_by_type_and_projects ON workflows (workflow_type, project_set_key);
+'''
+_SCHEMA_VERSION = 1
+
+
+def _project_set_key(project_hashes: Iterable[str]) -> str:
+    return ','.join(sorted(set(project_hashes)))
+
+
+class WorkflowStore:
+    """
+    Workflow configs stored in SQLite, indexed by workflow type and by the set of non-reference projects.
+
+    Every write is a transaction, so several app processes can share the store without corrupting it. Reads are
+    served from an in-process cache, which is reloaded only when another connection committed a change (as
+    reported by SQLite's `data_version`).
+    """
+
+    def __init__(
+        self,
+        path: Path = WORKFLOW_STORE_PATH,
+        legacy_config_path: Optional[Path] = LEGACY_WORKFLOW_CONFIG_PATH,
+    ):
+        """
+        :param path: The SQLite database file.
+        :param legacy_config_path: The JSON config of previous versions, imported when the database is created.
+        """
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._data_version: Optional[int] = None
+        self._workflows: Dict[str, Dict] = {}
+        self._names_by_key: Dict[Tuple[str, str], List[str]] = {}
+        with self._transaction():
+            for statement in filter(str.strip, _SCHEMA.split(';')):
+                self._conn.execute(statement)
+            if self._conn.execute('PRAGMA user_version').fetchone()[0] < _SCHEMA_VERSION:
+                self._migrate_legacy_config(legacy_config_path)
+                self._conn.execute(f'PRAGMA user_version = {_SCHEMA_VERSION}')
+
+    def all(self) -> Dict[str, Dict]:
+        """Return all the workflows keyed by name, in creation order."""
+        with self._lock:
+            self._refresh()
+            return dict(self._workflows)
+
+    def get(self, name: str) -> Optional[Dict]:
+        with self._lock:
+            self._refresh()
+            return self._workflows.get(name)
+
+    def find(self, workflow_type: str, non_reference_project_hashes: Iterable[str]) -> List[Dict]:
+        """Return the workflows of the given type whose non-reference projects are exactly the given ones."""
+        with self._lock:
+            self._refresh()
+            names = self._names_by_key.get((workflow_type, _project_set_key(non_reference_project_hashes)), [])
+            return [self._workflows[name] for name in names]
+
+    def put(self, name: str, workflow: Dict) -> None:
+        """Create the workflow, or replace the existing one with the same name."""
+        with self._lock:
+            with self._transaction():
+                self._upsert(name, workflow)
+            self._data_version = None
+
+    def delete(self, name: str) -> None:
+        with self._lock:
+            with self._transaction():
+                self._conn.execute('DELETE FROM workflows WHERE name = ?', (name,))
+            self._data_version = None
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        # Take the write lock upfront, so concurrent writers wait instead of failing mid-transaction
+        self._conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield
+        except BaseException:
+            self._conn.execute('ROLLBACK')
+            raise
+        self._conn.execute('COMMIT')
+
+    def _upsert(self, name: str, workflow: Dict) -> None:
+        self._conn.execute(
+            'INSERT INTO workflows (name, workflow_type, project_set_key, workflow) VALUES (?, ?, ?, ?) '
+            'ON CONFLICT (name) DO UPDATE SET workflow_type = excluded.workflow_type, '
+            'project_set_key = excluded.project_set_key, workflow = excluded.workflow',
+            (
+                name,
+                workflow['workflow_type'],
+                _project_set_key(workflow['spec']['non_reference_project_hashes']),
+                json.dumps(workflow),
+            ),
+        )
+
+    def _refresh(self) -> None:
+        # `data_version` only changes when another connection commits, our own writes invalidate the cache directly
+        data_version = self._conn.execute('PRAGMA data_version').fetchone()[0]
+        if data_version == self._data_version:
+            return
+        workflows = {}
+        names_by_key: Dict[Tuple[str, str], List[str]] = {}
+        for name, workflow_type, project_set_key, workflow in self._conn.execute(
+            'SELECT name, workflow_type, project_set_key, workflow FROM workflows ORDER BY rowid'
+        ):
+            workflows[name] = json.loads(workflow)
+            names_by_key.setdefault((workflow_type, project_set_key), []).append(name)
+        self._workflows = workflows
+        self._names_by_key = names_by_key
+        self._data_version = data_version
+
+    def _migrate_legacy_config(self, legacy_config_path: Optional[Path]) -> None:
+        if legacy_config_path is None or not legacy_config_path.exists():
+            return
+        try:
+            legacy_config = json.loads(legacy_config_path.read_text())
+        except ValueError:
+            logging.warning(f'Could not read the workflow config {legacy_config_path}, it was not migrated.')
+            return
+        for name, workflow in legacy_config.items():
+            self._upsert(name, workflow)
+        logging.info(f'Migrated {len(legacy_config)} workflows from {legacy_config_path} to {self.path}.')
+
+
+_workflow_store: Optional[WorkflowStore] = None
+_workflow_store_lock = threading.Lock()
+
+
+def get_workflow_store() -> WorkflowStore:
+    """Return the workflow store shared by the app, creating it (and migrating the JSON config) on first use."""
+    global _workflow_store
+    with _workflow_store_lock:
+        if _workflow_store is None:
+            _workflow_store = WorkflowStore()
+        return _workflow_store
@@ -1,14 +1,18 @@
-import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
-from pathlib import Path
 from typing import List, Dict
 
 from encord import EncordUserClient, Project
+from encord.objects import LabelRowV2
 
-from encord_consensus.lib.utils import get_project_root
+from encord_consensus.lib.project_access import call_with_retries, get_project
+from encord_consensus.lib.sync_journal import SyncJournal, SyncState, get_sync_journal
+from encord_consensus.lib.workflow_store import get_workflow_store
 
-root_dir = get_project_root()
-WORKFLOW_CONFIG_PATH = root_dir.joinpath(Path('.workflow_configs.json'))
+DEFAULT_SYNC_BATCH_SIZE = 100
+DEFAULT_SYNC_WORKERS = 4
 
 
 class WorkflowType(str, Enum):
@@ -16,9 +20,54 @@ class WorkflowType(str, Enum):
     COPY_DOWNSTREAM = 'Copy Downstream'
 
 
-def read_workflow_config():
-    with open(WORKFLOW_CONFIG_PATH, 'r') as f:
-        return json.load(f)
+def read_workflow_config() -> Dict[str, Dict]:
+    return get_workflow_store().all()
+
+
+def _index_label_rows_by_data_hash(project: Project) -> Dict[str, LabelRowV2]:
+    return {lr.data_hash: lr for lr in call_with_retries(project.list_label_rows_v2)}
+
+
+def _copy_batch_to_target(
+    target_project: Project,
+    target_rows: Dict[str, LabelRowV2],
+    source_rows: List[LabelRowV2],
+    target_priority: int,
+    journal: SyncJournal,
+) -> int:
+    rows_to_sync = []
+    for lr_s in source_rows:
+        if journal.get_state(lr_s.data_hash, target_project.project_hash) == SyncState.TARGET_SAVED:
+            continue
+        lr_t = target_rows.get(lr_s.data_hash)
+        if lr_t is None:
+            logging.warning(f"Data {lr_s.data_hash} is missing from project <{target_project.title}>, skipping it.")
+            continue
+        rows_to_sync.append((lr_s, lr_t))
+    if not rows_to_sync:
+        return 0
+
+    # The target labels are initialised empty, so saving overwrites whatever a previous, interrupted sync wrote
+    with target_project.create_bundle() as bundle:
+        for _, lr_t in rows_to_sync:
+            lr_t.initialise_labels(
+                include_object_feature_hashes=set(),
+                include_classification_feature_hashes=set(),
+                overwrite=True,
+                bundle=bundle,
+            )
+    with target_project.create_bundle() as bundle:
+        for lr_s, lr_t in rows_to_sync:
+            for obj in lr_s.get_object_instances():
+                lr_t.add_object_instance(obj.copy())
+            for cl in lr_s.get_classification_instances():
+                lr_t.add_classification_instance(cl.copy())
+            lr_t.set_priority(target_priority, bundle=bundle)
+            lr_t.save(bundle=bundle)
+    journal.record(
+        [(lr_s.data_hash, target_project.project_hash) for lr_s, _ in rows_to_sync], SyncState.TARGET_SAVED
+    )
+    return len(rows_to_sync)
 
 
 def pre_populate(
@@ -26,39 +75,95 @@ def pre_populate(
         reference_project_hash: str,
         non_reference_project_hashes: List[str],
         stage_filter: str = 'COMPLETE',
-        target_priority: int = 1
+        target_priority: int = 1,
+        batch_size: int = DEFAULT_SYNC_BATCH_SIZE,
+        max_workers: int = DEFAULT_SYNC_WORKERS,
+        journal: SyncJournal | None = None,
 ) -> int:
-    source_project = user_client.get_project(reference_project_hash)
+    """
+    Copy the labels of the source rows in the given stage to the same data in each target project.
+
+    The target projects' label rows are listed once and indexed by data hash. Rows are initialised and saved in
+    bundles of `batch_size`, with up to `max_workers` target projects being written at the same time.
+    Source rows copied to every target project get their priority reset to 0 so they are not synced again, while the
+    target rows get `target_priority`. Source rows whose data is missing from a target project keep their priority.
+
+    Progress is written to a journal on disk. If the sync is interrupted, the next sync of the same workflow skips
+    the targets that were already saved and only resets the priority of the source rows that were fully copied.
+    The journal is deleted once the sync completes.
+
+    :param journal: The journal to use, defaults to the one of the workflow in the user data directory.
+    :return: The number of (source row, target project) pairs that were synced.
+    """
+    start = time.perf_counter()
+    if journal is None:
+        journal = get_sync_journal(reference_project_hash, non_reference_project_hashes, stage_filter)
+    if not journal.is_empty:
+        logging.info(f"Resuming the interrupted sync recorded in {journal.path}.")
+    source_project = get_project(user_client, reference_project_hash)
     target_projects = [
-        user_client.get_project(p_hash) for p_hash in non_reference_project_hashes
+        get_project(user_client, p_hash) for p_hash in non_reference_project_hashes
+    ]
+    source_rows = [
+        lr_s for lr_s in call_with_retries(source_project.list_label_rows_v2, workflow_graph_node_title_eq=stage_filter)
+        if lr_s.priority != 0 and journal.get_state(lr_s.data_hash, reference_project_hash) != SyncState.SOURCE_RESET
     ]
     synced_counter = 0
-    for lr_s in source_project.list_label_rows_v2(workflow_graph_node_title_eq=stage_filter):
-        if lr_s.priority != 0:
-            for target_project in target_projects:
-                lr_t = target_project.list_label_rows_v2(data_hashes=[lr_s.data_hash]).pop()
-                if not lr_s.is_labelling_initialised:
-                    lr_s.initialise_labels()
-                lr_t.initialise_labels(include_object_feature_hashes=set(), include_classification_feature_hashes=set())
-                for obj in lr_s.get_object_instances():
-                    lr_t.add_object_instance(obj.copy())
-                for cl in lr_s.get_classification_instances():
-                    lr_t.add_classification_instance(cl.copy())
-                lr_t.set_priority(target_priority)
-                synced_counter += 1
-                lr_t.save()
-            lr_s.set_priority(0)
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            target_rows_by_project = list(executor.map(_index_label_rows_by_data_hash, target_projects))
+            for batch_start in range(0, len(source_rows), batch_size):
+                batch = source_rows[batch_start: batch_start + batch_size]
+                with source_project.create_bundle() as bundle:
+                    for lr_s in batch:
+                        has_pending_targets = any(
+                            journal.get_state(lr_s.data_hash, p_hash) != SyncState.TARGET_SAVED
+                            for p_hash in non_reference_project_hashes
+                        )
+                        if has_pending_targets and not lr_s.is_labelling_initialised:
+                            lr_s.initialise_labels(bundle=bundle)
+                futures = [
+                    executor.submit(
+                        _copy_batch_to_target, target_project, target_rows, batch, target_priority, journal
+                    )
+                    for target_project, target_rows in zip(target_projects, target_rows_by_project)
+                ]
+                synced_counter += sum(future.result() for future in futures)
+                # Rows missing from a target are left pending, so they are synced once their data is added to it
+                copied_rows = [
+                    lr_s
+                    for lr_s in batch
+                    if all(
+                        journal.get_state(lr_s.data_hash, p_hash) == SyncState.TARGET_SAVED
+                        for p_hash in non_reference_project_hashes
+                    )
+                ]
+                if len(copied_rows) < len(batch):
+                    logging.warning(
+                        f"{len(batch) - len(copied_rows)} source rows could not be copied to every target project, "
+                        f"they will be synced again by the next sync."
+                    )
+                with source_project.create_bundle() as bundle:
+                    for lr_s in copied_rows:
+                        lr_s.set_priority(0, bundle=bundle)
+                journal.record(
+                    [(lr_s.data_hash, reference_project_hash) for lr_s in copied_rows], SyncState.SOURCE_RESET
+                )
+                elapsed = time.perf_counter() - start
+                logging.info(
+                    f"Synced {synced_counter} rows in {elapsed:.1f}s ({synced_counter / elapsed:.2f} rows/s)."
+                )
+    except BaseException:
+        journal.close()
+        raise
+    journal.complete()
     return synced_counter
 
 
 def get_downstream_copy_workflow_for_selection(non_reference_projects: List[Project]) -> Dict | None:
-    non_ref_project_hashes = set([p.project_hash for p in non_reference_projects])
-    wf_config = read_workflow_config()
-    matches = [
-        wf for wf in wf_config.values()
-        if set(wf['spec']['non_reference_project_hashes']) == non_ref_project_hashes
-        and wf['workflow_type'] == WorkflowType.COPY_DOWNSTREAM.value
-    ]
+    matches = get_workflow_store().find(
+        WorkflowType.COPY_DOWNSTREAM.value, [p.project_hash for p in non_reference_projects]
+    )
     if len(matches) == 0:
         return None
     if len(matches) == 1:
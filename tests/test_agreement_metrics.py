@@ -0,0 +1,158 @@
+import math
+
+import numpy as np
+import pytest
+
+from encord_consensus.lib.agreement_metrics import (
+    NO_ANSWER,
+    AgreementCounts,
+    calculate_file_agreement,
+    count_agreement,
+    rate_items,
+)
+from encord_consensus.lib.data_transformation import prepare_compact_data_for_consensus
+from encord_consensus.lib.synthetic_data import (
+    SyntheticDataSpec,
+    generate_label_rows,
+    generate_ontology,
+)
+
+# Fleiss (1971): 10 subjects, each rated by 14 raters in one of 5 categories, with kappa 0.210
+FLEISS_CATEGORY_COUNTS = [
+    [0, 0, 0, 0, 14],
+    [0, 2, 6, 4, 2],
+    [0, 0, 3, 5, 6],
+    [0, 3, 9, 2, 0],
+    [2, 2, 8, 1, 1],
+    [7, 7, 0, 0, 0],
+    [3, 2, 6, 3, 0],
+    [2, 5, 3, 2, 2],
+    [6, 5, 2, 1, 0],
+    [0, 2, 2, 3, 7],
+]
+
+
+def _counts(ratings, num_categories: int) -> AgreementCounts:
+    return count_agreement(np.asarray(ratings, dtype=np.int64), [str(c) for c in range(num_categories)])
+
+
+def _fleiss_kappa(ratings: np.ndarray, num_categories: int) -> float:
+    """Fleiss' kappa computed item by item, as in its definition."""
+    n_items, m = ratings.shape
+    category_counts = np.stack([np.bincount(item, minlength=num_categories) for item in ratings])
+    per_item = (np.sum(category_counts**2, axis=1) - m) / (m * (m - 1))
+    p_category = category_counts.sum(axis=0) / (n_items * m)
+    expected = np.sum(p_category**2)
+    return (per_item.mean() - expected) / (1 - expected)
+
+
+def test_perfect_agreement():
+    # 3 annotators choosing the same answers, a then b, over 20 frames
+    votes = np.zeros((20, 3, 2), dtype=bool)
+    votes[:10, :, 0] = True
+    votes[10:, :, 1] = True
+    counts = count_agreement(*rate_items(votes, ["q=a", "q=b"], "q"))
+    assert counts.num_items == 20
+    assert counts.fleiss_kappa == 1
+    assert counts.krippendorff_alpha == 1
+    np.testing.assert_array_equal(counts.cohen_kappa, np.ones((3, 3)))
+
+    # Without any variation there is no room for chance correction, but the agreement is still perfect
+    counts = _counts([[1, 1], [1, 1]], 2)
+    assert counts.summarise(["a", "b"]) == {
+        "num_items": 2,
+        "fleiss_kappa": 1.0,
+        "krippendorff_alpha": 1.0,
+        "cohen_kappa": {"a": {"b": 1.0}, "b": {"a": 1.0}},
+    }
+
+
+def test_near_perfect_agreement():
+    ratings = np.repeat([[1, 1], [2, 2]], 50, axis=0)
+    ratings[0, 1] = 2
+    counts = _counts(ratings, 3)
+    assert counts.cohen_kappa[0, 1] == pytest.approx(0.98)
+    assert counts.fleiss_kappa == pytest.approx(0.98, abs=1e-3)
+
+
+def test_fleiss_example():
+    ratings = [np.repeat(np.arange(5), item_counts) for item_counts in FLEISS_CATEGORY_COUNTS]
+    assert _counts(ratings, 5).fleiss_kappa == pytest.approx(0.2099, abs=1e-4)
+
+
+def test_cohen_example():
+    # Two readers answering yes or no on 50 items: 20 yes/yes, 5 yes/no, 10 no/yes and 15 no/no
+    ratings = [[0, 0]] * 20 + [[0, 1]] * 5 + [[1, 0]] * 10 + [[1, 1]] * 15
+    counts = _counts(ratings, 2)
+    assert counts.cohen_kappa[0, 1] == pytest.approx(0.4)
+    np.testing.assert_allclose(counts.cohen_kappa, counts.cohen_kappa.T)
+    assert counts.krippendorff_alpha == pytest.approx(0.4)
+    assert counts.fleiss_kappa == pytest.approx(13 / 33)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_fleiss_kappa_matches_its_definition(seed):
+    rng = np.random.default_rng(seed)
+    ratings = rng.integers(0, 4, size=(200, 2 + seed))
+    assert _counts(ratings, 4).fleiss_kappa == pytest.approx(_fleiss_kappa(ratings, 4))
+
+
+def test_rate_items():
+    votes = np.zeros((5, 3, 3), dtype=bool)
+    votes[0] = [[1, 0, 0], [1, 0, 0], [0, 1, 0]]
+    votes[1] = [[0, 0, 1], [0, 0, 0], [0, 0, 1]]
+    votes[2] = [[1, 1, 0], [1, 1, 0], [0, 0, 0]]
+    # No one answered on the last frames, which mustn't count as agreeing on the absence of an answer
+    ratings, categories = rate_items(votes, ["q=a", "q=b", "q=c"], "q")
+    assert categories == [f"q={NO_ANSWER}", "q=a", "q=b", "q=c", "q=a|q=b"]
+    np.testing.assert_array_equal(ratings, [[1, 1, 2], [3, 0, 3], [4, 4, 0]])
+
+
+def test_counts_pool_items():
+    first, second = [[1, 1, 0], [1, 1, 1]], [[1, 2, 2], [0, 0, 1]]
+    pooled = _counts(first, 2) + _counts(second, 3)
+    assert pooled.num_items == 4
+    assert pooled.categories == ["0", "1", "2"]
+    assert pooled.fleiss_kappa == pytest.approx(_counts(first + second, 3).fleiss_kappa)
+
+    # Categories are matched by name
+    reordered = count_agreement(np.asarray(second) + 1, ["x", "2", "0", "1"])
+    assert (_counts(first, 2) + reordered).fleiss_kappa == pytest.approx(_counts(first + second, 3).fleiss_kappa)
+
+    restored = AgreementCounts.from_dict(pooled.to_dict())
+    assert restored.num_items == pooled.num_items
+    assert restored.categories == pooled.categories
+    np.testing.assert_array_equal(restored.agreements, pooled.agreements)
+    np.testing.assert_array_equal(restored.category_counts, pooled.category_counts)
+
+
+def test_undefined_metrics():
+    counts = AgreementCounts.empty(3)
+    assert math.isnan(counts.fleiss_kappa)
+    assert math.isnan(counts.krippendorff_alpha)
+    assert counts.summarise(["a", "b"])["cohen_kappa"] == {"a": {"b": None}, "b": {"a": None}}
+    # A single annotator can't disagree with anyone
+    assert math.isnan(_counts([[1], [0]], 2).krippendorff_alpha)
+
+
+def test_file_agreement_by_classification():
+    spec = SyntheticDataSpec(
+        num_annotators=4,
+        num_frames=500,
+        num_answers=3,
+        nesting_depth=2,
+        num_classifications=2,
+        disagreement_rate=0.2,
+        mean_section_length=20,
+        seed=0,
+    )
+    ontology = generate_ontology(spec)
+    lr_data = generate_label_rows(spec, ontology)
+    prepared_data = prepare_compact_data_for_consensus(ontology, lr_data)
+    counts_by_classification, total = calculate_file_agreement(prepared_data, list(lr_data))
+
+    assert sorted(counts_by_classification) == sorted({c.answer.value for c in prepared_data})
+    assert total.num_items == sum(counts.num_items for counts in counts_by_classification.values())
+    for counts in counts_by_classification.values():
+        assert 0 < counts.num_items <= spec.num_frames
+        assert 0 < counts.fleiss_kappa < 1
@@ -0,0 +1,138 @@
+"""
+The consensus engines must find exactly the same regions of interest, with the same consensus data, as the original
+per-frame implementation of `frame_label_consensus`.
+"""
+from dataclasses import replace
+from typing import Dict, List, Tuple
+
+import pytest
+
+from encord_consensus.lib.data_transformation import (
+    OntologyIndex,
+    prepare_compact_data_for_consensus,
+    prepare_data_for_consensus,
+)
+from encord_consensus.lib.frame_label_consensus import (
+    aggregate_by_answer,
+    calculate_frame_level_min_n_agreement,
+    find_regions_of_interest,
+)
+from encord_consensus.lib.incremental_consensus import IncrementalConsensus
+from encord_consensus.lib.interval_consensus import (
+    aggregate_intervals_by_answer,
+    calculate_frame_level_min_n_agreement_from_intervals,
+    find_interval_regions,
+)
+from encord_consensus.lib.synthetic_data import (
+    SyntheticDataSpec,
+    generate_label_rows,
+    generate_ontology,
+)
+from encord_consensus.lib.vectorized_consensus import (
+    aggregate_votes_by_answer,
+    calculate_frame_level_min_n_agreement_from_votes,
+    find_compact_regions_from_votes,
+    find_regions_of_interest_from_votes,
+)
+
+NUM_SEEDS = 30
+
+
+def _spec(seed: int) -> SyntheticDataSpec:
+    # Vary the shape of the data with the seed, with high disagreement so regions overlap and split often
+    return SyntheticDataSpec(
+        num_annotators=2 + seed % 4,
+        num_frames=1_500,
+        num_answers=2 + seed % 3,
+        nesting_depth=1 + seed % 2,
+        num_classifications=1 + seed % 2,
+        disagreement_rate=0.1 + 0.1 * (seed % 4),
+        mean_section_length=40,
+        seed=seed,
+    )
+
+
+def _canonical(region) -> Tuple:
+    """The answer, number, per-frame votes and consensus data of a region, whatever its representation."""
+    frame_votes = {frame: tuple(sorted(votes)) for frame, votes in region.frame_votes.items()}
+    return (
+        region.answer.fq_name,
+        region.region_number,
+        tuple(sorted(frame_votes.items())),
+        tuple(sorted(region.frame_vote_counts.items())),
+        region.consensus_data.model_dump(),
+    )
+
+
+def _find_regions(seed: int) -> Tuple[Dict[str, List], Dict[str, Dict[int, int]]]:
+    spec = _spec(seed)
+    ontology = generate_ontology(spec)
+    lr_data = generate_label_rows(spec, ontology)
+    ontology_index = OntologyIndex(ontology)
+    num_annotators = len(lr_data)
+
+    aggregated = aggregate_by_answer(prepare_data_for_consensus(ontology, lr_data, ontology_index))
+    compact_data = prepare_compact_data_for_consensus(ontology, lr_data, ontology_index)
+    aggregated_votes = aggregate_votes_by_answer(compact_data)
+    aggregated_intervals = aggregate_intervals_by_answer(compact_data)
+    incremental = IncrementalConsensus(ontology, ontology_index)
+    incremental.set_label_rows(lr_data)
+
+    regions = {
+        "legacy": find_regions_of_interest(aggregated, num_annotators),
+        "vectorized": find_regions_of_interest_from_votes(aggregated_votes, num_annotators),
+        "compact": find_compact_regions_from_votes(aggregated_votes, num_annotators),
+        "interval": find_interval_regions(aggregated_intervals, num_annotators),
+        "incremental": incremental.regions,
+    }
+    frame_level_min_n_agreement = {
+        "legacy": calculate_frame_level_min_n_agreement(aggregated),
+        "vectorized": calculate_frame_level_min_n_agreement_from_votes(aggregated_votes),
+        "interval": calculate_frame_level_min_n_agreement_from_intervals(aggregated_intervals),
+        "incremental": incremental.frame_level_min_n_agreement,
+    }
+    return regions, frame_level_min_n_agreement
+
+
+@pytest.mark.parametrize("seed", range(NUM_SEEDS))
+def test_engines_find_the_same_regions(seed):
+    regions, _ = _find_regions(seed)
+    expected = [_canonical(region) for region in regions["legacy"]]
+    assert expected
+    for engine in ("vectorized", "compact", "interval"):
+        assert [_canonical(region) for region in regions[engine]] == expected, engine
+    # The incremental engine keeps the regions of each answer together, but not in the order of the ontology
+    assert sorted(_canonical(region) for region in regions["incremental"]) == sorted(expected)
+
+
+@pytest.mark.parametrize("seed", range(0, NUM_SEEDS, 5))
+def test_engines_find_the_same_frame_level_min_n_agreement(seed):
+    _, frame_level_min_n_agreement = _find_regions(seed)
+    expected = frame_level_min_n_agreement["legacy"]
+    for engine, min_n_agreement in frame_level_min_n_agreement.items():
+        assert min_n_agreement == expected, engine
+
+
+def test_incremental_consensus_patches_like_a_full_recomputation():
+    spec = _spec(3)
+    ontology = generate_ontology(spec)
+    lr_data = generate_label_rows(spec, ontology)
+    project_hashes = list(lr_data)
+    edited_label_row = generate_label_rows(replace(spec, seed=spec.seed + 1), ontology)[project_hashes[0]]
+    # Label rows are only re-read when the platform reports an edit
+    edited_label_row["last_edited_at"] = "Tue, 02 Jan 2024 00:00:00 GMT"
+
+    incremental = IncrementalConsensus(ontology)
+    incremental.set_label_rows(lr_data)
+    # Replace the labels of one project, then remove another one
+    incremental.set_label_row(project_hashes[0], edited_label_row)
+    incremental.remove_project(project_hashes[-1])
+
+    expected_lr_data = {**lr_data, project_hashes[0]: edited_label_row}
+    del expected_lr_data[project_hashes[-1]]
+    recomputed = IncrementalConsensus(ontology)
+    recomputed.set_label_rows(expected_lr_data)
+    assert sorted(_canonical(region) for region in incremental.regions) == sorted(
+        _canonical(region) for region in recomputed.regions
+    )
+    assert incremental.frame_level_min_n_agreement == recomputed.frame_level_min_n_agreement
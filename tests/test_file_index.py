@@ -0,0 +1,33 @@
+from encord_consensus.lib.file_index import FileIndex, FileIndexEntry
+
+
+def _index(titles) -> FileIndex:
+    return FileIndex([FileIndexEntry(title, f"data-{idx}", "video", {}) for idx, title in enumerate(titles)])
+
+
+def _titles(entries):
+    return [entry.title for entry in entries]
+
+
+def test_prefix_matches_come_first():
+    index = _index(["street_cam.mp4", "Cam_2.mp4", "cam_1.mp4", "drone.mp4", "cam_cam.mp4", "night-CAM.mp4"])
+    entries, total = index.search("CAM")
+    assert total == 5
+    # Titles with several matches are listed once
+    assert _titles(entries) == ["cam_1.mp4", "Cam_2.mp4", "cam_cam.mp4", "night-CAM.mp4", "street_cam.mp4"]
+    assert index.count("drone") == 1
+    assert index.count("missing") == 0
+    assert index.count("") == len(index) == 6
+
+
+def test_matches_do_not_span_titles():
+    index = _index(["ab", "cd"])
+    assert index.count("bc") == 0
+    assert index.count("b") == 1
+
+
+def test_pages():
+    index = _index([f"file_{idx:02d}.mp4" for idx in range(10)])
+    entries, total = index.search("mp4", page=2, page_size=4)
+    assert total == 10
+    assert _titles(entries) == ["file_08.mp4", "file_09.mp4"]
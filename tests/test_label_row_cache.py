@@ -0,0 +1,53 @@
+import time
+from datetime import datetime, timedelta
+
+from encord.orm.label_row import LabelRow
+
+from encord_consensus.lib.label_row_cache import LabelRowCache, _file_version
+
+EDITED_AT = datetime(2024, 1, 1, 12)
+
+
+def _label_row(label_hash: str, num_labels: int = 0) -> LabelRow:
+    labels = {str(frame): {"classifications": []} for frame in range(num_labels)}
+    return LabelRow({"label_hash": label_hash, "data_units": {"data": {"labels": labels}}})
+
+
+def test_label_rows_are_served_until_they_are_edited(tmp_path):
+    cache = LabelRowCache(tmp_path)
+    assert cache.get("project", "label", EDITED_AT) is None
+    cache.put("project", "label", EDITED_AT, _label_row("label"))
+    assert cache.get("project", "label", EDITED_AT) == _label_row("label")
+    # An edited label row is dropped from the cache
+    assert cache.get("project", "label", EDITED_AT + timedelta(minutes=1)) is None
+    assert cache.get("project", "label", EDITED_AT) is None
+    assert cache.stats == {"hits": 1, "misses": 3, "entries": 0, "size_bytes": 0}
+
+
+def test_entries_expire(tmp_path):
+    cache = LabelRowCache(tmp_path, max_age=timedelta(0))
+    cache.put("project", "label", EDITED_AT, _label_row("label"))
+    assert cache.get("project", "label", EDITED_AT) is None
+
+
+def test_stale_reads_dont_remove_a_replaced_entry(tmp_path):
+    cache = LabelRowCache(tmp_path)
+    cache.put("project", "label", EDITED_AT, _label_row("label"))
+    stale_version = _file_version(cache._entry_path("project", "label"))
+    # Another thread stores the edited label row between the read of the stale entry and its removal
+    edited_at = EDITED_AT + timedelta(minutes=1)
+    cache.put("project", "label", edited_at, _label_row("label"))
+    cache._remove(cache._entry_path("project", "label"), stale_version)
+    assert cache.get("project", "label", edited_at) == _label_row("label")
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = LabelRowCache(tmp_path, max_size_bytes=7_000)
+    for label_hash in ("a", "b", "c"):
+        cache.put("project", label_hash, EDITED_AT, _label_row(label_hash, num_labels=100))
+        # The entries' access times must differ for the order of eviction to be defined
+        time.sleep(0.01)
+    assert cache.get("project", "a", EDITED_AT) is None
+    assert cache.get("project", "b", EDITED_AT) is not None
+    assert cache.get("project", "c", EDITED_AT) is not None
+    assert cache.stats["size_bytes"] <= 7_000
@@ -0,0 +1,158 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+from encord.exceptions import AuthorisationError, ResourceExistsError
+from requests.exceptions import Timeout
+
+from encord_consensus.lib.project_access import (
+    CacheKind,
+    MetadataCache,
+    get_or_create_label_row,
+)
+
+from .test_single_flight import WatchedEvent, wait_until
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_entries_expire_after_their_time_to_live():
+    clock = FakeClock()
+    cache = MetadataCache(ttls={CacheKind.ONTOLOGY: 10}, clock=clock)
+    calls = []
+
+    def compute():
+        calls.append(clock.now)
+        return len(calls)
+
+    assert cache.get_or_compute(CacheKind.ONTOLOGY, "ontology", compute) == 1
+    clock.now = 9
+    assert cache.get_or_compute(CacheKind.ONTOLOGY, "ontology", compute) == 1
+    # Entries of other kinds and keys are separate
+    assert cache.get_or_compute(CacheKind.PROJECT, "ontology", compute) == 2
+    assert cache.get_or_compute(CacheKind.ONTOLOGY, "other", compute) == 3
+    clock.now = 10
+    assert cache.get_or_compute(CacheKind.ONTOLOGY, "ontology", compute) == 4
+    assert cache.stats[CacheKind.ONTOLOGY.value] == {"hits": 1, "misses": 3, "coalesced": 0, "entries": 2}
+
+
+def test_errors_are_not_cached():
+    cache = MetadataCache()
+
+    def fail():
+        raise RuntimeError("unavailable")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_compute(CacheKind.PROJECT, "project", fail)
+    assert cache.get_or_compute(CacheKind.PROJECT, "project", lambda: "project") == "project"
+    assert cache.stats[CacheKind.PROJECT.value]["entries"] == 1
+
+
+def test_concurrent_misses_are_coalesced():
+    cache = MetadataCache()
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(None)
+        release.wait()
+        return "rows"
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [executor.submit(cache.get_or_compute, CacheKind.DATA_ROWS, "project", compute)]
+        wait_until(lambda: cache._in_flight.stats["in_flight"] == 1)
+        done = cache._in_flight._calls[(CacheKind.DATA_ROWS, "project")].done = WatchedEvent()
+        futures += [executor.submit(cache.get_or_compute, CacheKind.DATA_ROWS, "project", compute) for _ in range(3)]
+        wait_until(lambda: done.num_waiters == 3)
+        release.set()
+        assert [future.result() for future in futures] == ["rows"] * 4
+    assert len(calls) == 1
+    assert cache.stats[CacheKind.DATA_ROWS.value] == {"hits": 0, "misses": 1, "coalesced": 3, "entries": 1}
+
+
+def test_invalidation_during_a_call_drops_its_result():
+    cache = MetadataCache()
+    release = threading.Event()
+
+    def stale_compute():
+        release.wait()
+        return "stale"
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        stale = executor.submit(cache.get_or_compute, CacheKind.LABEL_ROW_METADATA, "project", stale_compute)
+        wait_until(lambda: cache._in_flight.stats["in_flight"] == 1)
+        cache.invalidate(CacheKind.LABEL_ROW_METADATA, "project")
+        # The next miss doesn't join the call started before the invalidation
+        assert cache.get_or_compute(CacheKind.LABEL_ROW_METADATA, "project", lambda: "fresh") == "fresh"
+        release.set()
+        assert stale.result() == "stale"
+    assert cache.get_or_compute(CacheKind.LABEL_ROW_METADATA, "project", lambda: "recomputed") == "fresh"
+
+
+def test_invalidate_by_kind_and_key():
+    cache = MetadataCache()
+    for kind in (CacheKind.PROJECT, CacheKind.ONTOLOGY):
+        for key in ("a", "b"):
+            cache.get_or_compute(kind, key, lambda: "cached")
+
+    cache.invalidate(CacheKind.PROJECT, "a")
+    assert {kind: stats["entries"] for kind, stats in cache.stats.items() if stats["entries"]} == {
+        CacheKind.PROJECT.value: 1,
+        CacheKind.ONTOLOGY.value: 2,
+    }
+    cache.invalidate(CacheKind.ONTOLOGY)
+    assert cache.stats[CacheKind.ONTOLOGY.value]["entries"] == 0
+    assert cache.stats[CacheKind.PROJECT.value]["entries"] == 1
+    cache.invalidate()
+    assert all(stats["entries"] == 0 for stats in cache.stats.values())
+
+
+class LabelRowProject:
+    """A project whose label row creation fails with `create_error`, after creating the label row if `created`."""
+
+    def __init__(self, create_error: Exception, created: bool):
+        self.create_error = create_error
+        self.created = created
+        self.calls = []
+
+    def create_label_row(self, data_hash):
+        self.calls.append("create_label_row")
+        raise self.create_error
+
+    def list_label_rows(self, data_hashes):
+        self.calls.append("list_label_rows")
+        label_hash = "label" if self.created else None
+        return [SimpleNamespace(label_hash=label_hash, data_hash=data_hashes[0])]
+
+    def get_label_row(self, label_hash):
+        self.calls.append("get_label_row")
+        return {"label_hash": label_hash, "data_units": {}}
+
+
+@pytest.mark.parametrize("create_error", [ResourceExistsError("exists"), Timeout("timed out")])
+def test_label_rows_created_by_a_failed_call_are_read(create_error):
+    project = LabelRowProject(create_error, created=True)
+    metadata = {"label_hash": None, "data_hash": "data"}
+    assert get_or_create_label_row(project, metadata, max_retries=0) == {"label_hash": "label", "data_units": {}}
+    assert project.calls == ["create_label_row", "list_label_rows", "get_label_row"]
+
+
+def test_final_creation_errors_are_raised_without_looking_up_the_label_row():
+    project = LabelRowProject(AuthorisationError("forbidden"), created=True)
+    with pytest.raises(AuthorisationError):
+        get_or_create_label_row(project, {"label_hash": None, "data_hash": "data"}, max_retries=0)
+    assert project.calls == ["create_label_row"]
+
+
+def test_transient_creation_errors_are_raised_when_no_label_row_was_created():
+    project = LabelRowProject(Timeout("timed out"), created=False)
+    with pytest.raises(Timeout):
+        get_or_create_label_row(project, {"label_hash": None, "data_hash": "data"}, max_retries=0)
+    assert project.calls == ["create_label_row", "list_label_rows"]
@@ -0,0 +1,139 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from encord_consensus.lib.single_flight import SingleFlight
+
+
+class WatchedEvent(threading.Event):
+    """An event counting the threads waiting on it, so tests know when the callers joined a call in flight."""
+
+    def __init__(self):
+        super().__init__()
+        self.num_waiters = 0
+        self._waiters_lock = threading.Lock()
+
+    def wait(self, timeout=None):
+        with self._waiters_lock:
+            self.num_waiters += 1
+        return super().wait(timeout)
+
+
+def wait_until(predicate, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def start_blocked_call(flight: SingleFlight, executor: ThreadPoolExecutor, key="key", fn=None):
+    """Start a call that blocks until the returned event is set, and return its future, event and watched event."""
+    release = threading.Event()
+
+    def blocked():
+        release.wait()
+        return fn() if fn else "leader"
+
+    future = executor.submit(flight.do, key, blocked)
+    wait_until(lambda: key in flight._calls)
+    call = flight._calls[key]
+    call.done = WatchedEvent()
+    return future, release, call.done
+
+
+def test_concurrent_calls_are_coalesced():
+    flight = SingleFlight()
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        leader, release, done = start_blocked_call(flight, executor)
+        followers = [executor.submit(flight.do, "key", lambda: "follower") for _ in range(4)]
+        wait_until(lambda: done.num_waiters == 4)
+        release.set()
+        assert leader.result() == ("leader", False)
+        assert [f.result() for f in followers] == [("leader", True)] * 4
+    assert flight.stats == {"calls": 1, "coalesced": 4, "timed_out": 0, "in_flight": 0}
+
+
+def test_different_keys_are_not_coalesced():
+    flight = SingleFlight()
+    assert flight.do("a", lambda: 1) == (1, False)
+    assert flight.do("b", lambda: 2) == (2, False)
+    # Results are not kept once the call is over
+    assert flight.do("a", lambda: 3) == (3, False)
+    assert flight.stats["calls"] == 3
+
+
+def test_errors_are_shared_with_the_waiting_callers():
+    flight = SingleFlight()
+
+    def fail():
+        raise ValueError("boom")
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        leader, release, done = start_blocked_call(flight, executor, fn=fail)
+        followers = [executor.submit(flight.do, "key", lambda: "follower") for _ in range(2)]
+        wait_until(lambda: done.num_waiters == 2)
+        release.set()
+        for future in [leader, *followers]:
+            with pytest.raises(ValueError, match="boom"):
+                future.result()
+    # The failed call isn't kept, the next caller tries again
+    assert flight.do("key", lambda: "retry") == ("retry", False)
+
+
+def test_waiting_callers_make_their_own_call_after_the_wait_timeout():
+    flight = SingleFlight()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        leader, release, _ = start_blocked_call(flight, executor)
+        assert flight.do("key", lambda: "own call", wait_timeout=0.01) == ("own call", False)
+        release.set()
+        assert leader.result() == ("leader", False)
+    assert flight.stats == {"calls": 2, "coalesced": 0, "timed_out": 1, "in_flight": 0}
+
+
+def test_fresh_calls_bypass_the_call_in_flight_and_are_joined_by_later_callers():
+    flight = SingleFlight()
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        stale, release_stale, stale_done = start_blocked_call(flight, executor)
+        release_fresh = threading.Event()
+
+        def fresh_call():
+            release_fresh.wait()
+            return "fresh"
+
+        fresh = executor.submit(flight.do, "key", fresh_call, fresh=True)
+        wait_until(lambda: flight._calls["key"].done is not stale_done)
+        done = flight._calls["key"].done = WatchedEvent()
+        follower = executor.submit(flight.do, "key", lambda: "follower")
+        wait_until(lambda: done.num_waiters == 1)
+
+        # The stale call finishing first mustn't release the key of the fresh call
+        release_stale.set()
+        assert stale.result() == ("leader", False)
+        assert flight.stats["in_flight"] == 1
+        release_fresh.set()
+        assert fresh.result() == ("fresh", False)
+        assert follower.result() == ("fresh", True)
+    assert flight.stats["in_flight"] == 0
+
+
+def test_forgotten_calls_are_not_joined():
+    flight = SingleFlight()
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        kept, release_kept, _ = start_blocked_call(flight, executor, key="kept")
+        forgotten, release_forgotten, done = start_blocked_call(flight, executor, key="forgotten")
+        waiter = executor.submit(flight.do, "forgotten", lambda: "waiter")
+        wait_until(lambda: done.num_waiters == 1)
+
+        flight.forget(lambda key: key == "forgotten")
+        assert flight.stats["in_flight"] == 1
+        assert flight.do("forgotten", lambda: "new call") == ("new call", False)
+        # The callers already waiting still get the result of the forgotten call
+        release_forgotten.set()
+        assert forgotten.result() == ("leader", False)
+        assert waiter.result() == ("leader", True)
+        flight.forget()
+        assert flight.stats["in_flight"] == 0
+        release_kept.set()
+        assert kept.result() == ("leader", False)